@@ -0,0 +1,25 @@
+"""
+Script: 08_backtest_models.py
+Description: Rolling-origin backtest of every model type with per-fold, per-horizon error tables.
+"""
+
+import os
+import sys
+import logging
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.stages import run_stage
+
+# --- Logging ---
+os.makedirs("logs", exist_ok=True)
+logging.basicConfig(
+    filename='logs/backtest_models.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logging.info("Started backtest script.")
+
+# --- Run (logic lives in scripts/stages/backtest.py) ---
+run_stage("backtest", load_config())
+print("✅ Backtest completed. See results/backtest for per-fold, per-horizon errors.")
@@ -0,0 +1,27 @@
+"""
+Script: 09_tune_xgboost.py
+Description: Searches XGBoost hyperparameters (random search or successive halving over
+             `xgboost.tuning.space`) and registers the best parameters as `xgboost_tuned`.
+             Set `xgboost.tuning.use_best: true` to train 04_train_xgboost.py with them.
+"""
+
+import os
+import sys
+import logging
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.stages import run_stage
+
+# --- Logging ---
+os.makedirs("logs", exist_ok=True)
+logging.basicConfig(
+    filename='logs/tune_xgboost.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logging.info("Started XGBoost tuning script.")
+
+# --- Run (logic lives in scripts/stages/tune_xgboost.py) ---
+run_stage("tune_xgboost", load_config())
+print("✅ XGBoost tuning completed. See results/tuning/xgboost_trials.csv and models/xgboost_tuned.")
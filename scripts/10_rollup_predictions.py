@@ -0,0 +1,26 @@
+"""
+Script: 10_rollup_predictions.py
+Description: Updates the hourly / daily / weekly / monthly rollups of the prediction store per
+             sector and model, aggregating only predictions written since the last run.
+"""
+
+import os
+import sys
+import logging
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.stages import run_stage
+
+# --- Logging ---
+os.makedirs("logs", exist_ok=True)
+logging.basicConfig(
+    filename='logs/rollup_predictions.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logging.info("Started prediction rollup script.")
+
+# --- Run (logic lives in scripts/stages/rollup.py) ---
+run_stage("rollup", load_config())
+print("✅ Prediction rollups updated. See results/predictions/rollups.")
@@ -0,0 +1,264 @@
+"""
+Script: benchmark.py
+Description: Benchmarks every pipeline stage on synthetic data at several scales and flags
+             regressions against a saved baseline.
+
+Usage:
+    python scripts/benchmark.py run [--scales 1x1y 50x2y] [--stages ...] [--save-baseline]
+    python scripts/benchmark.py compare [--run RUN_ID] [--threshold 0.15]
+    python scripts/benchmark.py baseline [--run RUN_ID]
+
+Each scale runs in its own scratch directory (config overridden from the `benchmark.scales`
+entry, scripts symlinked) and every stage runs in a fresh subprocess, so wall time, CPU time and
+peak RSS are measured per stage. One JSON line per stage is appended to `benchmark.history`.
+`compare` exits with status 1 when any stage regressed, so it can gate upgrades.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from importlib import metadata
+
+import yaml
+import pandas as pd
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+
+ROOT = os.path.abspath(".")
+PACKAGES = ["pandas", "numpy", "pyarrow", "scikit-learn", "xgboost", "prophet"]
+EXTRA_STAGES = {"generate_synthetic": "scripts/00_generate_synthetic.py"}
+TRAINER_MODELS = {"train_prophet": "Prophet", "train_xgboost": "XGBoost", "train_linear": "LinearRegression"}
+
+
+# --- Environment fingerprint stored with every record ---
+def environment():
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip()
+    except OSError:
+        commit = None
+    return {"git_commit": commit or None, "host": platform.node(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "packages": versions}
+
+
+# --- Scratch workspace per scale ---
+def scale_config(config, scale):
+    """Copy of the project config pointed at synthetic data of the given size."""
+    cfg = json.loads(json.dumps(config))
+    start = pd.Timestamp(cfg["synthetic"]["start"])
+    end = start + pd.DateOffset(years=scale["years"]) - pd.Timedelta(hours=1)
+    cfg["synthetic"].update({"meters": scale["meters"], "start": str(start), "end": str(end),
+                             "use_in_pipeline": True, "series": "meter"})
+    cfg["cache"]["enabled"] = False
+    # The evaluator requires every listed model, so drop those whose trainer this scale skips
+    skipped = {TRAINER_MODELS[s] for s in scale.get("skip", []) if s in TRAINER_MODELS}
+    cfg["modeling"]["models"] = [m for m in cfg["modeling"]["models"] if m not in skipped]
+    return cfg
+
+
+def make_workspace(config, scale):
+    work = tempfile.mkdtemp(prefix=f"bench-{scale['name']}-")
+    os.makedirs(os.path.join(work, "config"))
+    os.makedirs(os.path.join(work, "logs"))
+    os.symlink(os.path.join(ROOT, "scripts"), os.path.join(work, "scripts"))
+    with open(os.path.join(work, "config", "global_config.yaml"), "w") as f:
+        yaml.safe_dump(scale_config(config, scale), f, sort_keys=False)
+    return work
+
+
+# --- Stage execution ---
+def stage_scripts(config):
+    scripts = dict(EXTRA_STAGES)
+    scripts.update({name: step["script"] for name, step in config["pipeline"]["steps"].items()})
+    scripts["dashboard_load"] = "scripts/benchmark.py"
+    return scripts
+
+
+def run_stage(work, name, script):
+    """Run one stage in a subprocess; returns wall/CPU seconds, peak RSS and status."""
+    cmd = [sys.executable, script] + (["dashboard-load"] if name == "dashboard_load" else [])
+    log_path = os.path.join(work, "logs", f"benchmark_{name}.out")
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=work, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "stage": name,
+        "status": "ok" if proc.returncode == 0 else "failed",
+        "seconds": round(seconds, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),  # kilobytes on Linux
+    }
+
+
+def dashboard_load():
+    """What the dashboard does on first render: every model's series list and one series, plus the summary."""
+    from scripts.utils.prediction_store import query_predictions, latest_run
+
+    config = load_config()
+    for model in config["modeling"]["models"]:
+        run_id = latest_run(config, model)
+        if run_id is None:
+            continue
+        series = query_predictions(config, models=[model], run_ids=[run_id], columns=["series"])["series"].unique()
+        query_predictions(config, models=[model], run_ids=[run_id], series=[sorted(series)[0]],
+                          columns=["timestamp", "actual", "predicted"])
+    summary = os.path.join(config["model_paths"]["predictions"], "model_evaluation_summary.csv")
+    if os.path.exists(summary):
+        pd.read_csv(summary)
+
+
+# --- History and baseline ---
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def run_records(history, run_id=None):
+    run_id = run_id or (history[-1]["run_id"] if history else None)
+    return [r for r in history if r["run_id"] == run_id]
+
+
+def save_baseline(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(records, f, indent=2)
+    print(f"📌 Baseline saved to {path} (run {records[0]['run_id']}, {len(records)} stages)")
+
+
+def compare(current, baseline, threshold, min_seconds):
+    """Rows of (scale, stage, baseline, current, ratio, flag); flags 'SLOWER' / 'MEMORY'."""
+    base = {(r["scale"], r["stage"]): r for r in baseline}
+    rows = []
+    for r in current:
+        b = base.get((r["scale"], r["stage"]))
+        if b is None or b["status"] != "ok":
+            rows.append((r["scale"], r["stage"], None, r["seconds"], None, "NEW"))
+            continue
+        flags = []
+        if r["status"] != "ok":
+            flags.append("FAILED")
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] > 0 else float("inf")
+        if ratio > 1 + threshold and r["seconds"] - b["seconds"] > min_seconds:
+            flags.append("SLOWER")
+        if r["max_rss_mb"] > b["max_rss_mb"] * (1 + threshold):
+            flags.append("MEMORY")
+        rows.append((r["scale"], r["stage"], b["seconds"], r["seconds"], ratio, ",".join(flags)))
+    return rows
+
+
+# --- Commands ---
+def cmd_run(args, config):
+    bench_cfg = config["benchmark"]
+    scales = [s for s in bench_cfg["scales"] if not args.scales or s["name"] in args.scales]
+    stages = args.stages or bench_cfg["stages"]
+    scripts = stage_scripts(config)
+    unknown = [s for s in stages if s not in scripts]
+    if unknown:
+        raise ValueError(f"Unknown benchmark stages {unknown}. Available: {list(scripts)}")
+
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    env = environment()
+    records = []
+    for scale in scales:
+        work = make_workspace(config, scale)
+        print(f"📏 Scale {scale['name']}: {scale['meters']} series x {scale['years']} years ({work})")
+        try:
+            for name in stages:
+                if name in scale.get("skip", []):
+                    continue
+                result = run_stage(work, name, scripts[name])
+                print(f"  {name:<22} {result['status']:<7} {result['seconds']:>9.2f}s {result['max_rss_mb']:>9.1f} MB")
+                records.append({"run_id": run_id, "scale": scale["name"], "meters": scale["meters"],
+                                "years": scale["years"], **result, **env})
+                if result["status"] != "ok":
+                    print(f"  ❌ {name} failed; see {os.path.join(work, 'logs', f'benchmark_{name}.out')}")
+                    break
+        finally:
+            if not args.keep:
+                shutil.rmtree(work, ignore_errors=True)
+
+    append_history(bench_cfg["history"], records)
+    print(f"✅ Benchmark run {run_id} appended to {bench_cfg['history']}")
+    if args.save_baseline:
+        save_baseline(bench_cfg["baseline"], records)
+    return 0 if all(r["status"] == "ok" for r in records) else 1
+
+
+def cmd_compare(args, config):
+    bench_cfg = config["benchmark"]
+    current = run_records(read_history(bench_cfg["history"]), args.run)
+    if not current:
+        print("No benchmark runs in the history yet.")
+        return 1
+    with open(args.baseline or bench_cfg["baseline"]) as f:
+        baseline = json.load(f)
+    threshold = args.threshold if args.threshold is not None else bench_cfg.get("threshold", 0.15)
+    rows = compare(current, baseline, threshold, bench_cfg.get("min_seconds", 0.5))
+
+    print(f"Run {current[0]['run_id']} vs baseline {baseline[0]['run_id']} (threshold {threshold:.0%})")
+    print(f"  {'scale':<10} {'stage':<22} {'baseline':>10} {'current':>10} {'ratio':>7}  flags")
+    for scale, stage, base_s, cur_s, ratio, flags in rows:
+        base_txt = f"{base_s:.2f}s" if base_s is not None else "-"
+        ratio_txt = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"  {scale:<10} {stage:<22} {base_txt:>10} {cur_s:>9.2f}s {ratio_txt:>7}  {flags}")
+    regressed = [r for r in rows if any(f in r[5] for f in ("SLOWER", "MEMORY", "FAILED"))]
+    print(f"\n{'❌' if regressed else '✅'} {len(regressed)} regression(s).")
+    return 1 if regressed else 0
+
+
+def cmd_baseline(args, config):
+    records = run_records(read_history(config["benchmark"]["history"]), args.run)
+    if not records:
+        print("No benchmark runs in the history yet.")
+        return 1
+    save_baseline(config["benchmark"]["baseline"], records)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages at several data sizes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="Run the benchmark and append results to the history")
+    run_p.add_argument("--scales", nargs="*", help="Scale names from benchmark.scales (default: all)")
+    run_p.add_argument("--stages", nargs="*", help="Stages to time (default: benchmark.stages)")
+    run_p.add_argument("--save-baseline", action="store_true", help="Also save this run as the baseline")
+    run_p.add_argument("--keep", action="store_true", help="Keep the scratch directories")
+    cmp_p = sub.add_parser("compare", help="Compare a run (default: latest) against the baseline")
+    cmp_p.add_argument("--run", help="Run id from the history")
+    cmp_p.add_argument("--baseline", help="Baseline file (default: benchmark.baseline)")
+    cmp_p.add_argument("--threshold", type=float, help="Allowed relative slowdown, e.g. 0.15")
+    base_p = sub.add_parser("baseline", help="Save a run from the history (default: latest) as the baseline")
+    base_p.add_argument("--run", help="Run id from the history")
+    sub.add_parser("dashboard-load", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == "dashboard-load":
+        dashboard_load()
+        sys.exit(0)
+    commands = {"run": cmd_run, "compare": cmd_compare, "baseline": cmd_baseline}
+    sys.exit(commands[args.command](args, load_config()))
@@ -6,26 +6,98 @@ Author: Mantas Valantinavičius
 import streamlit as st
 import pandas as pd
 import os
+import sys
+import uuid
+import hashlib
+from datetime import timedelta
 import plotly.express as px
-from prophet import Prophet
-from sklearn.metrics import mean_squared_error, mean_absolute_error
-import numpy as np
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.prediction_store import query_predictions, latest_run
+from scripts.utils.lru_cache import LRUCache
+from scripts.utils.downsample import downsample_frame
+from scripts.utils.metrics import point_metrics
+from scripts.utils.jobs import JobQueue, JobLimitError
+from scripts.utils.ingest import ingest_upload, UploadError
+from scripts.utils.registry import load_intervals
+from scripts.utils.intervals import apply_intervals, registry_name
+from scripts.utils.storage import table_path, read_table
+from scripts.utils.rollups import pick_granularity, period_start, range_errors, GRANULARITIES
 
 # === 1. CONFIG ===
-PREDICTIONS_DIR = "results/predictions"
+config = load_config()
+PREDICTIONS_DIR = config["model_paths"]["predictions"]
 EVAL_FILE = os.path.join(PREDICTIONS_DIR, "model_evaluation_summary.csv")
-MODEL_FILES = {
-    "Prophet": "predictions_prophet.csv",
-    "XGBoost": "predictions_xgboost.csv",
-    "Linear Regression": "predictions_linear_regression.csv"
-}
+MODEL_LABELS = {"Prophet": "Prophet", "XGBoost": "XGBoost", "LinearRegression": "Linear Regression"}
+JOBS_CFG = config.get("dashboard", {}).get("jobs", {})
+MAX_HORIZON = JOBS_CFG.get("max_horizon_hours", 168)
+UPLOAD_CFG = config.get("dashboard", {}).get("upload", {})
+INTERVAL_LEVEL = config.get("intervals", {}).get("level", 0.95)
+ROLLUP_CFG = config.get("rollups", {})
+ROLLUP_LEVELS = [g for g in GRANULARITIES if g in ROLLUP_CFG.get("granularities", list(GRANULARITIES))]
+
+# === 2. CACHES ===
+# Shared by all sessions of this server process; bounded and evicted least-recently-used.
+@st.cache_resource
+def get_caches():
+    cache_cfg = config.get("dashboard", {}).get("cache", {})
+    return {
+        "frames": LRUCache(cache_cfg.get("frames_mb", 256) * 1024 ** 2),
+    }
+
+
+@st.cache_resource
+def get_jobs():
+    """Background Prophet fits for uploads, shared by all sessions (see scripts/utils/jobs.py)."""
+    return JobQueue(
+        workers=JOBS_CFG.get("workers", 2),
+        max_per_user=JOBS_CFG.get("max_per_user", 2),
+        keep_finished=JOBS_CFG.get("keep_finished", 32),
+    )
+
+
+def load_frame(path, reader):
+    """Load a file once per modification time; edits on disk invalidate the entry."""
+    key = (path, os.path.getmtime(path))
+    return get_caches()["frames"].get_or_compute(key, lambda: reader(path))
+
+
+def load_rollup(granularity, sector=None):
+    """One rollup table, or its rows for one sector; reloaded when the rollup stage rewrites it."""
+    path = table_path(config, ROLLUP_CFG.get("path", "results/predictions/rollups"), granularity)
+    if not os.path.exists(path):
+        return None
+    table = load_frame(path, read_table)
+    if sector is None:
+        return table
+    key = ("rollup", path, os.path.getmtime(path), sector)
+    return get_caches()["frames"].get_or_compute(key, lambda: table[table["sector"] == sector].reset_index(drop=True))
+
 
-# === 2. TITLE ===
+def load_predictions(model, run_id, series=None, columns=None):
+    """Query one run of a model from the prediction store; runs never change once written."""
+    key = ("store", model, run_id, series, tuple(columns or ()))
+    return get_caches()["frames"].get_or_compute(key, lambda: query_predictions(
+        config, models=[model], run_ids=[run_id], series=None if series is None else [series], columns=columns,
+    ))
+
+
+@st.fragment(run_every=1.0)
+def job_progress(job_id):
+    """Poll a running upload job; rerun the page once it has finished."""
+    job = get_jobs().get(job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        st.rerun()
+    st.progress(job["progress"], text=f"Forecasting in the background: {job['stage']}...")
+
+
+# === 3. TITLE ===
 st.set_page_config(page_title="Energy Forecasting Dashboard", layout="wide")
 st.title("⚡ Energy Forecasting Dashboard")
 
-# === 3. TABS ===
-tab1, tab2 = st.tabs(["📊 Model Forecasts", "📤 Upload Your CSV"])
+# === 4. TABS ===
+tab1, tab2, tab3 = st.tabs(["📊 Model Forecasts", "📤 Upload Your CSV", "🗂️ Sector Rollups"])
 
 # ===================================
 # 📊 TAB 1: Pretrained Model Forecasts
@@ -33,33 +105,70 @@ tab1, tab2 = st.tabs(["📊 Model Forecasts", "📤 Upload Your CSV"])
 with tab1:
     st.subheader("📈 View Forecasts from Trained Models")
 
-    selected_model = st.selectbox("Choose a model to display:", list(MODEL_FILES.keys()))
-    pred_file = os.path.join(PREDICTIONS_DIR, MODEL_FILES[selected_model])
+    selected_model = st.selectbox("Choose a model to display:", list(MODEL_LABELS), format_func=MODEL_LABELS.get)
+    run_id = latest_run(config, selected_model)
+
+    if run_id is not None:
+        x_col = "timestamp"
+        series_ids = sorted(load_predictions(selected_model, run_id, columns=["series"])["series"].unique())
+        selected_series = st.selectbox("Series:", series_ids) if len(series_ids) > 1 else series_ids[0]
+        # shared between sessions; never mutate it
+        df = load_predictions(selected_model, run_id, selected_series, columns=["timestamp", "kind", "actual", "predicted"])
+        if not df[x_col].is_monotonic_increasing:
+            df = df.sort_values(x_col)
+        st.caption(f"Run {run_id}")
 
-    if os.path.exists(pred_file):
-        df = pd.read_csv(pred_file)
-        if "timestamp" in df.columns:
-            df["ds"] = pd.to_datetime(df["timestamp"])
-        elif "ds" in df.columns:
-            df["ds"] = pd.to_datetime(df["ds"])
+        # --- Visible range: downsample to the point budget, full resolution once zoomed in ---
+        first, last = df[x_col].iloc[0].to_pydatetime(), df[x_col].iloc[-1].to_pydatetime()
+        start, end = first, last
+        if last > first:
+            start, end = st.slider("Visible range:", min_value=first, max_value=last, value=(first, last),
+                                   step=timedelta(hours=1), format="YYYY-MM-DD HH:mm")
+        times = df[x_col].to_numpy()
+        lo = times.searchsorted(pd.Timestamp(start).to_datetime64(), side="left")
+        hi = times.searchsorted(pd.Timestamp(end).to_datetime64(), side="right")
+        view = df.iloc[lo:hi]
+
+        budget = config.get("dashboard", {}).get("plot_points", 2000)
+        method = config.get("dashboard", {}).get("downsample", "lttb")
+        if len(view) > budget:
+            key = ("plot", selected_model, run_id, selected_series, lo, hi, budget, method)
+            plot_df = get_caches()["frames"].get_or_compute(
+                key, lambda: downsample_frame(view, x_col, ["actual", "predicted"], budget, method)
+            )
+            st.caption(f"Showing {len(plot_df):,} of {2 * len(view):,} points ({method}). Narrow the range for full resolution.")
         else:
-            st.warning("Missing 'timestamp' or 'ds' column in prediction file.")
-            st.stop()
+            plot_df = view.melt(id_vars=[x_col], value_vars=["actual", "predicted"])
 
         fig = px.line(
-            df,
-            x="ds",
-            y=["actual", "predicted"],
-            labels={"ds": "Time", "value": "Energy (kWh)", "variable": "Legend"},
-            title=f"{selected_model} Forecast",
+            plot_df,
+            x=x_col,
+            y="value",
+            color="variable",
+            labels={x_col: "Time", "value": "Energy (kWh)", "variable": "Legend"},
+            title=f"{MODEL_LABELS[selected_model]} Forecast",
         )
+
+        # --- Calibrated interval band around the forecast rows (from the backtest residuals) ---
+        # Horizons count from the last observed hour of the whole series, not of the visible range
+        future = view[view["kind"] == "forecast"]
+        intervals = load_intervals(config, registry_name(selected_model, selected_series))
+        if not future.empty and intervals is not None:
+            observed = df.loc[df["kind"] != "forecast", x_col]
+            origin = observed.iloc[-1] if not observed.empty else df.loc[df["kind"] == "forecast", x_col].iloc[0] - pd.Timedelta(hours=1)
+            horizon = ((future[x_col] - origin) // pd.Timedelta(hours=1)).astype(int)
+            future = future.assign(series=selected_series, horizon=horizon)
+            band = apply_intervals(future, intervals, INTERVAL_LEVEL)
+            fig.add_scatter(x=band[x_col], y=band["upper"], mode="lines", line_width=0, showlegend=False)
+            fig.add_scatter(x=band[x_col], y=band["lower"], mode="lines", line_width=0, fill="tonexty",
+                            fillcolor="rgba(99, 110, 250, 0.2)", name=f"{INTERVAL_LEVEL:.0%} interval")
         st.plotly_chart(fig, use_container_width=True)
     else:
-        st.warning(f"No prediction file found for {selected_model}.")
+        st.warning(f"No predictions in the store for {MODEL_LABELS[selected_model]}.")
 
     st.subheader("📊 Model Evaluation Summary")
     if os.path.exists(EVAL_FILE):
-        eval_df = pd.read_csv(EVAL_FILE)
+        eval_df = load_frame(EVAL_FILE, pd.read_csv)
         st.dataframe(eval_df.set_index("Model"))
     else:
         st.warning("Evaluation summary CSV not found.")
@@ -70,29 +179,61 @@ with tab1:
 with tab2:
     st.subheader("📥 Upload Your Own CSV for Forecasting")
 
-    uploaded_file = st.file_uploader("Upload a CSV file with 'timestamp' and 'energy_kwh'", type=["csv"])
+    uploaded_file = st.file_uploader("Upload a CSV file with 'timestamp' and 'energy_kwh' (also .gz, .zst or Parquet)",
+                                     type=["csv", "gz", "zst", "parquet"])
+
+    user_id = st.session_state.setdefault("user_id", uuid.uuid4().hex)
 
     if uploaded_file:
-        user_df = pd.read_csv(uploaded_file)
+        content_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
 
-        if "timestamp" not in user_df.columns or "energy_kwh" not in user_df.columns:
-            st.error("Uploaded CSV must contain 'timestamp' and 'energy_kwh'.")
+        # Stream the file into hourly (ds, y); only the hourly frame is kept, once per distinct file
+        def ingest():
+            uploaded_file.seek(0)
+            return ingest_upload(
+                uploaded_file, uploaded_file.name,
+                chunk_rows=UPLOAD_CFG.get("chunk_rows", 500_000),
+                aggregate=UPLOAD_CFG.get("aggregate", "sum"),
+                max_invalid_fraction=UPLOAD_CFG.get("max_invalid_fraction", 0.01),
+            )
+        try:
+            user_df, report = get_caches()["frames"].get_or_compute(
+                ("upload", content_hash), ingest, size=lambda r: r[0].memory_usage(deep=True).sum()
+            )
+        except UploadError as e:
+            st.error(str(e))
             st.stop()
 
-        user_df["ds"] = pd.to_datetime(user_df["timestamp"])
-        user_df["y"] = user_df["energy_kwh"]
-
         st.markdown("#### 🧪 Preview Uploaded Data")
-        st.dataframe(user_df[["ds", "y"]].head())
+        st.caption(f"{report['rows']:,} readings ({report['readings_per_hour']:g} per hour) from {report['start']} "
+                   f"to {report['end']}, aggregated to {report['hours']:,} hourly values.")
+        if report["invalid_rows"] or report["missing_hours"] or report["negative_values"]:
+            st.warning(f"Dropped {report['invalid_rows']:,} invalid rows; {report['missing_hours']:,} hours have no "
+                       f"readings; {report['negative_values']:,} negative values.")
+        st.dataframe(user_df.head())
 
         st.markdown("### 🔧 Forecast Settings")
-        horizon_hours = st.slider("Select forecast horizon (in hours):", 6, 168, 24, step=6)
+        horizon_hours = st.slider("Select forecast horizon (in hours):", 6, MAX_HORIZON, 24, step=6)
 
-        # Forecast with Prophet
-        model = Prophet(daily_seasonality=True)
-        model.fit(user_df[["ds", "y"]])
-        future = model.make_future_dataframe(periods=horizon_hours, freq="H")
-        forecast = model.predict(future)
+        # Forecast with Prophet in a background worker. One job per distinct file forecasts the
+        # maximum horizon; the slider only trims it, and identical uploads share the job.
+        retry = st.session_state.pop("retry_upload", False)
+        try:
+            job = get_jobs().submit(user_id, content_hash, user_df, MAX_HORIZON,
+                                    {"daily_seasonality": True, "uncertainty_samples": JOBS_CFG.get("uncertainty_samples", 0)},
+                                    retry=retry, level=INTERVAL_LEVEL)
+        except JobLimitError as e:
+            st.warning(str(e))
+            st.stop()
+        if job["status"] == "failed":
+            st.error(f"Forecast failed: {job['error']}")
+            st.button("Retry", on_click=lambda: st.session_state.update(retry_upload=True))
+            st.stop()
+        if job["status"] != "done":
+            job_progress(job["id"])
+            st.stop()
+        forecast = job["result"]
+        forecast = forecast[forecast["ds"] <= user_df["ds"].max() + pd.Timedelta(hours=horizon_hours)]
 
         # Plot
         fig = px.line()
@@ -106,14 +247,12 @@ with tab2:
         st.plotly_chart(fig, use_container_width=True)
 
         # Evaluate if actuals are available in forecast range
-        merged = pd.merge(forecast, user_df, how="inner", on="ds")
+        merged = pd.merge(forecast[["ds", "yhat"]], user_df, how="inner", on="ds")
         merged = merged.dropna(subset=["y", "yhat"])
 
         if not merged.empty:
-            rmse = np.sqrt(mean_squared_error(merged["y"], merged["yhat"]))
-            mae = mean_absolute_error(merged["y"], merged["yhat"])
-
-            st.success(f"📉 RMSE: {rmse:.2f} | MAE: {mae:.2f}")
+            scores = point_metrics(merged["y"], merged["yhat"], ["rmse", "mae", "mape"])
+            st.success(f"📉 RMSE: {scores['rmse']:.2f} | MAE: {scores['mae']:.2f} | MAPE: {scores['mape']:.1f}%")
         else:
             st.info("⚠️ No overlapping actual data in forecast horizon for evaluation.")
 
@@ -133,3 +272,67 @@ with tab2:
             file_name="uploaded_forecast_results.csv",
             mime="text/csv"
         )
+
+# ===================================
+# 🗂️ TAB 3: Sector Rollups
+# ===================================
+with tab3:
+    st.subheader("🗂️ Actual vs Predicted by Sector")
+
+    # Bounds come from the daily (or finest available) rollup, which stays small for any history length
+    bounds = load_rollup("day" if "day" in ROLLUP_LEVELS else ROLLUP_LEVELS[0]) if ROLLUP_LEVELS else None
+    if bounds is None or bounds.empty:
+        st.warning("No rollups found. Run scripts/10_rollup_predictions.py after training.")
+    else:
+        sectors = sorted(bounds["sector"].unique())
+        col1, col2, col3, col4 = st.columns(4)
+        rolled = set(bounds["model"])
+        rollup_models = [m for m in MODEL_LABELS if m in rolled] + sorted(rolled - set(MODEL_LABELS))
+        rollup_model = col1.selectbox("Model:", rollup_models, format_func=lambda m: MODEL_LABELS.get(m, m))
+        kinds = sorted(bounds.loc[bounds["model"] == rollup_model, "kind"].unique())
+        scored = [k for k in ("test", "insample") if k in kinds]  # kinds with actuals to compare against
+        rollup_kind = col2.selectbox("Kind:", kinds, index=kinds.index(scored[0]) if scored else 0)
+        rollup_sector = col3.selectbox("Sector:", sectors, index=sectors.index("Total") if "Total" in sectors else 0)
+        stat = col4.selectbox("Statistic per period:", ["sum", "mean", "min", "max"])
+
+        first = bounds["period"].min().to_pydatetime()
+        last = (bounds["period"].max() + pd.Timedelta(hours=23)).to_pydatetime()
+        start, end = first, last
+        if last > first:
+            start, end = st.slider("Range:", min_value=first, max_value=last, value=(first, last),
+                                   step=timedelta(hours=1), format="YYYY-MM-DD HH:mm", key="rollup_range")
+
+        # --- Finest granularity whose period count fits the point budget ---
+        budget = config.get("dashboard", {}).get("plot_points", 2000)
+        auto = pick_granularity(start, end, budget)
+        candidates = [g for g in ROLLUP_LEVELS if list(GRANULARITIES).index(g) >= list(GRANULARITIES).index(auto)]
+        granularity = st.selectbox("Granularity:", candidates or ROLLUP_LEVELS[-1:])
+        rows = load_rollup(granularity, rollup_sector)
+
+        # Rows are sorted by model, kind then period; periods overlapping the range are included whole
+        rows = rows[(rows["model"] == rollup_model) & (rows["kind"] == rollup_kind)]
+        periods = rows["period"].to_numpy()
+        lo = periods.searchsorted(period_start([start], granularity).iloc[0].to_datetime64(), side="left")
+        hi = periods.searchsorted(pd.Timestamp(end).to_datetime64(), side="right")
+        view = rows.iloc[lo:hi]
+        st.caption(f"{len(view):,} {granularity} periods, {int(view['n'].sum()):,} hourly predictions "
+                   f"({auto} is the finest granularity within {budget:,} points)")
+
+        plot_df = view.rename(columns={f"actual_{stat}": "actual", f"predicted_{stat}": "predicted"})
+        fig = px.line(
+            plot_df.melt(id_vars=["period"], value_vars=["actual", "predicted"]),
+            x="period",
+            y="value",
+            color="variable",
+            labels={"period": "Period start", "variable": "Legend",
+                    "value": f"Energy (kWh, {'total' if stat == 'sum' else stat + ' hourly total'} per {granularity})"},
+            title=f"{MODEL_LABELS.get(rollup_model, rollup_model)} ({rollup_kind}): {rollup_sector}",
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        # --- Errors over the range for every model on the selected kind, from the stored error sums ---
+        sector_rows = load_rollup(granularity, rollup_sector)
+        in_range = sector_rows["period"].between(period_start([start], granularity).iloc[0], pd.Timestamp(end))
+        errors = range_errors(sector_rows[in_range & (sector_rows["kind"] == rollup_kind)]).droplevel("kind")
+        st.markdown(f"#### 📉 Errors over the Selected Range ({rollup_kind})")
+        st.dataframe(errors.rename(index=lambda m: MODEL_LABELS.get(m, m)))
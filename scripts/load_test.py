@@ -0,0 +1,140 @@
+"""
+Script: load_test.py
+Description: Load generator for the forecast API (scripts/serve.py). Keeps `concurrency`
+             keep-alive connections busy for `duration` seconds, each request asking for a random
+             set of series, and reports throughput and client-side p50/p90/p99 latency next to
+             the server's own histograms.
+
+Usage:
+    python scripts/serve.py &
+    python scripts/load_test.py [--model XGBoost] [--concurrency 32] [--series-per-request 8]
+                                [--duration 10] [--horizon 24] [--rate 500]
+
+Without --rate every connection sends its next request as soon as the previous one returns
+(closed loop, measures capacity). With --rate requests are scheduled at a fixed total rate and
+latency counts from the scheduled send time, so a stalled server cannot hide queueing delay.
+One JSON line per run is appended to `serving.load_test.history`.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+
+
+async def request(reader, writer, method, path, payload=None):
+    """One HTTP/1.1 request on an open keep-alive connection; returns (status, parsed body)."""
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: load-test\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length)
+    return status, (json.loads(data) if data[:1] in (b"{", b"[") else data.decode())
+
+
+async def worker(host, port, args, series, deadline, interval, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    # Open loop: workers are staggered so the requests arrive evenly rather than in bursts
+    scheduled = time.perf_counter() + (interval * seed / args.concurrency if interval else 0)
+    try:
+        while True:
+            if interval:
+                scheduled += interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+            if scheduled >= deadline:
+                break
+            payload = {"model": args.model, "series": rng.sample(series, min(args.series_per_request, len(series))),
+                       "horizon": args.horizon}
+            status, _ = await request(reader, writer, "POST", "/forecast", payload)
+            (latencies if status == 200 else errors).append(time.perf_counter() - scheduled)
+    finally:
+        writer.close()
+
+
+async def main(args, host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    # Series ids: a one-hour forecast of every series
+    status, listing = await request(reader, writer, "POST", "/forecast", {"model": args.model, "horizon": 1})
+    if status != 200:
+        raise SystemExit(f"Server refused {args.model}: {listing}")
+    series = sorted(listing["forecasts"])
+
+    latencies, errors = [], []
+    interval = args.concurrency / args.rate if args.rate else None
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        worker(host, port, args, series, start + args.duration, interval, latencies, errors, seed)
+        for seed in range(args.concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    _, health = await request(reader, writer, "GET", "/health")
+    writer.close()
+
+    ms = np.array(latencies) * 1000
+    return {
+        "model": args.model,
+        "concurrency": args.concurrency,
+        "series_per_request": min(args.series_per_request, len(series)),
+        "horizon": args.horizon,
+        "rate": args.rate,
+        "seconds": round(elapsed, 2),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "series_per_s": round(len(latencies) * min(args.series_per_request, len(series)) / elapsed, 1),
+        **{f"p{q}_ms": round(float(np.percentile(ms, q)), 2) if len(ms) else None for q in (50, 90, 99)},
+        "max_ms": round(float(ms.max()), 2) if len(ms) else None,
+        "server": health["models"].get(args.model),
+    }
+
+
+if __name__ == "__main__":
+    config = load_config()
+    serving_cfg = config.get("serving", {})
+    lt_cfg = serving_cfg.get("load_test", {})
+
+    parser = argparse.ArgumentParser(description="Measure forecast API throughput and latency.")
+    parser.add_argument("--host", default=serving_cfg.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=serving_cfg.get("port", 8600))
+    parser.add_argument("--model", default="XGBoost")
+    parser.add_argument("--concurrency", type=int, default=lt_cfg.get("concurrency", 32))
+    parser.add_argument("--series-per-request", type=int, default=lt_cfg.get("series_per_request", 8))
+    parser.add_argument("--duration", type=float, default=lt_cfg.get("duration_s", 10))
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--rate", type=float, default=None, help="Total requests per second (default: closed loop)")
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args, args.host, args.port))
+    result = {"time": datetime.now().isoformat(timespec="seconds"), **result}
+    print(f"{result['requests']:,} requests ({result['errors']} errors) in {result['seconds']}s: "
+          f"{result['requests_per_s']:,} req/s, {result['series_per_s']:,} series/s; "
+          f"p50 {result['p50_ms']} ms, p90 {result['p90_ms']} ms, p99 {result['p99_ms']} ms, max {result['max_ms']} ms")
+    print(f"Server: {result['server']}")
+
+    history = lt_cfg.get("history", "results/benchmarks/serving.jsonl")
+    os.makedirs(os.path.dirname(history), exist_ok=True)
+    with open(history, "a") as f:
+        f.write(json.dumps(result) + "\n")
@@ -6,10 +6,27 @@ Created: 2025-05-21
 """
 
 import os
-import subprocess
+import sys
+import argparse
 import logging
 
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.pipeline import run_pipeline
+
+# --- Arguments ---
+parser = argparse.ArgumentParser(description="Run the energy forecasting pipeline.")
+parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: pipeline.workers)")
+parser.add_argument("--steps", nargs="*", default=None, help="Only run these steps and their upstream steps")
+parser.add_argument("--no-cache", action="store_true", help="Run every step even if its cached outputs are valid")
+parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None,
+                    help="Profile each executed step; reports go to instrumentation.profile_dir")
+parser.add_argument("--in-process", action="store_true",
+                    help="Run the steps one after another in this process, passing tables in memory")
+args = parser.parse_args()
+
 # --- Setup Logging ---
+os.makedirs("logs", exist_ok=True)
 logging.basicConfig(
     filename='logs/main_pipeline.log',
     level=logging.INFO,
@@ -17,29 +34,17 @@ logging.basicConfig(
 )
 logging.info("Starting full pipeline...")
 
-# --- Ordered pipeline steps ---
-PIPELINE_STEPS = [
-    "scripts/01_prepare_input.py",
-    "scripts/03_train_prophet.py",
-    "scripts/04_train_xgboost.py",
-    "scripts/05_train_linear.py",
-    "scripts/06_evaluate_models.py"
-]
-
-# --- Run each script ---
-for step in PIPELINE_STEPS:
-    logging.info(f"Running step: {step}")
-    print(f"\n🚀 Running: {step}")
-    
-    result = subprocess.run(["python", step], capture_output=True, text=True)
+# --- Run the step DAG declared in config ---
+config = load_config()
+timings = run_pipeline(config, workers=args.workers, targets=args.steps, use_cache=not args.no_cache,
+                       profile=args.profile, in_process=args.in_process)
 
-    if result.returncode != 0:
-        logging.error(f"❌ Failed at step: {step}\n{result.stderr}")
-        print(f"❌ Error in {step}:\n{result.stderr}")
-        break
-    else:
-        logging.info(f"✅ Completed: {step}")
-        print(f"✅ Completed: {step}")
+print("\n⏱️ Step timings:")
+for t in timings:
+    print(f"  {t['step']:<22} {t['status']:<8} {t['seconds']:>8.2f}s")
 
 logging.info("Pipeline finished.")
+if any(t["status"] in ("failed", "skipped") for t in timings):
+    print("\n❌ Pipeline did not complete. Check /logs for full details.")
+    sys.exit(1)
 print("\n✅ All steps completed. Check /logs for full details.")
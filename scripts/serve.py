@@ -0,0 +1,138 @@
+"""
+Script: serve.py
+Description: Local forecast API. Loads the registered XGBoost / Linear Regression / Prophet models
+             and the feature state once, then answers forecast requests over HTTP from an asyncio
+             server, micro-batching concurrent requests per model (see scripts/utils/serving.py).
+
+Usage:
+    python scripts/serve.py [--host 127.0.0.1] [--port 8600] [--models XGBoost LinearRegression]
+
+Endpoints:
+    POST /forecast   {"model": "XGBoost", "series": ["Residential", "Factory"], "horizon": 24}
+                     -> {"model", "version", "level", "forecasts": {series: {timestamp, predicted, lower, upper}}}
+                     An empty or missing "series" forecasts every series.
+    GET  /health     loaded models, series count, p50/p99 latency and mean batch size per model
+    GET  /metrics    Prometheus text: latency and batch-size histograms
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.load_config import load_config
+from scripts.utils.serving import ForecastService, ServingError
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+# --- Minimal HTTP/1.1 over asyncio streams (keep-alive, Content-Length bodies) ---
+async def read_request(reader):
+    """(method, path, headers, body), or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path, headers, body
+
+
+def response(status, payload, content_type="application/json"):
+    body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode() + body
+
+
+async def route(service, method, path, body):
+    if path == "/forecast":
+        if method != "POST":
+            return response(405, {"error": "Use POST."})
+        try:
+            request = json.loads(body or b"{}")
+            result = await service.forecast(request.get("model", "XGBoost"), request.get("series", []),
+                                            request.get("horizon", 24))
+        except (ServingError, ValueError, TypeError, AttributeError) as e:
+            return response(400, {"error": str(e)})
+        return response(200, result)
+    if path == "/health":
+        return response(200, service.health())
+    if path == "/metrics":
+        return response(200, service.metrics(), "text/plain; version=0.0.4")
+    return response(404, {"error": f"Unknown path {path}"})
+
+
+def make_handler(service):
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    writer.write(await route(service, method, path, body))
+                except Exception as e:
+                    logging.exception(f"{method} {path} failed")
+                    writer.write(response(500, {"error": f"{type(e).__name__}: {e}"}))
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent a malformed request line
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(service, host, port):
+    service.start()
+    server = await asyncio.start_server(make_handler(service), host, port)
+    print(f"Serving {list(service.batchers)} for {len(service.series)} series on http://{host}:{port}")
+    logging.info(f"Listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    config = load_config()
+    serving_cfg = config.get("serving", {})
+
+    parser = argparse.ArgumentParser(description="Serve forecasts from the registered models.")
+    parser.add_argument("--host", default=serving_cfg.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=serving_cfg.get("port", 8600))
+    parser.add_argument("--models", nargs="*", default=serving_cfg.get("models"),
+                        help="Models to load (default: serving.models)")
+    args = parser.parse_args()
+
+    # --- Setup Logging ---
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        filename='logs/serve.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    service = ForecastService(
+        config,
+        models=args.models,
+        max_horizon=serving_cfg.get("max_horizon_hours", 168),
+        max_series=serving_cfg.get("max_batch_series", 2048),
+        max_wait=serving_cfg.get("max_wait_ms", 2) / 1000,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
@@ -0,0 +1,88 @@
+"""
+Module: backtest.py
+Description: Stage 8. Rolling-origin backtest of every model type with per-fold, per-horizon
+             error tables (see scripts/utils/backtest.py). The residuals calibrate each model's
+             prediction intervals, which are stored next to the model in the registry.
+"""
+
+import os
+import logging
+
+from scripts.utils.storage import table_path, read_table, write_table, csv_export_enabled
+from scripts.utils.backtest import load_shared, make_folds, run_backtest
+from scripts.utils.intervals import calibrate, split_by_entry
+from scripts.utils.registry import save_intervals
+
+
+def run(config, inputs=None):
+    """Returns {"backtest_errors": errors per model, fold and horizon, "backtest_summary": ...}."""
+    inputs = inputs or {}
+    bt_cfg = config["backtest"]
+    horizon = config["modeling"]["horizon_hours"]
+
+    # --- Load the feature matrix once; folds are row ranges into it ---
+    input_file = table_path(config, config["data_paths"]["processed"], "processed_data_features")
+    recursive = config["modeling"].get("forecast_mode") == "recursive"
+    frame = inputs["processed_data_features"] if "processed_data_features" in inputs else read_table(input_file)
+    shared = load_shared(frame, config["features"], recursive)
+    logging.info(f"Loaded feature matrix with shape {shared['X'].shape}")
+
+    folds = make_folds(
+        shared["ts"],
+        horizon=horizon,
+        step=bt_cfg["step_hours"],
+        n_folds=bt_cfg["folds"],
+        mode=bt_cfg["mode"],
+        min_train=bt_cfg["min_train_hours"],
+        window=bt_cfg.get("window_hours"),
+    )
+    logging.info(f"{len(folds)} {bt_cfg['mode']} folds, horizon {horizon}h, step {bt_cfg['step_hours']}h")
+
+    # --- Model settings (same hyperparameters as the trainers) ---
+    # Only yhat is scored, so Prophet skips its uncertainty sampling here
+    prophet_cfg = {k: v for k, v in config["prophet"].items() if k != "batch"}
+    prophet_cfg["uncertainty_samples"] = 0
+    model_cfgs = {
+        "XGBoost": dict({k: config["xgboost"][k] for k in ("n_estimators", "max_depth", "learning_rate")},
+                        categorical_ids=config["xgboost"].get("categorical_ids", True)),
+        "LinearRegression": config["linear_regression"],
+        "Prophet": prophet_cfg,
+    }
+    tasks = [(name, model_cfgs[name], fold) for name in bt_cfg["models"] for fold in folds]
+
+    errors, residuals = run_backtest(tasks, bt_cfg.get("workers", 1), (input_file, config["features"], recursive))
+
+    # --- Save ---
+    out_dir = os.path.join(config["model_paths"]["results"], "backtest")
+    os.makedirs(out_dir, exist_ok=True)
+    errors_file = table_path(config, out_dir, "backtest_errors")
+    write_table(errors, errors_file, csv_export=csv_export_enabled(config))
+
+    # Summary across folds: errors weighted by the number of scored rows
+    weighted = errors.assign(sq=errors["rmse"] ** 2 * errors["n"], abs=errors["mae"] * errors["n"])
+    summary = weighted.groupby("model").agg(n=("n", "sum"), sq=("sq", "sum"), abs=("abs", "sum"), folds=("fold", "nunique"))
+    summary["RMSE"] = (summary["sq"] / summary["n"]) ** 0.5
+    summary["MAE"] = summary["abs"] / summary["n"]
+    summary = summary[["folds", "n", "RMSE", "MAE"]].round(3).reset_index().rename(columns={"model": "Model"})
+    summary.to_csv(os.path.join(out_dir, "backtest_summary.csv"), index=False)
+    logging.info(f"Backtest errors saved to {errors_file}")
+
+    # --- Calibrate prediction intervals from the residuals, per model ---
+    write_table(residuals, table_path(config, out_dir, "backtest_residuals"), csv_export=csv_export_enabled(config))
+    iv_cfg = config.get("intervals", {})
+    levels = iv_cfg.get("levels", [0.8, 0.95])
+    for model_name, resid in residuals.groupby("model"):
+        table = calibrate(resid, levels, iv_cfg.get("method", "conformal"), iv_cfg.get("min_samples", 20))
+        # Stored next to the model they apply to: one entry per series for Prophet
+        for name, rows in split_by_entry(model_name, table).items():
+            save_intervals(config, name, rows, {
+                "method": iv_cfg.get("method", "conformal"),
+                "levels": levels,
+                "min_samples": iv_cfg.get("min_samples", 20),
+                "residuals": len(resid),
+                "folds": [str(f["origin"]) for f in folds],
+                "backtest_mode": bt_cfg["mode"],
+            })
+        logging.info(f"{model_name}: intervals calibrated from {len(resid)} residuals "
+                     f"({(table['series'] != '*').sum()} series/horizon/level rows)")
+    return {"backtest_errors": errors, "backtest_summary": summary, "backtest_residuals": residuals}
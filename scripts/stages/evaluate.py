@@ -0,0 +1,57 @@
+"""
+Module: evaluate.py
+Description: Stage 6. Scores the latest run of every expected model from the prediction store
+             and writes the comparison table and bar plot.
+"""
+
+import os
+import logging
+import pandas as pd
+
+from scripts.utils.prediction_store import query_predictions, latest_run
+from scripts.utils.metrics import compute_metrics
+from scripts.utils.plots import plot_model_comparison
+
+
+def run(config, inputs=None):
+    """Returns {"model_evaluation_summary": one row of metrics per model}."""
+    pred_path = config["model_paths"]["predictions"]
+    plot_path = config["model_paths"]["plots"]
+
+    # --- Latest predictions of every expected model from the prediction store ---
+    expected = config["modeling"]["models"]
+    metric_names = config["modeling"]["evaluation_metrics"]
+
+    missing = [m for m in expected if latest_run(config, m) is None]
+    if missing:
+        raise RuntimeError(f"No predictions in the prediction store for: {', '.join(missing)}. Run their training steps first.")
+
+    # Only rows with actuals are scored: held-out test rows, and in-sample fits for Prophet
+    predictions = query_predictions(config, models=expected, kinds=["test", "insample"],
+                                    columns=["series", "timestamp", "actual", "predicted"], latest=True)
+    predictions = predictions.dropna(subset=["actual", "predicted"]).rename(columns={"model": "Model"})
+    empty = [m for m in expected if m not in set(predictions["Model"])]
+    if empty:
+        raise RuntimeError(f"Latest run has no scorable predictions for: {', '.join(empty)}.")
+    for model_name, run_id in predictions.groupby("Model", observed=True)["run_id"].first().items():
+        logging.info(f"Evaluating {model_name} from run {run_id}")
+
+    # --- Score all models in one pass ---
+    # MASE is scaled per series, so the seasonal-naive lag never reaches into another series
+    results_df = compute_metrics(predictions, ["Model"], time_col="timestamp", series_col="series",
+                                 metrics=metric_names)
+    results_df = results_df.drop(columns="n").rename(columns={m: m.upper() for m in metric_names}).round(3)
+    results_df["Model"] = pd.Categorical(results_df["Model"], categories=expected, ordered=True)
+    results_df = results_df.sort_values("Model").reset_index(drop=True)
+    for row in results_df.itertuples():
+        logging.info(f"{row.Model} evaluated: RMSE={row.RMSE:.2f}, MAE={row.MAE:.2f}")
+
+    # --- Save Summary and Plot ---
+    os.makedirs(pred_path, exist_ok=True)
+    summary_path = os.path.join(pred_path, "model_evaluation_summary.csv")
+    results_df.to_csv(summary_path, index=False)
+    logging.info(f"Saved summary to {summary_path}")
+
+    plot_model_comparison(results_df, os.path.join(plot_path, "model_comparison.png"))
+    logging.info("Comparison plot saved.")
+    return {"model_evaluation_summary": results_df}
@@ -0,0 +1,50 @@
+"""
+Module: prepare_input.py
+Description: Stage 1. Builds the processed input table: the one-year sample series, or the
+             synthetic meters (per-sector totals or one series per meter) when
+             synthetic.use_in_pipeline is set.
+"""
+
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from scripts.utils.storage import table_path, write_table, csv_export_enabled
+
+
+def sample_series():
+    """One year of hourly demand with a daily cycle, yearly seasonality and noise."""
+    date_range = pd.date_range(start="2024-01-01", end="2024-12-31 23:00", freq="H")
+    rng = np.random.RandomState(42)
+    base_demand = 3 + 2 * np.sin(2 * np.pi * date_range.hour / 24)  # daily cycle
+    seasonal_effect = 1 + 0.5 * np.cos(2 * np.pi * date_range.dayofyear / 365)  # yearly seasonality
+    noise = rng.normal(0, 0.2, len(date_range))
+    energy_kwh = (base_demand * seasonal_effect + noise).round(2)
+    return pd.DataFrame({"timestamp": date_range, "energy_kwh": energy_kwh})
+
+
+def run(config, inputs=None):
+    """Write processed_data and return it as {"processed_data": df}."""
+    output_dir = config['data_paths']['processed']
+    os.makedirs(output_dir, exist_ok=True)
+
+    if config.get("synthetic", {}).get("use_in_pipeline", False):
+        # Synthetic meters (run 00_generate_synthetic.py first)
+        from scripts.utils.synthetic import sector_totals, meter_series
+        series_col = config["features"]["series_col"]
+        if config["synthetic"].get("series", "sector") == "meter":
+            # The meter's sector is kept as `segment`, a static per-series column (features.static)
+            df = meter_series(config["data_paths"]["synthetic"], columns=("meter_id", "sector", "timestamp", "energy_kwh"))
+            df = df.rename(columns={"meter_id": series_col, "sector": "segment"}).astype({"segment": str})
+            logging.info("Per-meter series of synthetic meters loaded.")
+        else:
+            df = sector_totals(config["data_paths"]["synthetic"]).rename(columns={"sector": series_col})
+            logging.info("Per-sector totals of synthetic meters loaded.")
+    else:
+        df = sample_series()
+
+    output_file = table_path(config, output_dir, "processed_data")
+    write_table(df, output_file, csv_export=csv_export_enabled(config))
+    logging.info(f"Processed data ({len(df)} rows) saved to {output_file}")
+    return {"processed_data": df}
@@ -0,0 +1,123 @@
+"""
+Module: rollup.py
+Description: Stage 10. Maintains the pre-aggregated rollups of the prediction store (see
+             scripts/utils/rollups.py) that the dashboard reads for long-range views. Only
+             prediction parts written since the last run are aggregated and merged; a model whose
+             latest run changed has its rows rebuilt from that run.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import pandas as pd
+
+from scripts.utils.storage import table_path, read_table, write_table, table_columns, csv_export_enabled
+from scripts.utils.prediction_store import latest_run, run_parts, read_parts
+from scripts.utils.rollups import aggregate, merge, refresh, COLUMNS
+
+
+def rollup_path(config, granularity):
+    path = config.get("rollups", {}).get("path", "results/predictions/rollups")
+    return table_path(config, path, granularity)
+
+
+def sector_map(config, inputs):
+    """{series id: sector} from the feature state table, or None when series are their own sector."""
+    series_col = config["features"].get("series_col")
+    sector_col = config.get("rollups", {}).get("sector_col", "segment")
+    name = "processed_data_features_state"
+    if name in inputs:
+        state = inputs[name]
+    else:
+        path = table_path(config, config["data_paths"]["processed"], name)
+        if not os.path.exists(path) or not {series_col, sector_col} <= set(table_columns(path)):
+            return None
+        state = read_table(path, columns=[series_col, sector_col])
+    if not {series_col, sector_col} <= set(state.columns):
+        return None
+    pairs = state[[series_col, sector_col]].drop_duplicates(series_col)
+    return dict(zip(pairs[series_col].astype(str), pairs[sector_col].astype(str)))
+
+
+def run(config, inputs=None):
+    """Returns {"rollup_<granularity>": rollup table} for every configured granularity."""
+    inputs = inputs or {}
+    rollup_cfg = config.get("rollups", {})
+    # Coarser rollups are recomputed from the hourly one, which is therefore always kept
+    granularities = ["hour"] + [g for g in rollup_cfg.get("granularities", ["hour", "day", "week", "month"]) if g != "hour"]
+    models = rollup_cfg.get("models") or config["modeling"]["models"]
+    root = rollup_cfg.get("path", "results/predictions/rollups")
+    state_file = os.path.join(root, "_state.json")
+
+    # --- Sector of every series; a new mapping invalidates every stored rollup ---
+    sectors = sector_map(config, inputs)
+    mapping_hash = hashlib.md5(json.dumps(sorted((sectors or {}).items())).encode()).hexdigest()
+    total = sectors is not None and len(set(sectors.values())) > 1
+
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+    paths = {g: rollup_path(config, g) for g in granularities}
+    if (state.get("sectors") != mapping_hash or state.get("columns") != COLUMNS
+            or not all(os.path.exists(p) for p in paths.values())):
+        logging.info("Sector mapping or rollup tables changed; rebuilding all rollups.")
+        state = {"models": {}}
+    state["sectors"] = mapping_hash
+    state["columns"] = COLUMNS
+
+    # --- Work out which prediction parts are new per model ---
+    fresh, rebuilt = [], []
+    for model in models:
+        run_id = latest_run(config, model)
+        if run_id is None:
+            logging.warning(f"No predictions for {model}; skipped.")
+            continue
+        seen = state["models"].get(model, {})
+        parts = run_parts(config, model, run_id)
+        if seen.get("run_id") != run_id:
+            rebuilt.append(model)
+            new_parts = parts
+        else:
+            new_parts = [p for p in parts if p not in set(seen.get("parts", []))]
+        if new_parts:
+            fresh.append(read_parts(config, model, run_id, new_parts,
+                                    columns=["series", "timestamp", "kind", "actual", "predicted"]))
+        state["models"][model] = {"run_id": run_id, "parts": parts}
+        logging.info(f"{model}: run {run_id}, {len(new_parts)} new of {len(parts)} parts")
+
+    tables = {}
+    if not fresh and not rebuilt and state.get("granularities") == granularities:
+        logging.info("No new predictions; rollups are up to date.")
+        for g in granularities:
+            tables[f"rollup_{g}"] = read_table(paths[g])
+        return tables
+
+    # --- Sum the new rows per hour and merge them into the hourly table; coarser periods
+    # holding new hours are recomputed from it ---
+    new_rows = pd.concat(fresh, ignore_index=True) if fresh else None
+    hourly = aggregate(new_rows, sectors, total=total) if new_rows is not None and not new_rows.empty else None
+    hour_table = None
+    for g in granularities:
+        existing = read_table(paths[g]) if state.get("granularities") is not None and os.path.exists(paths[g]) else None
+        if existing is not None:
+            existing = existing[~existing["model"].isin(rebuilt)]
+        if hourly is None:
+            table = existing if existing is not None else pd.DataFrame(columns=COLUMNS)
+        elif g == "hour":
+            table = merge(existing, hourly)
+        else:
+            table = refresh(existing, hour_table, hourly, g)
+        if g == "hour":
+            hour_table = table
+        write_table(table, paths[g], csv_export=csv_export_enabled(config))
+        tables[f"rollup_{g}"] = table
+        logging.info(f"Saved {len(table):,} {g} rollup rows to {paths[g]}")
+
+    state["granularities"] = granularities
+    os.makedirs(root, exist_ok=True)
+    with open(state_file + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_file + ".tmp", state_file)
+    return tables
@@ -0,0 +1,114 @@
+"""
+Module: train_linear.py
+Description: Stage 5. Fits one linear regression per series in batched NumPy passes (see
+             scripts/utils/linear.py), or updates the registered model with new rows by recursive
+             least squares in online mode, and appends its test predictions and recursive
+             forecast to the prediction store.
+"""
+
+import os
+import logging
+import pandas as pd
+
+from scripts.utils.features import feature_columns, time_split
+from scripts.utils.registry import save_model, load_model, config_hash
+from scripts.utils.linear import BatchedLinearRegression
+from scripts.utils.metrics import point_metrics
+from scripts.utils.recursive import recursive_forecast
+from scripts.utils.prediction_store import append_predictions, current_run_id
+from scripts.utils.instrument import span
+from scripts.utils.stages import load_input
+from scripts.utils.plots import plot_predictions
+
+
+def previous_online_model(config, train_ts):
+    """The registered online model, if it was fitted with this config on a prefix of `train_ts`."""
+    try:
+        model, meta = load_model(config, "linear_regression")
+    except FileNotFoundError:
+        return None, None
+    if (isinstance(model, BatchedLinearRegression) and model.online and hasattr(model, "G_")
+            and meta["config_hash"] == config_hash(config, ["features", "linear_regression"])
+            and meta["train_start"] == str(train_ts.min())
+            and pd.Timestamp(meta["train_end"]) <= train_ts.max()):
+        return model, pd.Timestamp(meta["train_end"])
+    return None, None
+
+
+def run(config, inputs=None):
+    """Returns {"predictions_linear_regression": test predictions}."""
+    lr_cfg = config["linear_regression"]
+    features = feature_columns(config["features"])
+    target = config["features"]["target"]
+    series_col = config["features"]["series_col"]
+
+    df = load_input(config, inputs or {}, "processed_data_features", ["timestamp", target] + features, optional=[series_col])
+    id_columns = [series_col] if series_col in df.columns else []
+    logging.info(f"Loaded feature-engineered data with shape {df.shape}")
+
+    # The series column rides along in X when every series gets its own coefficients
+    per_series = lr_cfg.get("per_series", True) and bool(id_columns)
+    X = df[features + (id_columns if per_series else [])]
+    y = df[target]
+
+    # Time-ordered split: every series is cut at the same timestamp
+    test = time_split(df["timestamp"], 0.2)
+    X_train, X_test, y_train, y_test = X[~test], X[test], y[~test], y[test]
+    train_ts = df.loc[X_train.index, "timestamp"]
+
+    model, fitted_until = None, None
+    if lr_cfg.get("online", False):
+        model, fitted_until = previous_online_model(config, train_ts)
+    if model is not None:
+        new = (train_ts > fitted_until).to_numpy()
+        if model.series_col in X_train.columns:
+            # Series added since the last fit bring their whole history
+            new |= ~X_train[model.series_col].isin(model.series_).to_numpy()
+        with span("update"):
+            model.update(X_train[new], y_train[new])
+        logging.info(f"Online update with {int(new.sum())} new rows (model fitted until {fitted_until}).")
+    else:
+        model = BatchedLinearRegression(
+            fit_intercept=lr_cfg["fit_intercept"],
+            series_col=series_col if per_series else None,
+            online=lr_cfg.get("online", False),
+            forgetting_factor=lr_cfg.get("forgetting_factor", 1.0),
+        )
+        with span("fit"):
+            model.fit(X_train, y_train)
+        logging.info(f"Linear Regression trained for {len(model.series_)} series.")
+
+    with span("predict"):
+        y_pred = model.predict(X_test)
+    scores = point_metrics(y_test, y_pred, config["modeling"]["evaluation_metrics"])
+    logging.info(f"RMSE: {scores['rmse']:.2f}, MAE: {scores['mae']:.2f}")
+
+    version = save_model(config, "linear_regression", model, "sklearn", list(X.columns), train_ts,
+                         metrics=scores, config_sections=["features", "linear_regression"])
+    logging.info(f"Model saved to registry as linear_regression/{version}")
+
+    # Forecast and test rows go to the prediction store as one run
+    run_id = current_run_id(config)
+
+    # --- Recursive multi-step forecast past the end of the data ---
+    if config["modeling"].get("forecast_mode") == "recursive":
+        horizon = config["modeling"]["horizon_hours"]
+        ids = None
+        if per_series:
+            ids = pd.DataFrame({series_col: model.series_}, index=model.series_)
+        forecast = recursive_forecast(model.predict, df[id_columns + ["timestamp", target]], config["features"], horizon,
+                                      categorical=ids)
+        append_predictions(config, forecast, "LinearRegression", "forecast", run_id=run_id, series_col=series_col)
+        logging.info(f"Recursive {horizon}h forecast saved for {forecast['horizon'].eq(1).sum()} series")
+
+    results_df = df.loc[X_test.index, id_columns + ["timestamp"]].copy()
+    results_df["actual"] = y_test.values
+    results_df["predicted"] = y_pred
+
+    append_predictions(config, results_df, "LinearRegression", "test", run_id=run_id, series_col=series_col)
+    logging.info(f"Test predictions appended to the prediction store (run {run_id})")
+
+    plot_predictions(results_df, "Linear Regression: Prediction vs Actual",
+                     os.path.join(config["model_paths"]["plots"], "plot_forecast_linear_regression.png"))
+    logging.info("Linear Regression results saved and plotted.")
+    return {"predictions_linear_regression": results_df}
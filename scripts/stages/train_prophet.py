@@ -0,0 +1,128 @@
+"""
+Module: train_prophet.py
+Description: Stage 3. Trains one Prophet model per series (in a process pool), warm-starting from
+             the registry when only new history was added, and appends the fitted history and
+             forecast to the prediction store.
+"""
+
+import os
+import logging
+import pandas as pd
+
+from scripts.utils.registry import save_model, load_model, load_metadata, config_hash
+from scripts.utils.prophet_batch import fit_many, warm_start_params
+from scripts.utils.prediction_store import append_predictions, current_run_id
+from scripts.utils.instrument import span
+from scripts.utils.stages import load_input
+from scripts.utils import intervals
+
+
+def registry_name(series_id):
+    return intervals.registry_name("Prophet", series_id)
+
+
+def run(config, inputs=None):
+    """Returns {"predictions_prophet": fitted history and forecast of every series}."""
+    from prophet.serialize import model_from_json
+
+    series_col = config['features']['series_col']
+    df = load_input(config, inputs or {}, "processed_data_features", ["timestamp", "energy_kwh"], optional=[series_col])
+    logging.info(f"Loaded data with shape {df.shape}.")
+
+    # --- Prepare Data for Prophet (one frame per series) ---
+    df_prophet = df.rename(columns={"timestamp": "ds", "energy_kwh": "y"})
+    df_prophet["ds"] = pd.to_datetime(df_prophet["ds"])
+    if series_col in df_prophet.columns:
+        frames = {sid: g[["ds", "y"]].reset_index(drop=True) for sid, g in df_prophet.groupby(series_col, sort=True)}
+    else:
+        frames = {None: df_prophet[["ds", "y"]]}
+
+    # Registry hashes only the model hyperparameters, so batch settings do not block warm starts
+    batch_cfg = config['prophet'].get('batch', {})
+    model_config = dict(config, prophet={k: v for k, v in config['prophet'].items() if k != "batch"})
+    model_hash = config_hash(model_config, ["prophet"])
+
+    # --- Warm-start from registered models whose training data is a prefix of the new data ---
+    init_params = {}
+    if batch_cfg.get("warm_start", True):
+        for series_id, frame in frames.items():
+            try:
+                meta = load_metadata(config, registry_name(series_id))
+            except FileNotFoundError:
+                continue
+            if (meta["config_hash"] == model_hash
+                    and meta["train_start"] == str(frame["ds"].min())
+                    and pd.Timestamp(meta["train_end"]) <= frame["ds"].max()):
+                previous, _ = load_model(config, registry_name(series_id))
+                init_params[series_id] = warm_start_params(previous)
+        logging.info(f"Warm-starting {len(init_params)} of {len(frames)} series.")
+
+    # --- Train Prophet Models ---
+    horizon = config['modeling']['horizon_hours']
+    results = {}
+    fit_times = []
+    with span("fit"):
+        for result in fit_many(
+            frames,
+            model_config['prophet'],
+            horizon,
+            workers=batch_cfg.get("workers", 1),
+            stan_threads=batch_cfg.get("stan_threads", 1),
+            init_params=init_params,
+        ):
+            series_id = result["series"]
+            results[series_id] = result
+            fit_times.append({
+                "series": series_id if series_id is not None else "all",
+                "rows": len(frames[series_id]),
+                "fit_seconds": result["fit_seconds"],
+                "predict_seconds": result["predict_seconds"],
+                "warm_start": result["warm_start"],
+            })
+            logging.info(f"Fitted {registry_name(series_id)} in {result['fit_seconds']:.2f}s (warm start: {result['warm_start']})")
+    logging.info("Prophet model training completed.")
+
+    # --- Register Models ---
+    models = {}
+    for series_id, result in results.items():
+        models[series_id] = model_from_json(result["model_json"])
+        version = save_model(model_config, registry_name(series_id), models[series_id], "prophet", [],
+                             frames[series_id]["ds"], config_sections=["prophet"])
+        logging.info(f"Model saved to registry as {registry_name(series_id)}/{version}")
+
+    # --- Merge for Evaluation ---
+    merged_frames = []
+    for series_id, result in results.items():
+        merged = pd.merge(result["forecast"], frames[series_id], how="left", on="ds")
+        merged["actual"] = merged["y"]
+        merged["predicted"] = merged["yhat"]
+        if series_id is not None:
+            merged[series_col] = series_id
+        merged_frames.append(merged)
+    merged = pd.concat(merged_frames, ignore_index=True)
+    logging.info("Forecast generated.")
+
+    # Fitted history and the future horizon go to the prediction store as separate kinds
+    observed = merged["actual"].notna()
+    run_id = current_run_id(config)
+    append_predictions(config, merged[observed], "Prophet", "insample", run_id=run_id, series_col=series_col, time_col="ds")
+    append_predictions(config, merged[~observed], "Prophet", "forecast", run_id=run_id, series_col=series_col, time_col="ds")
+    logging.info(f"Predictions appended to the prediction store (run {run_id})")
+
+    fit_times_file = os.path.join(config['model_paths']['results'], "prophet_fit_times.csv")
+    pd.DataFrame(fit_times).to_csv(fit_times_file, index=False)
+    logging.info(f"Per-series fit times saved to {fit_times_file}")
+
+    # --- Plot (first series when several were fitted) ---
+    plots_path = config['model_paths']['plots']
+    os.makedirs(plots_path, exist_ok=True)
+    plot_file = os.path.join(plots_path, "prophet_forecast_plot.png")
+    first = sorted(results, key=str)[0]
+    with span("plot"):
+        import matplotlib.pyplot as plt
+        fig = models[first].plot(results[first]["forecast"])
+        fig.savefig(plot_file)
+        plt.close(fig)
+    logging.info(f"Plot saved to {plot_file}")
+    logging.info("Prophet pipeline completed successfully.")
+    return {"predictions_prophet": merged}
@@ -0,0 +1,100 @@
+"""
+Module: train_xgboost.py
+Description: Stage 4. Trains an XGBoost model on the engineered features, registers it and
+             appends its test predictions and recursive forecast to the prediction store.
+"""
+
+import os
+import logging
+
+from scripts.utils.features import feature_columns, time_split, global_design, series_categories
+from scripts.utils.registry import save_model, load_metadata
+from scripts.utils.metrics import point_metrics
+from scripts.utils.recursive import recursive_forecast
+from scripts.utils.prediction_store import append_predictions, current_run_id
+from scripts.utils.instrument import span
+from scripts.utils.stages import load_input
+from scripts.utils.plots import plot_predictions
+
+
+def run(config, inputs=None):
+    """Returns {"predictions_xgboost": test predictions}."""
+    from xgboost import XGBRegressor
+
+    features = feature_columns(config["features"])
+    target = config["features"]["target"]
+    series_col = config["features"]["series_col"]
+    static = list(config["features"].get("static", []))
+
+    df = load_input(config, inputs or {}, "processed_data_features", ["timestamp", target] + features,
+                    optional=[series_col] + static)
+    id_columns = [series_col] if series_col in df.columns else []
+    logging.info(f"Loaded feature-engineered data with shape {df.shape}")
+
+    # Global model: one booster for every series, told apart by the series id and static
+    # per-series columns (e.g. the sector of a meter) as native categorical features
+    X, categorical, dtypes = global_design(df, config["features"], config["xgboost"].get("categorical_ids", True))
+    y = df[target]
+
+    # Time-ordered split: every series is cut at the same timestamp
+    test = time_split(df["timestamp"], 0.2)
+    X_train, X_test, y_train, y_test = X[~test], X[test], y[~test], y[test]
+
+    params = {key: config["xgboost"][key] for key in ("n_estimators", "max_depth", "learning_rate")}
+    if config["xgboost"].get("tuning", {}).get("use_best", False):
+        # Parameters of the best trial from 09_tune_xgboost.py, if it was tuned on the same
+        # columns, categorical ids included
+        try:
+            tuned = load_metadata(config, "xgboost_tuned")
+        except FileNotFoundError:
+            tuned = None
+        if tuned is not None and tuned["features"] == features + categorical:
+            params = tuned["params"]
+            logging.info(f"Using tuned parameters from xgboost_tuned/{tuned['version']}: {params}")
+        else:
+            logging.warning("xgboost.tuning.use_best is set but no tuned model matches these features; using config values.")
+
+    model = XGBRegressor(
+        **params,
+        objective="reg:squarederror",
+        enable_categorical=bool(categorical),
+        random_state=42
+    )
+    with span("fit"):
+        model.fit(X_train, y_train)
+    logging.info(f"XGBoost model trained on {len(X_train)} rows"
+                 + (f" of {df[series_col].nunique()} series (categorical: {categorical})." if categorical else "."))
+
+    with span("predict"):
+        y_pred = model.predict(X_test)
+    scores = point_metrics(y_test, y_pred, config["modeling"]["evaluation_metrics"])
+    logging.info(f"RMSE: {scores['rmse']:.2f}, MAE: {scores['mae']:.2f}")
+
+    version = save_model(config, "xgboost", model, "xgboost", features + categorical, df.loc[X_train.index, "timestamp"],
+                         metrics=scores, config_sections=["features", "xgboost"])
+    logging.info(f"Model saved to registry as xgboost/{version}")
+
+    # Forecast and test rows go to the prediction store as one run
+    run_id = current_run_id(config)
+
+    # --- Recursive multi-step forecast past the end of the data ---
+    if config["modeling"].get("forecast_mode") == "recursive":
+        horizon = config["modeling"]["horizon_hours"]
+        ids = series_categories(df, config["features"], categorical, dtypes) if categorical else None
+        forecast = recursive_forecast(model.predict, df[id_columns + ["timestamp", target]], config["features"], horizon,
+                                      categorical=ids)
+        append_predictions(config, forecast, "XGBoost", "forecast", run_id=run_id, series_col=series_col)
+        logging.info(f"Recursive {horizon}h forecast saved for {forecast['horizon'].eq(1).sum()} series")
+
+    results_df = df.loc[X_test.index, id_columns + ["timestamp"]].copy()
+    results_df["actual"] = y_test.values
+    results_df["predicted"] = y_pred
+
+    append_predictions(config, results_df, "XGBoost", "test", run_id=run_id, series_col=series_col)
+    logging.info(f"Test predictions appended to the prediction store (run {run_id})")
+
+    plot_predictions(results_df, "XGBoost: Prediction vs Actual",
+                     os.path.join(config["model_paths"]["plots"], "plot_forecast_xgboost.png"))
+    logging.info("XGBoost results saved and plotted.")
+    return {"predictions_xgboost": results_df}
+
@@ -0,0 +1,51 @@
+"""
+Module: tune_xgboost.py
+Description: Hyperparameter search for the XGBoost trainer (see scripts/utils/tuning.py). The last
+             20% of timestamps are left out as the trainer's test period; the validation split
+             for early stopping is the end of what remains. The best booster and its parameters
+             are registered as `xgboost_tuned`.
+"""
+
+import os
+import logging
+import pandas as pd
+
+from scripts.utils.features import feature_columns, time_split, global_design
+from scripts.utils.registry import save_model
+from scripts.utils.tuning import tune
+from scripts.utils.stages import load_input
+
+TEST_FRACTION = 0.2  # the trainer's held-out share, never seen while tuning
+
+
+def run(config, inputs=None):
+    """Returns {"xgboost_trials": one row per trial and rung}."""
+    tune_cfg = config["xgboost"]["tuning"]
+    features = feature_columns(config["features"])
+    target = config["features"]["target"]
+    series_col = config["features"]["series_col"]
+    static = list(config["features"].get("static", []))
+
+    df = load_input(config, inputs or {}, "processed_data_features", ["timestamp", target] + features,
+                    optional=[series_col] + static)
+    # Same design matrix as the trainer, so the tuned parameters fit the model it trains
+    X, categorical, _ = global_design(df, config["features"], config["xgboost"].get("categorical_ids", True))
+    train = ~time_split(df["timestamp"], TEST_FRACTION)
+    df, X = df[train], X[train]
+    valid = time_split(df["timestamp"], tune_cfg.get("validation_fraction", 0.2))
+    logging.info(f"Tuning on {int((~valid).sum())} training / {int(valid.sum())} validation rows "
+                 f"({tune_cfg.get('method', 'halving')}, {tune_cfg.get('n_trials', 20)} trials)")
+
+    best, history = tune(X[~valid], df.loc[~valid, target], X[valid], df.loc[valid, target], tune_cfg)
+
+    params = dict(best["params"], n_estimators=best["best_iteration"] + 1)
+    version = save_model(config, "xgboost_tuned", best["booster"], "xgboost", features + categorical,
+                         df.loc[~valid, "timestamp"], metrics={"valid_rmse": best["score"]},
+                         config_sections=["features", "xgboost"], params=params)
+    logging.info(f"Best parameters saved to registry as xgboost_tuned/{version}: {params}")
+
+    trials = pd.DataFrame(history)
+    out_dir = os.path.join(config["model_paths"]["results"], "tuning")
+    os.makedirs(out_dir, exist_ok=True)
+    trials.to_csv(os.path.join(out_dir, "xgboost_trials.csv"), index=False)
+    return {"xgboost_trials": trials}
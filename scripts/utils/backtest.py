@@ -0,0 +1,215 @@
+"""
+Module: backtest.py
+Description: Rolling-origin backtesting. Folds are defined on the time axis (expanding or sliding
+             training window, `horizon` hours of test data after each origin) and run in parallel.
+             The feature matrix is sorted by time once, so every fold's train/test sets are
+             contiguous row ranges, i.e. numpy views rather than copies.
+"""
+
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scripts.utils.features import feature_columns, warmup_rows, global_design, series_categories
+from scripts.utils.recursive import recursive_forecast
+from scripts.utils.linear import BatchedLinearRegression
+from scripts.utils.metrics import compute_metrics, seasonal_naive_scale
+
+HOUR = np.timedelta64(1, "h")
+
+# Feature matrix shared with pool workers (inherited on fork, loaded per worker otherwise)
+_shared = {}
+
+
+def load_shared(frame, spec, recursive=False):
+    """Sort once by time and keep plain arrays that folds slice into.
+
+    With `recursive`, feature models are scored by rolling them forward over the test
+    window (see recursive.py) instead of one step ahead from observed lags.
+    """
+    features = feature_columns(spec)
+    target, series_col = spec["target"], spec["series_col"]
+    keys = ["timestamp", series_col] if series_col in frame.columns else ["timestamp"]
+    frame = frame.sort_values(keys, kind="stable").reset_index(drop=True)
+    # Series id and static columns as categoricals, exactly as the XGBoost trainer sees them
+    design, categorical, dtypes = global_design(frame, spec)
+    _shared.clear()
+    _shared.update({
+        "X": np.ascontiguousarray(frame[features].to_numpy(dtype=np.float32)),
+        "y": frame[target].to_numpy(dtype=np.float64),
+        "ts": frame["timestamp"].to_numpy(dtype="datetime64[ns]"),
+        "series": frame[series_col].to_numpy() if series_col in frame.columns else None,
+        "categorical": design[categorical],
+        "series_categories": series_categories(frame, spec, categorical, dtypes) if categorical else None,
+        "features": features,
+        "spec": spec,
+        "recursive": recursive,
+    })
+    return _shared
+
+
+def _init_worker(loader_args):
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    if not _shared:
+        from scripts.utils.storage import read_table
+        path, spec, recursive = loader_args
+        load_shared(read_table(path), spec, recursive)
+
+
+def make_folds(ts, horizon, step, n_folds, mode="expanding", min_train=24, window=None):
+    """Fold boundaries as row positions in the time-sorted arrays.
+
+    Returns a list of dicts with train_lo/train_hi/test_hi and the origin timestamp; test
+    rows are [train_hi, test_hi). The last fold's test window ends at the last timestamp.
+    """
+    if mode not in ("expanding", "sliding"):
+        raise ValueError(f"Unknown backtest mode '{mode}'. Use 'expanding' or 'sliding'.")
+    times = np.unique(ts)
+    folds = []
+    for k in range(n_folds):
+        origin_idx = len(times) - horizon - k * step
+        if origin_idx < min_train:
+            break
+        origin = times[origin_idx]
+        train_start = times[0] if mode == "expanding" else origin - window * HOUR
+        folds.append({
+            "origin": origin,
+            "train_lo": int(ts.searchsorted(train_start, side="left")),
+            "train_hi": int(ts.searchsorted(origin, side="left")),
+            "test_hi": int(ts.searchsorted(origin + horizon * HOUR, side="left")),
+        })
+    folds = folds[::-1]  # oldest origin first
+    for i, fold in enumerate(folds):
+        fold["fold"] = i
+    return folds
+
+
+def _predict_recursive(model, fold, categorical=None):
+    """Roll `model` forward from the fold origin and align predictions with the test rows."""
+    spec, y, ts, series = _shared["spec"], _shared["y"], _shared["ts"], _shared["series"]
+    horizon = int((ts[fold["test_hi"] - 1] - fold["origin"]) // HOUR) + 1
+    lo = int(ts.searchsorted(fold["origin"] - max(warmup_rows(spec), 1) * HOUR, side="left"))
+    hist = slice(max(lo, fold["train_lo"]), fold["train_hi"])
+    te = slice(fold["train_hi"], fold["test_hi"])
+
+    history = pd.DataFrame({spec["time_col"]: ts[hist], spec["target"]: y[hist]})
+    test = pd.DataFrame({spec["time_col"]: ts[te]})
+    keys = [spec["time_col"]]
+    if series is not None:
+        history[spec["series_col"]] = series[hist]
+        test[spec["series_col"]] = series[te]
+        keys.append(spec["series_col"])
+    if series is not None and getattr(model, "series_col", None) == spec["series_col"]:
+        # Per-series linear models look each row's coefficients up by the series column
+        ids = np.unique(series[hist])
+        categorical = pd.DataFrame({spec["series_col"]: ids}, index=ids)
+    forecast = recursive_forecast(model.predict, history, spec, horizon, categorical=categorical)
+    return test.merge(forecast, on=keys, how="left")["predicted"].to_numpy()
+
+
+def _fit_predict(model_name, model_cfg, fold):
+    X, y, ts, series = _shared["X"], _shared["y"], _shared["ts"], _shared["series"]
+    tr = slice(fold["train_lo"], fold["train_hi"])
+    te = slice(fold["train_hi"], fold["test_hi"])
+
+    if model_name in ("XGBoost", "LinearRegression"):
+        if model_name == "XGBoost":
+            from xgboost import XGBRegressor
+            # Same global model as the trainer: numeric features plus categorical series ids
+            params = dict(model_cfg)
+            ids = _shared["categorical"] if params.pop("categorical_ids", True) else _shared["categorical"].iloc[:, :0]
+
+            def design(rows):
+                numeric = pd.DataFrame(X[rows], columns=_shared["features"])
+                return pd.concat([numeric, ids.iloc[rows].reset_index(drop=True)], axis=1)
+            model = XGBRegressor(objective="reg:squarederror", random_state=42, n_jobs=1,
+                                 enable_categorical=not ids.columns.empty, **params)
+            model.fit(design(tr), y[tr])
+            if _shared["recursive"]:
+                cats = _shared["series_categories"]
+                return _predict_recursive(model, fold, cats[ids.columns] if not ids.columns.empty else None)
+            return model.predict(design(te))
+        # Same engine as the trainer: one regression per series when per_series is set
+        series_col = _shared["spec"]["series_col"] if series is not None and model_cfg.get("per_series", True) else None
+        model = BatchedLinearRegression(fit_intercept=model_cfg.get("fit_intercept", True), series_col=series_col)
+
+        def frame(rows):
+            out = pd.DataFrame(X[rows], columns=_shared["features"])
+            if series_col is not None:
+                out[series_col] = series[rows]
+            return out
+        model.fit(frame(tr), y[tr])
+        if _shared["recursive"]:
+            return _predict_recursive(model, fold)
+        return model.predict(frame(te))
+    if model_name == "Prophet":
+        from prophet import Prophet
+        logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+        pred = np.full(fold["test_hi"] - fold["train_hi"], np.nan)
+        groups = [None] if series is None else np.unique(series[te])
+        for sid in groups:
+            train_mask = slice(None) if sid is None else series[tr] == sid
+            test_mask = slice(None) if sid is None else series[te] == sid
+            model = Prophet(**model_cfg)
+            model.fit(pd.DataFrame({"ds": ts[tr][train_mask], "y": y[tr][train_mask]}))
+            pred[test_mask] = model.predict(pd.DataFrame({"ds": ts[te][test_mask]}))["yhat"].to_numpy()
+        return pred
+    raise ValueError(f"Unknown model '{model_name}' for backtesting.")
+
+
+def run_fold(model_name, model_cfg, fold):
+    """Fit on the fold's training rows, predict its test rows, return per-horizon errors."""
+    start = time.perf_counter()
+    pred = _fit_predict(model_name, model_cfg, fold)
+    y, series = _shared["y"], _shared["series"]
+    tr = slice(fold["train_lo"], fold["train_hi"])
+    te = slice(fold["train_hi"], fold["test_hi"])
+    horizon = ((_shared["ts"][te] - fold["origin"]) // HOUR).astype(np.int64) + 1
+
+    # MASE scale: in-sample seasonal-naive MAE of the training window (mean over series)
+    if series is None:
+        scale = seasonal_naive_scale(y[tr])
+    else:
+        scale = np.nanmean([seasonal_naive_scale(y[tr][series[tr] == sid]) for sid in np.unique(series[te])])
+
+    scored = pd.DataFrame({"horizon": horizon, "actual": y[te], "predicted": pred})
+    table = compute_metrics(scored, ["horizon"], scale=scale)
+    table.insert(0, "model", model_name)
+    table.insert(1, "fold", fold["fold"])
+    table.insert(2, "origin", pd.Timestamp(fold["origin"]))
+    table.insert(3, "n_train", fold["train_hi"] - fold["train_lo"])
+
+    # Raw residuals per series and horizon, for interval calibration (see intervals.py)
+    residuals = pd.DataFrame({
+        "model": model_name,
+        "fold": fold["fold"],
+        "series": "all" if series is None else series[te].astype(str),
+        "horizon": horizon,
+        "residual": y[te] - pred,
+    })
+    return table, residuals, time.perf_counter() - start
+
+
+def run_backtest(tasks, workers, loader_args):
+    """Run (model_name, model_cfg, fold) tasks across a process pool.
+
+    Returns (error table, residual table), both sorted by model and fold.
+    """
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    tables, residuals = [], []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(loader_args,)) as pool:
+        futures = {pool.submit(run_fold, *task): task for task in tasks}
+        for future in as_completed(futures):
+            model_name, _, fold = futures[future]
+            table, resid, seconds = future.result()
+            logging.info(f"{model_name} fold {fold['fold']} done in {seconds:.2f}s")
+            tables.append(table)
+            residuals.append(resid)
+    errors = pd.concat(tables, ignore_index=True).sort_values(["model", "fold", "horizon"]).reset_index(drop=True)
+    residuals = pd.concat(residuals, ignore_index=True).sort_values(["model", "fold"], kind="stable").reset_index(drop=True)
+    return errors, residuals
@@ -0,0 +1,162 @@
+"""
+Module: cache.py
+Description: Content-hash artifact cache for pipeline stages. A stage key covers the source of
+             the stage (its script, stage module and every project module they import), its
+             input files and the config sections it reads; outputs of a finished stage are
+             stored under that key and restored instead of re-running it.
+"""
+
+import os
+import ast
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    """Digest of a file, or of every file under a directory (appended tables are part directories)."""
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).encode())
+                h.update(file_digest(full).encode())
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy(src, dst):
+    """Copy a file or directory over whatever is at `dst`."""
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    elif os.path.isdir(src) and os.path.exists(dst):
+        os.remove(dst)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def _module_file(module):
+    path = os.path.join(*module.split(".")) + ".py"
+    return path if os.path.exists(path) else None
+
+
+def source_files(step):
+    """The step's script, the stage module `run_stage` resolves for it, and every `scripts.*`
+    module they import (transitively, including imports inside functions)."""
+    from scripts.utils.stages import STAGES, ALIASES
+
+    todo = [step["script"]]
+    stage = ALIASES.get(step["name"], step["name"])
+    if stage in STAGES:
+        todo.append(_module_file(STAGES[stage]))
+    seen = set()
+    while todo:
+        path = todo.pop()
+        if path is None or path in seen:
+            continue
+        seen.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                # `from scripts.utils import instrument` imports a module, not a name
+                names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            todo.extend(_module_file(name) for name in names if name.startswith("scripts."))
+    return sorted(seen)
+
+
+def stage_key(step, config):
+    """Hash everything that can change a stage's outputs."""
+    h = hashlib.sha256()
+    h.update(step["name"].encode())
+    for path in source_files(step):
+        h.update(path.encode())
+        h.update(file_digest(path).encode())
+    for path in sorted(step["inputs"]):
+        h.update(path.encode())
+        h.update(file_digest(path).encode())
+    sections = {name: config.get(name) for name in sorted(step.get("config_sections", []))}
+    h.update(json.dumps(sections, sort_keys=True, default=str).encode())
+    h.update(json.dumps(sorted(step["outputs"])).encode())
+    return h.hexdigest()
+
+
+class StageCache:
+    def __init__(self, cache_dir, max_size_mb=1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def restore(self, key, outputs):
+        """Copy cached outputs back into place. Returns False on a cache miss."""
+        entry = self._entry(key)
+        manifest = os.path.join(entry, "manifest.json")
+        if not os.path.exists(manifest):
+            return False
+        for path in outputs:
+            if not os.path.exists(os.path.join(entry, "files", path)):
+                return False
+        for path in outputs:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _copy(os.path.join(entry, "files", path), path)
+        os.utime(manifest)  # mark as recently used for eviction
+        return True
+
+    def store(self, key, step_name, outputs):
+        missing = [path for path in outputs if not os.path.exists(path)]
+        if missing:
+            logging.warning(f"Not caching {step_name}: declared outputs missing {missing}")
+            return
+        entry = self._entry(key)
+        tmp = f"{entry}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for path in outputs:
+            target = os.path.join(tmp, "files", path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _copy(path, target)
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump({"step": step_name, "outputs": outputs, "created": time.time()}, f)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            manifest = os.path.join(self.cache_dir, key, "manifest.json")
+            if not os.path.exists(manifest):
+                continue
+            size = 0
+            for root, _, files in os.walk(os.path.join(self.cache_dir, key)):
+                size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+            entries.append((os.path.getmtime(manifest), size, key))
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_size_mb."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+            logging.info(f"Evicted cache entry {key[:12]} ({size / 1e6:.1f} MB)")
@@ -0,0 +1,78 @@
+"""
+Module: downsample.py
+Description: Server-side downsampling of long time series before plotting. Both methods return
+             the indices of the points to keep, so several columns of one frame can be reduced
+             independently and each plotted with its own subset.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def minmax_indices(y, n_out):
+    """Keep the min and max of each of n_out/2 equal-size buckets (preserves peaks)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+    n_buckets = n_out // 2
+    size = int(np.ceil(n / n_buckets))
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_buckets, size)
+    valid = ~np.all(np.isnan(blocks), axis=1)
+    offsets = np.arange(n_buckets)[valid] * size
+    lo = np.nanargmin(blocks[valid], axis=1) + offsets
+    hi = np.nanargmax(blocks[valid], axis=1) + offsets
+    return np.unique(np.concatenate([lo, hi, [0, n - 1]]))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: keeps the visually most significant n_out points."""
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # Interior buckets (first and last points are always kept)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sums_x = np.add.reduceat(x[1:n - 1], starts - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], starts - 1)
+    counts = ends - starts
+    avg_x = np.append(sums_x / counts, x[-1])[1:]  # mean of the *next* bucket; last point for the final one
+    avg_y = np.append(sums_y / counts, y[-1])[1:]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[i]) * (by - y[a]) - (x[a] - bx) * (avg_y[i] - y[a]))
+        a = lo + int(np.nanargmax(area)) if not np.all(np.isnan(area)) else lo
+        out[i + 1] = a
+    return out
+
+
+METHODS = {"lttb": lttb_indices, "minmax": lambda x, y, n: minmax_indices(y, n)}
+
+
+def downsample_frame(df, x_col, y_cols, n_out, method="lttb"):
+    """Reduce each y column to about n_out points; returns long format (x, variable, value)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}'. Use one of {list(METHODS)}.")
+    x = df[x_col].to_numpy()
+    parts = []
+    for col in y_cols:
+        y = df[col].to_numpy(dtype=np.float64)
+        mask = ~np.isnan(y)
+        keep = np.flatnonzero(mask)[METHODS[method](x[mask], y[mask], n_out)]
+        parts.append(pd.DataFrame({x_col: x[keep], "variable": col, "value": y[keep]}))
+    return pd.concat(parts, ignore_index=True)
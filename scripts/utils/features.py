@@ -0,0 +1,210 @@
+"""
+Module: features.py
+Description: Vectorized feature engine driven by the `features:` spec in the config.
+             Works on long-format frames (one row per series and hour) and computes calendar,
+             cyclical, lag and rolling features for every series in a single pass, writing all
+             features into one preallocated float32 block.
+"""
+
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scripts.utils.instrument import traced
+
+ROLLING_STATS = {
+    "mean": lambda w: w.mean(axis=1),
+    "sum": lambda w: w.sum(axis=1),
+    "std": lambda w: w.std(axis=1, ddof=1),
+    "min": lambda w: w.min(axis=1),
+    "max": lambda w: w.max(axis=1),
+}
+
+
+def rolling_specs(spec):
+    """Expand the rolling section into (name, window, stat, shift) tuples."""
+    out = []
+    for item in spec.get("rolling", []):
+        window, shift = int(item["window"]), int(item.get("shift", 0))
+        for stat in item.get("stats", ["mean"]):
+            if stat not in ROLLING_STATS:
+                raise ValueError(f"Unsupported rolling statistic '{stat}'. Use one of {list(ROLLING_STATS)}.")
+            name = f"rolling_{window}h" if stat == "mean" else f"rolling_{window}h_{stat}"
+            if shift:
+                name += f"_shift{shift}"
+            out.append((name, window, stat, shift))
+    return out
+
+
+def feature_columns(spec):
+    """Names of the feature columns produced for `spec`, in output order."""
+    names = list(spec.get("calendar", []))
+    for field in spec.get("cyclical", {}):
+        names += [f"{field}_sin", f"{field}_cos"]
+    names += [f"lag_{lag}h" for lag in spec.get("lags", [])]
+    names += [name for name, _, _, _ in rolling_specs(spec)]
+    return names
+
+
+def warmup_rows(spec):
+    """Number of leading rows per series that cannot have complete lag/rolling features."""
+    needed = [int(lag) for lag in spec.get("lags", [])]
+    needed += [window - 1 + shift for _, window, _, shift in rolling_specs(spec)]
+    return max(needed, default=0)
+
+
+def series_positions(series):
+    """Position of each row within its (contiguous) series block."""
+    n = len(series)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    codes = pd.factorize(series)[0]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+def time_split(ts, fraction):
+    """Boolean mask of the rows in the last `fraction` of distinct timestamps (all series cut at the same time)."""
+    times = np.unique(ts)
+    cutoff = times[min(len(times) - 1, int(len(times) * (1 - fraction)))]
+    return np.asarray(ts >= cutoff)
+
+
+def global_design(frame, spec, categorical=True):
+    """Design matrix of the global XGBoost model, shared by the trainer, tuner and backtest.
+
+    Numeric features followed (with `categorical`) by the series id and the static per-series
+    columns present in `frame`, as pandas categoricals over their sorted values. Returns
+    (X, categorical column names, {column: CategoricalDtype}).
+    """
+    series_col = spec.get("series_col")
+    columns = []
+    if categorical and series_col in frame.columns:
+        columns = [series_col] + [c for c in spec.get("static", []) if c in frame.columns]
+    dtypes = {c: pd.CategoricalDtype(sorted(frame[c].unique())) for c in columns}
+    X = frame[feature_columns(spec)].assign(**{c: frame[c].astype(dtypes[c]) for c in columns})
+    return X, columns, dtypes
+
+
+def series_categories(frame, spec, columns, dtypes):
+    """The categorical columns once per series, indexed by series id (see recursive_forecast)."""
+    series_col = spec["series_col"]
+    first = frame.drop_duplicates(series_col)
+    return pd.DataFrame({c: pd.Categorical(first[c], dtype=dtypes[c]) for c in columns},
+                        index=first[series_col].to_numpy())
+
+
+@traced("build_features")
+def build_features(df, spec):
+    """Return `df` sorted by series and time with the spec's feature columns appended.
+
+    If the series column is missing the frame is treated as a single series.
+    """
+    time_col = spec.get("time_col", "timestamp")
+    target = spec.get("target", "energy_kwh")
+    series_col = spec.get("series_col", "sector")
+    dtype = np.dtype(spec.get("dtype", "float32"))
+
+    keys = [series_col, time_col] if series_col in df.columns else [time_col]
+    df = df.sort_values(keys, kind="stable").reset_index(drop=True)
+    n = len(df)
+    if series_col in df.columns:
+        pos = series_positions(df[series_col].to_numpy())
+    else:
+        pos = np.arange(n)
+
+    names = feature_columns(spec)
+    out = np.empty((n, len(names)), dtype=dtype)
+    values = df[target].to_numpy(dtype=np.float64)
+    ts = df[time_col].dt
+    j = 0
+
+    for field in spec.get("calendar", []):
+        out[:, j] = getattr(ts, field).to_numpy()
+        j += 1
+
+    for field, period in spec.get("cyclical", {}).items():
+        angle = getattr(ts, field).to_numpy() * (2 * np.pi / period)
+        out[:, j] = np.sin(angle)
+        out[:, j + 1] = np.cos(angle)
+        j += 2
+
+    for lag in spec.get("lags", []):
+        lag, col = int(lag), out[:, j]
+        col[:] = np.nan
+        if lag < n:
+            col[lag:] = values[:n - lag]
+            col[pos < lag] = np.nan  # never read across a series boundary
+        j += 1
+
+    for _, window, stat, shift in rolling_specs(spec):
+        col = out[:, j]
+        col[:] = np.nan
+        if n >= window + shift:
+            # Window ending at row i covers rows i-window+1..i; with a shift it ends at i-shift
+            result = ROLLING_STATS[stat](sliding_window_view(values, window))
+            col[window - 1 + shift:] = result[:len(result) - shift]
+            col[pos < window - 1 + shift] = np.nan
+        j += 1
+
+    features = pd.DataFrame(out, columns=names, copy=False)
+    result = pd.concat([df, features], axis=1)
+    if spec.get("drop_warmup", True):
+        result = result[pos >= warmup_rows(spec)].dropna().reset_index(drop=True)
+    return result
+
+
+def spec_hash(spec):
+    """Stable hash of a feature spec; incremental state is only valid for the spec it was built with."""
+    spec = {k: v for k, v in spec.items() if k != "incremental"}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def tail_state(df, spec):
+    """Raw rows each series needs to extend its features: the last `warmup_rows` per series.
+
+    Per-series constant columns listed under `static` are kept alongside.
+    """
+    time_col = spec.get("time_col", "timestamp")
+    target = spec.get("target", "energy_kwh")
+    series_col = spec.get("series_col", "sector")
+    keep = warmup_rows(spec)
+    if series_col in df.columns:
+        static = [c for c in spec.get("static", []) if c in df.columns]
+        df = df[[series_col] + static + [time_col, target]].sort_values([series_col, time_col], kind="stable")
+        tail = df.groupby(series_col, sort=False).tail(keep) if keep else df.iloc[:0]
+    else:
+        df = df[[time_col, target]].sort_values(time_col, kind="stable")
+        tail = df.tail(keep) if keep else df.iloc[:0]
+    return tail.reset_index(drop=True)
+
+
+def select_new_rows(raw, state, spec):
+    """Rows of `raw` that are later than the last row of their series in `state`."""
+    time_col = spec.get("time_col", "timestamp")
+    series_col = spec.get("series_col", "sector")
+    if state.empty:
+        return raw
+    if series_col in raw.columns:
+        last = state.groupby(series_col)[time_col].max()
+        watermark = raw[series_col].map(last)
+        return raw[watermark.isna() | (raw[time_col] > watermark)]
+    return raw[raw[time_col] > state[time_col].max()]
+
+
+@traced("update_features")
+def update_features(new_rows, state, spec):
+    """Features for `new_rows` only, using the tail `state` as history.
+
+    Returns (features, new_state). The features are identical to the matching rows of
+    build_features() over the full history.
+    """
+    combined = pd.concat([state.assign(_new=False), new_rows.assign(_new=True)], ignore_index=True)
+    features = build_features(combined, dict(spec, drop_warmup=False))
+    features = features[features.pop("_new").to_numpy()]
+    if spec.get("drop_warmup", True):
+        features = features.dropna()
+    return features.reset_index(drop=True), tail_state(combined, spec)
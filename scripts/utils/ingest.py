@@ -0,0 +1,152 @@
+"""
+Module: ingest.py
+Description: Streaming ingestion of uploaded meter exports for the dashboard. Reads only the
+             timestamp and energy columns with fixed dtypes, chunk by chunk, validates them as
+             they stream and aggregates to hourly on the fly, so memory depends on the number of
+             hours covered rather than on the file size (months of 1-minute data are fine).
+
+Supported uploads: .csv, .csv.gz / .gz, .csv.zst / .zst (decompressed by pyarrow while streaming)
+and .parquet (read in record batches).
+"""
+
+import pandas as pd
+
+from scripts.utils.instrument import traced
+
+TIME_COL = "timestamp"
+VALUE_COL = "energy_kwh"
+COMPRESSION = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+
+
+class UploadError(ValueError):
+    """The upload cannot be used; the message is shown to the user as is."""
+
+
+def _compression(name):
+    for suffix, codec in COMPRESSION.items():
+        if name.lower().endswith(suffix):
+            return codec
+    return None
+
+
+def _csv_chunks(file, name, chunk_rows):
+    import pyarrow as pa
+
+    stream = pa.input_stream(file, compression=_compression(name))
+    try:
+        # Values are parsed per row in ingest_upload, so a stray "ERR" cell counts as one invalid row
+        reader = pd.read_csv(stream, usecols=[TIME_COL, VALUE_COL], dtype={TIME_COL: str, VALUE_COL: str},
+                             chunksize=chunk_rows)
+        yield from reader
+    except ValueError as e:
+        if "Usecols do not match" in str(e):
+            raise UploadError(f"The file must contain '{TIME_COL}' and '{VALUE_COL}' columns.") from e
+        raise UploadError(f"Could not read the file as CSV: {e}") from e
+    except (OSError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise UploadError(f"Could not read the file as CSV: {e}") from e
+
+
+def _parquet_chunks(file, chunk_rows):
+    import pyarrow.parquet as pq
+
+    try:
+        parquet = pq.ParquetFile(file)
+    except Exception as e:
+        raise UploadError(f"Could not read the file as Parquet: {e}") from e
+    missing = {TIME_COL, VALUE_COL} - set(parquet.schema_arrow.names)
+    if missing:
+        raise UploadError(f"The file must contain '{TIME_COL}' and '{VALUE_COL}' columns.")
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=[TIME_COL, VALUE_COL]):
+        yield batch.to_pandas()
+
+
+def upload_chunks(file, name, chunk_rows=500_000):
+    """(timestamp, energy_kwh) chunks of an uploaded file, picked by its file name."""
+    if name.lower().endswith(".parquet"):
+        return _parquet_chunks(file, chunk_rows)
+    return _csv_chunks(file, name, chunk_rows)
+
+
+def _parse_times(values):
+    """Naive UTC timestamps; unparseable values become NaT.
+
+    Parsing as UTC keeps files whose offsets change mid-file (DST switches) datetime-typed;
+    timestamps without an offset are taken as they are.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        times = values
+        if times.dt.tz is None:
+            return times
+    else:
+        try:
+            times = pd.to_datetime(values, utc=True, format="ISO8601", errors="coerce")
+        except ValueError:
+            times = pd.to_datetime(values, utc=True, format="mixed", errors="coerce")  # mixed formats, slow path
+    return times.dt.tz_convert("UTC").dt.tz_localize(None)
+
+
+def _parse_values(values):
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+@traced("ingest.upload")
+def ingest_upload(file, name, chunk_rows=500_000, freq="h", aggregate="sum", max_invalid_fraction=0.01):
+    """Stream an upload into an hourly (ds, y) frame; returns (frame, report).
+
+    `aggregate` combines readings within an hour: "sum" for interval energy (kWh per reading),
+    "mean" for power-like readings. Rows with unparseable timestamps or missing values are
+    dropped and counted; more than `max_invalid_fraction` of them rejects the file.
+    """
+    if aggregate not in ("sum", "mean"):
+        raise ValueError(f"Unknown aggregate '{aggregate}'. Use 'sum' or 'mean'.")
+    sums, counts = [], []
+    rows = invalid = negative = 0
+    first = last = None
+    ordered = True
+    for chunk in upload_chunks(file, name, chunk_rows):
+        rows += len(chunk)
+        times = _parse_times(chunk[TIME_COL])
+        values = _parse_values(chunk[VALUE_COL])
+        valid = times.notna() & values.notna()
+        invalid += int((~valid).sum())
+        times, values = times[valid], values[valid]
+        if times.empty:
+            continue
+        negative += int((values < 0).sum())
+        if ordered and (not times.is_monotonic_increasing or (last is not None and times.iloc[0] < last)):
+            ordered = False
+        first = times.min() if first is None else min(first, times.min())
+        last = times.max() if last is None else max(last, times.max())
+
+        # Partial hourly aggregates per chunk; an hour split across chunks is combined below
+        hours = times.dt.floor(freq)
+        grouped = values.groupby(hours.to_numpy())
+        sums.append(grouped.sum())
+        counts.append(grouped.count())
+
+    if rows == 0 or not sums:
+        raise UploadError("The file has no valid rows.")
+    if invalid > max_invalid_fraction * rows:
+        raise UploadError(f"{invalid:,} of {rows:,} rows have an invalid timestamp or value "
+                          f"(more than {max_invalid_fraction:.0%}).")
+
+    total = pd.concat(sums).groupby(level=0).sum()
+    n = pd.concat(counts).groupby(level=0).sum()
+    y = total if aggregate == "sum" else total / n
+    hourly = pd.DataFrame({"ds": y.index, "y": y.to_numpy()}).sort_values("ds", ignore_index=True)
+
+    expected = len(pd.date_range(hourly["ds"].iloc[0], hourly["ds"].iloc[-1], freq=freq))
+    report = {
+        "rows": rows,
+        "invalid_rows": invalid,
+        "negative_values": negative,
+        "start": first,
+        "end": last,
+        "hours": len(hourly),
+        "missing_hours": expected - len(hourly),
+        "readings_per_hour": round(float(n.median()), 1),
+        "sorted": ordered,
+    }
+    return hourly, report
@@ -0,0 +1,269 @@
+"""
+Module: instrument.py
+Description: Lightweight tracing for pipeline stages: nested timed spans, counters and memory
+             samples, exported as JSON lines and a Prometheus text file, plus an optional
+             cProfile/pyinstrument profile per stage.
+
+The pipeline opens one stage() per step, so every step is measured without changes to the
+script; shared utilities (table I/O, the prediction store, feature building, ...) are wrapped
+with @traced and show up as child spans. Scripts can add their own `with span("fit"):` blocks.
+Outside an active stage every call here is a cheap no-op.
+
+Long-running processes (the forecast server) use Histogram for latency distributions instead.
+"""
+
+import os
+import time
+import json
+import threading
+import functools
+import contextlib
+
+_state = threading.local()
+_active = None  # the current stage record while a stage() is open in this process
+
+
+def rss_bytes():
+    """Current resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemorySampler(threading.Thread):
+    """Background thread tracking this process's peak RSS while a stage runs."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, rss_bytes())
+        return self.peak
+
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+    return _state.stack
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the innermost open span."""
+    if _active is None:
+        yield
+        return
+    stack = _stack()
+    path = "/".join(stack + [name])
+    stack.append(name)
+    rss_start, start, wall = rss_bytes(), time.perf_counter(), time.time()
+    try:
+        yield
+    finally:
+        stack.pop()
+        _active["events"].append({
+            "type": "span", "stage": _active["stage"], "span": name, "path": path, "depth": len(stack),
+            "start": round(wall, 6), "seconds": round(time.perf_counter() - start, 6),
+            "rss_start_mb": round(rss_start / 2 ** 20, 1), "rss_end_mb": round(rss_bytes() / 2 ** 20, 1),
+            **attrs,
+        })
+
+
+def count(name, value=1):
+    """Add to a per-stage counter, e.g. count("rows_read", len(df))."""
+    if _active is not None:
+        _active["counters"][name] = _active["counters"].get(name, 0) + value
+
+
+def sample_memory(label):
+    """Record the current RSS under a label."""
+    if _active is not None:
+        _active["events"].append({"type": "memory", "stage": _active["stage"], "label": label,
+                                  "time": round(time.time(), 6), "rss_mb": round(rss_bytes() / 2 ** 20, 1)})
+
+
+def traced(name):
+    """Decorator form of span() for shared utility functions."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+@contextlib.contextmanager
+def _profiler(mode, stage_name, profile_dir):
+    """cProfile (.prof + top-30 text) or pyinstrument (.html) for one stage; None disables."""
+    if not mode:
+        yield
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, stage_name)
+    if mode == "cprofile":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(base + ".prof")
+            with open(base + ".txt", "w") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(30)
+    elif mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("Profiling mode 'pyinstrument' needs the pyinstrument package (pip install pyinstrument).")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(base + ".html", "w") as f:
+                f.write(profiler.output_html())
+    else:
+        raise ValueError(f"Unknown profiling mode '{mode}'. Use 'cprofile' or 'pyinstrument'.")
+
+
+@contextlib.contextmanager
+def stage(name, profile=None, profile_dir="logs/profiles"):
+    """Collect spans, counters and peak memory for one pipeline step.
+
+    Yields the stage record; after the block it holds `events`, `counters`, `seconds`
+    and `peak_rss_mb`, ready for write_events() / write_prometheus().
+    """
+    global _active
+    record = {"stage": name, "events": [], "counters": {}}
+    previous, _active = _active, record
+    _state.stack = []
+    sampler = MemorySampler()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with _profiler(profile, name, profile_dir), span(name):
+            yield record
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        record["peak_rss_mb"] = round(sampler.stop() / 2 ** 20, 1)
+        _active = previous
+
+
+def write_events(path, stages, run_id=None):
+    """Append every span/memory event plus one summary line per stage as JSON lines."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        for record in stages:
+            for event in record["events"]:
+                f.write(json.dumps({"run_id": run_id, **event}) + "\n")
+            f.write(json.dumps({"run_id": run_id, "type": "stage", "stage": record["stage"],
+                                "seconds": record["seconds"], "peak_rss_mb": record["peak_rss_mb"],
+                                "counters": record["counters"]}) + "\n")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def write_prometheus(path, stages):
+    """Prometheus text exposition of the latest run (overwritten each run, e.g. for node_exporter)."""
+    lines = [
+        "# HELP pipeline_stage_seconds Wall time of each pipeline stage.",
+        "# TYPE pipeline_stage_seconds gauge",
+    ]
+    lines += [f'pipeline_stage_seconds{{stage="{_label(r["stage"])}"}} {r["seconds"]}' for r in stages]
+    lines += ["# HELP pipeline_stage_peak_rss_bytes Peak resident memory during each stage.",
+              "# TYPE pipeline_stage_peak_rss_bytes gauge"]
+    lines += [f'pipeline_stage_peak_rss_bytes{{stage="{_label(r["stage"])}"}} {int(r["peak_rss_mb"] * 2 ** 20)}' for r in stages]
+
+    # Spans with the same path are summed (e.g. one read_table per input)
+    totals = {}
+    for r in stages:
+        for e in r["events"]:
+            if e["type"] == "span":
+                key = (r["stage"], e["path"])
+                seconds, calls = totals.get(key, (0.0, 0))
+                totals[key] = (seconds + e["seconds"], calls + 1)
+    lines += ["# HELP pipeline_span_seconds_total Time spent in each span, summed over calls.",
+              "# TYPE pipeline_span_seconds_total counter"]
+    lines += [f'pipeline_span_seconds_total{{stage="{_label(s)}",span="{_label(p)}"}} {v[0]:.6f}' for (s, p), v in totals.items()]
+    lines += ["# HELP pipeline_span_calls_total Number of times each span was entered.",
+              "# TYPE pipeline_span_calls_total counter"]
+    lines += [f'pipeline_span_calls_total{{stage="{_label(s)}",span="{_label(p)}"}} {v[1]}' for (s, p), v in totals.items()]
+    lines += ["# HELP pipeline_counter_total Counters recorded by the stages.",
+              "# TYPE pipeline_counter_total counter"]
+    lines += [f'pipeline_counter_total{{stage="{_label(r["stage"])}",name="{_label(k)}"}} {v}'
+              for r in stages for k, v in r["counters"].items()]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style) with approximate quantiles; thread-safe."""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: above the largest bucket
+        self.total = 0.0
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.n += 1
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket holding the q-th observation (None if empty)."""
+        with self._lock:
+            counts, n = list(self.counts), self.n
+        if n == 0:
+            return None
+        rank, seen = q * n, 0
+        for i, c in enumerate(counts):
+            if seen + c >= rank and c:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def prometheus(self, name, labels=None):
+        """Exposition lines (_bucket, _sum, _count) for this histogram."""
+        with self._lock:
+            counts, total, n = list(self.counts), self.total, self.n
+        base = ",".join(f'{k}="{_label(v)}"' for k, v in (labels or {}).items())
+        sep = "," if base else ""
+        lines, cumulative = [], 0
+        for bound, c in zip(list(self.buckets) + ["+Inf"], counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{base}}} {total:.6f}")
+        lines.append(f"{name}_count{{{base}}} {n}")
+        return lines
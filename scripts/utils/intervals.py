@@ -0,0 +1,125 @@
+"""
+Module: intervals.py
+Description: Prediction intervals for every model, calibrated once from backtest residuals
+             (actual - predicted) instead of sampled at predict time. Offsets are calibrated per
+             series and forecast horizon, stored next to the registered model, and applied to a
+             forecast frame with one vectorized lookup.
+
+Methods:
+    conformal  split-conformal: symmetric +-q, q the ceil((n + 1) * level)-th smallest |residual|
+    quantile   residual quantiles: asymmetric, the (1 - level) / 2 and (1 + level) / 2 quantiles
+
+Offsets fall back from the most to the least specific table with at least `min_samples`
+residuals: the series at that horizon, the series over all horizons (horizon 0), every series at
+that horizon (series "*"), then everything pooled. Horizons past the calibrated ones use the
+last calibrated horizon.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import traced
+
+POOLED = "*"
+METHODS = ("conformal", "quantile")
+REGISTRY_NAMES = {"XGBoost": "xgboost", "LinearRegression": "linear_regression", "Prophet": "prophet"}
+PER_SERIES = {"Prophet"}  # registered once per series as <name>_<series id>
+
+
+# Pooling steps, most specific first: (pool series?, pool horizons?)
+POOLING = [(False, False), (False, True), (True, False), (True, True)]
+
+
+def _offsets(residuals, level, method):
+    """(lower, upper, n) per (series, horizon); NaN where the group is too small for `level`."""
+    keys = ["series", "horizon"]
+    groups = residuals.groupby(keys, sort=True)["residual"]
+    n = groups.size()
+    if method == "quantile":
+        lower = groups.quantile((1 - level) / 2)
+        upper = groups.quantile((1 + level) / 2)
+        return lower, upper, n
+
+    scores = residuals.assign(score=residuals["residual"].abs()).sort_values(keys + ["score"], kind="stable")
+    within = scores.groupby(keys, sort=True)
+    rank = within.cumcount().to_numpy() + 1
+    size = within["score"].transform("size").to_numpy()
+    chosen = scores[rank == np.ceil((size + 1) * level)]
+    q = chosen.set_index(keys)["score"].reindex(n.index)
+    return -q, q, n
+
+
+@traced("intervals.calibrate")
+def calibrate(residuals, levels=(0.8, 0.95), method="conformal", min_samples=20):
+    """Interval offsets from a residual frame with series, horizon and residual columns.
+
+    Returns a long table (series, horizon, level, lower, upper, n) with one block per pooling
+    step (series "*" and/or horizon 0 mark pooled rows); add `lower`/`upper` to a point
+    forecast to get the bounds.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interval method '{method}'. Use one of {list(METHODS)}.")
+    residuals = residuals.dropna(subset=["residual"]).assign(series=lambda d: d["series"].astype(str))
+    tables = []
+    for level in levels:
+        for pool_series, pool_horizons in POOLING:
+            frame = residuals[["series", "horizon", "residual"]]
+            if pool_series:
+                frame = frame.assign(series=POOLED)
+            if pool_horizons:
+                frame = frame.assign(horizon=0)
+            lower, upper, n = _offsets(frame, level, method)
+            table = pd.DataFrame({"lower": lower, "upper": upper, "n": n}).reset_index()
+            table.insert(2, "level", float(level))
+            tables.append(table[(table["n"] >= min_samples) & table["lower"].notna()])
+    return pd.concat(tables, ignore_index=True)
+
+
+def apply_intervals(frame, table, level, series_col="series", horizon_col="horizon", pred_col="predicted"):
+    """Copy of `frame` with `lower` and `upper` bounds around `pred_col` at `level`."""
+    table = table[np.isclose(table["level"], level)]
+    if table.empty:
+        raise ValueError(f"No intervals calibrated at level {level}.")
+    horizon = frame[horizon_col].clip(upper=table["horizon"].max()).to_numpy()
+    series = frame[series_col].astype(str).to_numpy() if series_col in frame.columns else np.full(len(frame), "all")
+
+    lookup = table.set_index(["series", "horizon"])[["lower", "upper"]]
+    offsets = np.full((len(frame), 2), np.nan)
+    for pool_series, pool_horizons in POOLING:
+        keys = pd.MultiIndex.from_arrays([
+            np.full(len(frame), POOLED) if pool_series else series,
+            np.zeros(len(frame), dtype=horizon.dtype) if pool_horizons else horizon,
+        ])
+        offsets = np.where(np.isnan(offsets), lookup.reindex(keys).to_numpy(), offsets)
+
+    pred = frame[pred_col].to_numpy(dtype=np.float64)
+    return frame.assign(lower=pred + offsets[:, 0], upper=pred + offsets[:, 1])
+
+
+def insample_bounds(actual, predicted, level, method="quantile"):
+    """(lower, upper) offsets from in-sample residuals, for series without a backtest (uploads)."""
+    residuals = pd.DataFrame({"series": "all", "horizon": 1, "residual": np.asarray(actual) - np.asarray(predicted)})
+    table = calibrate(residuals, [level], method, min_samples=1)
+    row = table[(table["series"] == POOLED) & (table["horizon"] == 0)].iloc[0]
+    return float(row["lower"]), float(row["upper"])
+
+
+def registry_name(model_name, series_id=None):
+    """Registry entry holding a model and the intervals stored next to it.
+
+    Per-series models (Prophet) have one entry per series; the single series of a dataset
+    without a series column ("all") uses the plain name.
+    """
+    name = REGISTRY_NAMES[model_name]
+    if model_name in PER_SERIES and series_id is not None and str(series_id) != "all":
+        return f"{name}_{series_id}"
+    return name
+
+
+def split_by_entry(model_name, table):
+    """{registry entry: its rows of a calibrated table}; per-series entries keep the pooled rows."""
+    if model_name not in PER_SERIES:
+        return {registry_name(model_name): table}
+    pooled = table[table["series"] == POOLED]
+    return {registry_name(model_name, sid): pd.concat([rows, pooled], ignore_index=True)
+            for sid, rows in table[table["series"] != POOLED].groupby("series", sort=True)}
@@ -0,0 +1,181 @@
+"""
+Module: jobs.py
+Description: In-process job queue for dashboard upload forecasts, backed by a local process pool
+             (no external broker). One queue is shared by all Streamlit sessions of a server:
+
+    jobs = JobQueue(workers=2, max_per_user=2)
+    job = jobs.submit(session_id, content_hash, history, horizon_hours=168)
+    jobs.get(job["id"])   # {"status": "running", "progress": 0.4, "stage": "fitting", ...}
+
+Identical uploads (same content hash) share one job, whoever submitted them. Workers report
+progress through a multiprocessing queue that a listener thread applies to the job records.
+"""
+
+import time
+import queue
+import logging
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_progress = None  # worker side: queue for (job_id, stage, fraction) messages
+
+
+class JobLimitError(RuntimeError):
+    """A user already has the maximum number of unfinished jobs."""
+
+
+def _init_worker(progress_queue, preload):
+    global _progress
+    _progress = progress_queue
+    for module in preload:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+
+def report(job_id, stage, fraction):
+    """Send a progress update from inside a worker (no-op outside the pool)."""
+    if _progress is not None:
+        _progress.put((job_id, stage, fraction))
+
+
+def forecast_upload(job_id, history, horizon_hours, prophet_params, level=0.95):
+    """Pool task: fit Prophet on an upload's (ds, y) history and forecast `horizon_hours` ahead.
+
+    With `uncertainty_samples: 0` in `prophet_params`, yhat_lower/upper come from the in-sample
+    residual quantiles at `level` instead of Prophet's sampling.
+    """
+    from prophet import Prophet
+    from scripts.utils.intervals import insample_bounds
+
+    report(job_id, "fitting", 0.1)
+    model = Prophet(**prophet_params)
+    model.fit(history)
+    report(job_id, "predicting", 0.8)
+    future = model.make_future_dataframe(periods=horizon_hours, freq="h")
+    forecast = model.predict(future)
+    if "yhat_lower" not in forecast.columns:
+        fitted = forecast["yhat"].to_numpy()[:len(history)]
+        lower, upper = insample_bounds(history["y"].to_numpy(), fitted, level)
+        forecast["yhat_lower"], forecast["yhat_upper"] = forecast["yhat"] + lower, forecast["yhat"] + upper
+    report(job_id, "done", 1.0)
+    return forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]]
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_per_user=2, keep_finished=32, preload=("prophet",)):
+        self.max_per_user = max_per_user
+        self.keep_finished = keep_finished
+        self._jobs = OrderedDict()  # job id (= content hash) -> record, oldest first
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.preload = tuple(preload)
+        # spawn: forking a threaded Streamlit server is unsafe
+        self._ctx = mp.get_context("spawn")
+        self._progress = self._ctx.Queue()
+        self._pool = self._new_pool()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._ctx,
+                                   initializer=_init_worker, initargs=(self._progress, self.preload))
+
+    def _listen(self):
+        while True:
+            try:
+                job_id, stage, fraction = self._progress.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] in ("queued", "running"):
+                    job.update(status="running", stage=stage, progress=fraction)
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            error = future.exception()
+            if error is None:
+                job.update(status="done", stage="done", progress=1.0, result=future.result(), finished=time.time())
+                self._evict()
+            else:
+                self._fail(job, error)
+
+    def _fail(self, job, error):
+        # Caller holds the lock; a failed job no longer counts against its owner's limit
+        job.update(status="failed", stage="failed", error=f"{type(error).__name__}: {error}", finished=time.time())
+        logging.error(f"Upload job {job['id'][:12]} failed: {error}")
+        self._evict()
+
+    def _evict(self):
+        # Drop the oldest finished jobs beyond keep_finished; unfinished jobs are never dropped
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for key in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[key]
+
+    def submit(self, user, content_hash, history, horizon_hours, prophet_params=None, retry=False, level=0.95):
+        """Queue a forecast for an upload, or return the existing job for the same content.
+
+        A failed job is only resubmitted with `retry`. Raises JobLimitError when `user`
+        already has max_per_user unfinished jobs.
+        """
+        with self._lock:
+            job = self._jobs.get(content_hash)
+            if job is not None and not (retry and job["status"] == "failed"):
+                self._jobs.move_to_end(content_hash)
+                job["users"].add(user)
+                return self._view(job)
+            active = sum(1 for j in self._jobs.values() if j["owner"] == user and j["status"] in ("queued", "running"))
+            if active >= self.max_per_user:
+                raise JobLimitError(f"You already have {active} forecast(s) running; wait for one to finish.")
+            job = {"id": content_hash, "owner": user, "users": {user}, "status": "queued", "stage": "queued",
+                   "progress": 0.0, "submitted": time.time(), "finished": None, "result": None, "error": None}
+            self._jobs[content_hash] = job
+            self._jobs.move_to_end(content_hash)
+            view = self._view(job)
+        args = (forecast_upload, content_hash, history, horizon_hours, prophet_params or {}, level)
+        try:
+            try:
+                future = self._pool.submit(*args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool rather than failing every job
+                logging.warning("Upload job pool was broken; restarting it.")
+                self._pool = self._new_pool()
+                future = self._pool.submit(*args)
+        except Exception as e:
+            # Never leave the record queued: it would hold the user's slot forever
+            with self._lock:
+                self._fail(job, e)
+                return self._view(job)
+        future.add_done_callback(lambda f: self._finished(content_hash, f))
+        return view
+
+    def _view(self, job):
+        return {k: v for k, v in job.items() if k != "users"}
+
+    def get(self, job_id):
+        """Snapshot of a job (None if unknown or evicted); `result` is shared, never mutate it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._view(job)
+
+    def user_jobs(self, user):
+        with self._lock:
+            return [self._view(j) for j in self._jobs.values() if user in j["users"]]
+
+    def stats(self):
+        with self._lock:
+            statuses = [j["status"] for j in self._jobs.values()]
+        return {s: statuses.count(s) for s in ("queued", "running", "done", "failed")}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
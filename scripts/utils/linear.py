@@ -0,0 +1,255 @@
+"""
+Module: linear.py
+Description: Batched per-series ordinary least squares and recursive least squares (RLS).
+
+BatchedLinearRegression fits one linear model per series in stacked NumPy passes: rows are
+scattered into a zero-padded (series x hours x features) design array, a block of series at a
+time, and all normal equations of the block are solved at once. It mirrors sklearn's
+LinearRegression (centering for the intercept, minimum-norm solution for rank-deficient series),
+so coefficients agree with per-series sklearn fits to floating-point tolerance.
+
+With `online`, the model also keeps each series' sufficient statistics (Gram matrix and
+right-hand side of the intercept-augmented design) and, for series whose design has full rank,
+the RLS state (the inverse Gram matrix), so update() folds in new hourly rows without touching
+the history. Full-rank series advance by RLS; rank-deficient series (e.g. a calendar feature
+that was constant so far) and series first seen in update() are re-solved from their
+statistics, since RLS started from a pseudo-inverse drifts away from the minimum-norm fit.
+With forgetting factor 1 the updated coefficients equal a batch refit on history + new rows.
+
+The series column travels inside X, so the fit/predict calls match a plain sklearn model:
+    model = BatchedLinearRegression(series_col="sector").fit(X_train, y_train)
+    model.predict(X_test)
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.features import series_positions
+from scripts.utils.instrument import traced
+
+MAX_BLOCK_CELLS = 2 ** 24  # padded design cells per block (~128 MB as float64)
+
+
+class BatchedLinearRegression:
+    def __init__(self, fit_intercept=True, series_col="sector", online=False, forgetting_factor=1.0):
+        self.fit_intercept = fit_intercept
+        self.series_col = series_col
+        self.online = online
+        self.forgetting_factor = forgetting_factor
+
+    # --- helpers ---
+    def _split(self, X):
+        """(float64 feature matrix, series ids or None) from a frame that may hold the series column."""
+        if isinstance(X, pd.DataFrame) and self.series_col in X.columns:
+            series = X[self.series_col].to_numpy()
+            X = X.drop(columns=self.series_col)
+        else:
+            series = None
+        return np.asarray(X, dtype=np.float64), series
+
+    def _codes(self, series, n):
+        """Index of each row's series in self.series_ (-1 for series unseen at fit time)."""
+        if series is None:
+            return np.zeros(n, dtype=np.int64)
+        if self.series_[0] is None:
+            raise ValueError(f"Model was fitted without a series column; got '{self.series_col}'.")
+        codes = self.series_.searchsorted(series)
+        codes = np.minimum(codes, len(self.series_) - 1)
+        return np.where(self.series_[codes] == series, codes, -1)
+
+    # --- batch fit ---
+    @traced("linear.fit")
+    def fit(self, X, y):
+        X, series = self._split(X)
+        y = np.asarray(y, dtype=np.float64)
+        n, p = X.shape
+        if series is None:
+            self.series_ = np.array([None], dtype=object)
+            codes = np.zeros(n, dtype=np.int64)
+        else:
+            self.series_, codes = np.unique(series, return_inverse=True)
+        n_series = len(self.series_)
+
+        # Group rows by series without reordering within a series
+        order = np.argsort(codes, kind="stable")
+        codes_sorted = codes[order]
+        pos = series_positions(codes_sorted)
+        counts = np.bincount(codes, minlength=n_series)
+
+        self.coef_ = np.zeros((n_series, p))
+        self.intercept_ = np.zeros(n_series)
+        self.n_samples_ = counts
+        if self.online:
+            d = p + int(self.fit_intercept)
+            self.P_ = np.zeros((n_series, d, d))
+            self.G_ = np.zeros((n_series, d, d))
+            self.b_ = np.zeros((n_series, d))
+            self.full_rank_ = np.zeros(n_series, dtype=bool)
+
+        max_len = max(int(counts.max()), 1)
+        block = max(1, MAX_BLOCK_CELLS // (max_len * (p + 1)))
+        starts = np.r_[0, np.cumsum(counts)]
+        for first in range(0, n_series, block):
+            last = min(n_series, first + block)
+            rows = order[starts[first]:starts[last]]
+            self._fit_block(X[rows], y[rows], codes_sorted[starts[first]:starts[last]] - first,
+                            pos[starts[first]:starts[last]], counts[first:last], first, max_len)
+        return self
+
+    def _fit_block(self, X, y, codes, pos, counts, offset, max_len):
+        n_series, p = len(counts), X.shape[1]
+        # Padded design (series, hours, features); padded rows stay zero and drop out of every sum
+        D = np.zeros((n_series, max_len, p))
+        t = np.zeros((n_series, max_len))
+        D[codes, pos] = X
+        t[codes, pos] = y
+        mask = np.zeros((n_series, max_len))
+        mask[codes, pos] = 1.0
+        sizes = np.maximum(counts, 1)[:, None]
+
+        if self.fit_intercept:
+            x_mean = D.sum(axis=1) / sizes
+            y_mean = t.sum(axis=1) / sizes[:, 0]
+            Dc = (D - x_mean[:, None, :]) * mask[:, :, None]
+            tc = (t - y_mean[:, None]) * mask
+        else:
+            x_mean, y_mean = np.zeros((n_series, p)), np.zeros(n_series)
+            Dc, tc = D, t
+
+        # Normal equations for every series at once; pinv gives the minimum-norm solution
+        # sklearn's lstsq returns when a series' design is rank deficient
+        gram = np.einsum("stp,stq->spq", Dc, Dc)
+        rhs = np.einsum("stp,st->sp", Dc, tc)
+        coef = np.einsum("spq,sq->sp", np.linalg.pinv(gram, hermitian=True), rhs)
+        self.coef_[offset:offset + n_series] = coef
+        self.intercept_[offset:offset + n_series] = y_mean - np.einsum("sp,sp->s", x_mean, coef)
+
+        if self.online:
+            # Statistics of the design augmented with a constant column for the intercept; the
+            # inverse Gram is the RLS state of the series where it exists
+            A = np.concatenate([D, mask[:, :, None]], axis=2) if self.fit_intercept else D
+            block = slice(offset, offset + n_series)
+            self.G_[block] = np.einsum("stp,stq->spq", A, A)
+            self.b_[block] = np.einsum("stp,st->sp", A, t)
+            self._refresh_state(np.arange(offset, offset + n_series))
+
+    # --- online state ---
+    def _refresh_state(self, s):
+        """Rank check of series `s`; full-rank ones get their RLS state from the Gram matrix."""
+        G = self.G_[s]
+        full = np.linalg.matrix_rank(G, hermitian=True) == G.shape[-1]
+        self.full_rank_[s] = full
+        self.P_[s[full]] = np.linalg.inv(G[full])
+
+    def _solve_stats(self, s):
+        """Batch least-squares fit of series `s` from their statistics (same solution as fit())."""
+        G, b = self.G_[s], self.b_[s]
+        if self.fit_intercept:
+            # Centre through the constant column: n, sum(x) and sum(y) sit in its row
+            n = np.maximum(G[:, -1, -1], 1e-300)
+            x_mean, y_mean = G[:, :-1, -1] / n[:, None], b[:, -1] / n
+            gram = G[:, :-1, :-1] - n[:, None, None] * np.einsum("sp,sq->spq", x_mean, x_mean)
+            rhs = b[:, :-1] - n[:, None] * x_mean * y_mean[:, None]
+        else:
+            gram, rhs = G, b
+        coef = np.einsum("spq,sq->sp", np.linalg.pinv(gram, hermitian=True), rhs)
+        self.coef_[s] = coef
+        self.intercept_[s] = y_mean - np.einsum("sp,sp->s", x_mean, coef) if self.fit_intercept else 0.0
+
+    def _add_series(self, series):
+        """Grow the per-series arrays for ids first seen in update(); they start with no rows."""
+        merged = np.union1d(self.series_, series)
+        at = merged.searchsorted(self.series_)
+
+        def grow(values):
+            out = np.zeros((len(merged),) + values.shape[1:], dtype=values.dtype)
+            out[at] = values
+            return out
+        for name in ("coef_", "intercept_", "n_samples_", "P_", "G_", "b_", "full_rank_"):
+            setattr(self, name, grow(getattr(self, name)))
+        self.intercept_[np.setdiff1d(np.arange(len(merged)), at)] = np.nan  # until they get rows
+        self.series_ = merged
+
+    # --- online updates ---
+    @traced("linear.update")
+    def update(self, X, y):
+        """Fold new rows into the fitted coefficients (recursive least squares).
+
+        Rows are applied in order within each series; all series advance together, one row each
+        per pass, so a new hour across thousands of meters is a single vectorized step. Series
+        without an RLS state (rank-deficient so far, or new) are re-solved from their statistics.
+        """
+        if not self.online:
+            raise ValueError("update() needs a model fitted with online=True.")
+        X, series = self._split(X)
+        y = np.asarray(y, dtype=np.float64)
+        codes = self._codes(series, len(X))
+        if (codes < 0).any():
+            self._add_series(np.unique(series[codes < 0]))
+            codes = self._codes(series, len(X))
+        order = np.argsort(codes, kind="stable")
+        X, y, codes = X[order], y[order], codes[order]
+        rank = series_positions(codes)
+
+        lam = self.forgetting_factor
+        if self.fit_intercept:
+            X = np.concatenate([X, np.ones((len(X), 1))], axis=1)
+
+        # Statistics of every touched series, with rows weighted by the forgetting factor
+        touched, counts = np.unique(codes, return_counts=True)
+        later = np.repeat(counts, counts) - 1 - rank  # rows after this one in its series
+        w = lam ** later
+        self.G_[touched] *= (lam ** counts)[:, None, None]
+        self.b_[touched] *= (lam ** counts)[:, None]
+        np.add.at(self.G_, codes, w[:, None, None] * np.einsum("np,nq->npq", X, X))
+        np.add.at(self.b_, codes, w[:, None] * X * y[:, None])
+        self.n_samples_ += np.bincount(codes, minlength=len(self.series_))
+
+        # RLS for the series that had full rank before these rows
+        rls = self.full_rank_[codes]
+        if self.fit_intercept:
+            theta = np.concatenate([self.coef_, self.intercept_[:, None]], axis=1)
+        else:
+            theta = self.coef_.copy()
+        for k in range(int(rank[rls].max()) + 1 if rls.any() else 0):
+            at = rls & (rank == k)
+            s = codes[at]
+            x = X[at]
+            P = self.P_[s]
+            Px = np.einsum("spq,sq->sp", P, x)
+            gain = Px / (lam + np.einsum("sp,sp->s", x, Px))[:, None]
+            error = y[at] - np.einsum("sp,sp->s", x, theta[s])
+            theta[s] += gain * error[:, None]
+            self.P_[s] = (P - np.einsum("sp,sq->spq", gain, Px)) / lam
+        if self.fit_intercept:
+            self.coef_, self.intercept_ = theta[:, :-1], theta[:, -1]
+        else:
+            self.coef_ = theta
+
+        # The rest: batch solve from the statistics, and start RLS once their design has full rank
+        batch = touched[~self.full_rank_[touched]]
+        if len(batch):
+            self._solve_stats(batch)
+            self._refresh_state(batch)
+        return self
+
+    # --- predict ---
+    def for_series(self, series):
+        """predict(X) for matrices whose rows are `series`, in order, without a series column.
+
+        The coefficient lookup happens once, so repeated calls (recursive forecasting) cost
+        one row-wise dot product each.
+        """
+        codes = self._codes(np.asarray(series), len(series))
+        coef, intercept = self.coef_[codes], np.where(codes < 0, np.nan, self.intercept_[codes])
+
+        def predict(X):
+            return np.einsum("np,np->n", np.asarray(X, dtype=np.float64), coef) + intercept
+        return predict
+
+    def predict(self, X):
+        X, series = self._split(X)
+        codes = self._codes(series, len(X))
+        pred = np.einsum("np,np->n", X, self.coef_[codes]) + self.intercept_[codes]
+        pred[codes < 0] = np.nan  # series not seen at fit time
+        return pred
@@ -0,0 +1,67 @@
+"""
+Module: lru_cache.py
+Description: Thread-safe, memory-bounded LRU cache used by the dashboard to share loaded frames
+             and fitted models between Streamlit sessions.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Approximate memory footprint in bytes (exact for pandas objects)."""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = max_entries
+        self._items = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key][0]
+
+    def put(self, key, value, size=None):
+        size = estimate_size(value) if size is None else int(size)
+        if size > self.max_bytes:
+            return value  # never cache something that would evict everything else
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._items) > self.max_entries):
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute, size=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value, size=size(value) if callable(size) else size)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+_MISSING = object()
@@ -0,0 +1,182 @@
+"""
+Module: metrics.py
+Description: Forecast error metrics shared by the trainers, evaluator, backtest and dashboard.
+             compute_metrics() scores many models/series/horizons in one grouped NumPy pass over
+             a long-format predictions table; StreamingMetrics accumulates the same sums batch by
+             batch so large prediction sets never have to be loaded at once.
+
+Metrics: rmse, mae, mape and smape (in %), mase (seasonal-naive scaled), bias (mean of
+predicted - actual) and pinball_<q> for quantile predictions.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import traced
+
+POINT_METRICS = ["rmse", "mae", "mape", "smape", "mase", "bias"]
+
+# Per-group running sums every metric is derived from
+SUMS = ["n", "sq_err", "abs_err", "err", "ape", "n_nonzero", "sape", "naive_abs", "naive_n"]
+
+
+def _row_terms(actual, predicted):
+    err = predicted - actual
+    abs_err = np.abs(err)
+    nonzero = actual != 0
+    denom = np.abs(actual) + np.abs(predicted)
+    return {
+        "n": np.ones_like(err),
+        "sq_err": err * err,
+        "abs_err": abs_err,
+        "err": err,
+        "ape": np.where(nonzero, abs_err / np.where(nonzero, np.abs(actual), 1.0), 0.0),
+        "n_nonzero": nonzero.astype(np.float64),
+        "sape": np.where(denom > 0, 2 * abs_err / np.where(denom > 0, denom, 1.0), 0.0),
+    }
+
+
+def _naive_terms(actual, codes, season):
+    """|y_t - y_{t-season}| within each group; rows must be time-ordered inside each group."""
+    diff = np.zeros_like(actual)
+    valid = np.zeros(len(actual), dtype=bool)
+    if len(actual) > season:
+        same = codes[season:] == codes[:-season]
+        diff[season:] = np.abs(actual[season:] - actual[:-season])
+        valid[season:] = same & ~np.isnan(diff[season:])
+    return np.where(valid, diff, 0.0), valid.astype(np.float64)
+
+
+def _finalize(sums, scale=None):
+    """Turn per-group sums (dict of arrays) into metric arrays."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = sums["n"]
+        out = {
+            "n": n.astype(np.int64),
+            "rmse": np.sqrt(sums["sq_err"] / n),
+            "mae": sums["abs_err"] / n,
+            "mape": 100 * sums["ape"] / sums["n_nonzero"],
+            "smape": 100 * sums["sape"] / n,
+            "bias": sums["err"] / n,
+        }
+        if scale is None:
+            scale = sums["naive_abs"] / sums["naive_n"]
+        out["mase"] = out["mae"] / scale
+    return out
+
+
+@traced("compute_metrics")
+def compute_metrics(df, group_cols=(), actual="actual", predicted="predicted", time_col=None,
+                    metrics=None, quantiles=None, season=24, scale=None, series_col=None):
+    """Metrics per group of a long-format predictions table in one vectorized pass.
+
+    `quantiles` maps quantile levels to prediction columns (e.g. {0.9: "p90"}) and adds a
+    pinball_<q> column each. MASE is scaled by the seasonal-naive MAE of the actuals in each
+    group (ordered by `time_col`) unless `scale` is given. With `series_col`, that MAE is taken
+    within each series of a group and the group's scale is the mean over its series.
+    """
+    group_cols = list(group_cols)
+    df = df.dropna(subset=[actual, predicted])
+    series_cols = [series_col] if series_col is not None and series_col not in group_cols else []
+    order = group_cols + series_cols + ([time_col] if time_col is not None else [])
+    if order:
+        df = df.sort_values(order, kind="stable")
+    if group_cols:
+        grouped = df.groupby(group_cols, sort=True, observed=True)
+        codes = grouped.ngroup().to_numpy()
+        keys = grouped.size().index.to_frame(index=False)
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        keys = pd.DataFrame(index=[0])
+    n_groups = len(keys)
+
+    y = df[actual].to_numpy(dtype=np.float64)
+    p = df[predicted].to_numpy(dtype=np.float64)
+    terms = _row_terms(y, p)
+    # Naive differences never cross a series boundary
+    sub = df.groupby(group_cols + series_cols, sort=False, observed=True).ngroup().to_numpy() if series_cols else codes
+    terms["naive_abs"], terms["naive_n"] = _naive_terms(y, sub, season)
+    sums = {name: np.bincount(codes, weights=values, minlength=n_groups) for name, values in terms.items()}
+
+    if scale is None and series_cols:
+        # One seasonal-naive scale per series, pooled as their mean within each group
+        n_sub = sub.max() + 1 if len(sub) else 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sub_scale = (np.bincount(sub, weights=terms["naive_abs"], minlength=n_sub)
+                         / np.bincount(sub, weights=terms["naive_n"], minlength=n_sub))
+        sub_group = np.zeros(n_sub, dtype=np.int64)
+        sub_group[sub] = codes
+        known = ~np.isnan(sub_scale)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = (np.bincount(sub_group[known], weights=sub_scale[known], minlength=n_groups)
+                     / np.bincount(sub_group[known], minlength=n_groups))
+
+    result = _finalize(sums, scale)
+    table = keys.reset_index(drop=True)
+    table["n"] = result.pop("n")
+    for name in metrics or POINT_METRICS:
+        table[name] = result[name]
+
+    for q, col in (quantiles or {}).items():
+        r = y - df[col].to_numpy(dtype=np.float64)
+        loss = np.maximum(q * r, (q - 1) * r)
+        table[f"pinball_{q}"] = np.bincount(codes, weights=loss, minlength=n_groups) / sums["n"]
+    return table
+
+
+def point_metrics(actual, predicted, metrics=("rmse", "mae")):
+    """Metrics for a single pair of arrays as a dict, e.g. {"rmse": ..., "mae": ...}."""
+    frame = pd.DataFrame({"actual": np.asarray(actual, dtype=np.float64),
+                          "predicted": np.asarray(predicted, dtype=np.float64)})
+    row = compute_metrics(frame, metrics=list(metrics)).iloc[0]
+    return {name: float(row[name]) for name in metrics}
+
+
+def seasonal_naive_scale(actual, season=24):
+    """In-sample seasonal-naive MAE of one series, the usual MASE denominator."""
+    actual = np.asarray(actual, dtype=np.float64)
+    if len(actual) <= season:
+        return np.nan
+    return float(np.nanmean(np.abs(actual[season:] - actual[:-season])))
+
+
+class StreamingMetrics:
+    """Online version of compute_metrics() for predictions read in batches.
+
+    Rows of each group must arrive in time order (across batches) for MASE; every other
+    metric is order-independent.
+    """
+
+    def __init__(self, group_cols=(), actual="actual", predicted="predicted", season=24):
+        self.group_cols = list(group_cols)
+        self.actual, self.predicted, self.season = actual, predicted, season
+        self._sums = {}   # group key -> np.array aligned with SUMS
+        self._tails = {}  # group key -> last `season` actuals, for the naive scale
+
+    def update(self, batch):
+        batch = batch.dropna(subset=[self.actual, self.predicted])
+        groups = batch.groupby(self.group_cols, sort=False) if self.group_cols else [((), batch)]
+        for key, part in groups:
+            key = key if isinstance(key, tuple) else (key,)
+            y = part[self.actual].to_numpy(dtype=np.float64)
+            p = part[self.predicted].to_numpy(dtype=np.float64)
+            terms = _row_terms(y, p)
+
+            tail = self._tails.get(key, np.empty(0))
+            history = np.concatenate([tail, y])
+            naive_abs, naive_n = _naive_terms(history, np.zeros(len(history), dtype=np.int64), self.season)
+            terms["naive_abs"], terms["naive_n"] = naive_abs[len(tail):], naive_n[len(tail):]
+            self._tails[key] = history[-self.season:]
+
+            sums = np.array([terms[name].sum() for name in SUMS])
+            self._sums[key] = self._sums.get(key, 0) + sums
+
+    def result(self, metrics=None):
+        keys = list(self._sums)
+        stacked = np.array([self._sums[k] for k in keys]).reshape(len(keys), len(SUMS))
+        values = _finalize({name: stacked[:, i] for i, name in enumerate(SUMS)})
+        table = pd.DataFrame(keys, columns=self.group_cols) if self.group_cols else pd.DataFrame(index=range(len(keys)))
+        table["n"] = values.pop("n")
+        for name in metrics or POINT_METRICS:
+            table[name] = values[name]
+        return table.sort_values(self.group_cols).reset_index(drop=True) if self.group_cols else table
@@ -0,0 +1,325 @@
+"""
+Module: pipeline.py
+Description: DAG pipeline engine. Builds step dependencies from the inputs/outputs declared
+             under `pipeline.steps` in the config and runs independent steps in a process pool.
+"""
+
+import os
+import io
+import csv
+import time
+import runpy
+import logging
+import importlib
+import traceback
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from scripts.utils.cache import StageCache, stage_key
+from scripts.utils import instrument
+from scripts.utils.storage import table_extension, csv_export_enabled
+from scripts.utils.prediction_store import new_run_id
+
+
+def _resolve_paths(paths, config, exports=False):
+    # Table artifacts are declared as `name.{table}` and follow the configured storage format
+    ext = table_extension(config).lstrip(".")
+    resolved = []
+    for path in paths:
+        resolved.append(path.format(table=ext))
+        if exports and "{table}" in path and ext != "csv" and csv_export_enabled(config):
+            resolved.append(path.format(table="csv"))
+    return resolved
+
+
+def _flag(config, dotted):
+    value = config
+    for key in dotted.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return bool(value)
+
+
+def load_steps(config):
+    """Return the declared pipeline steps as a dict of name -> step spec.
+
+    `inputs_when` maps a dotted config flag to inputs the step only reads while it is set.
+    """
+    steps = {}
+    for name, spec in config["pipeline"]["steps"].items():
+        inputs = list(spec.get("inputs", []))
+        for flag, paths in spec.get("inputs_when", {}).items():
+            if _flag(config, flag):
+                inputs.extend(paths)
+        steps[name] = {
+            "name": name,
+            "script": spec["script"],
+            "inputs": _resolve_paths(inputs, config),
+            "outputs": _resolve_paths(spec.get("outputs", []), config, exports=True),
+            "config_sections": list(spec.get("config_sections", [])),
+        }
+    return steps
+
+
+def build_dag(steps):
+    """Map every step to the set of steps producing its inputs. Raises on cycles or clashes."""
+    producers = {}
+    for name, step in steps.items():
+        for output in step["outputs"]:
+            if output in producers:
+                raise ValueError(f"Output '{output}' is declared by both '{producers[output]}' and '{name}'.")
+            producers[output] = name
+
+    deps = {}
+    for name, step in steps.items():
+        deps[name] = set()
+        for path in step["inputs"]:
+            if path in producers:
+                deps[name].add(producers[path])
+            elif not os.path.exists(path):
+                raise ValueError(f"Step '{name}' needs '{path}', which no step produces and does not exist.")
+
+    # Kahn's algorithm, only to reject cycles early
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+
+    return deps
+
+
+def select_steps(steps, deps, targets):
+    """Restrict the pipeline to `targets` and everything upstream of them."""
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in steps:
+            raise ValueError(f"Unknown pipeline step: {name}")
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+    return {name: steps[name] for name in steps if name in selected}
+
+
+def _init_worker(preload, run_id):
+    # Steps run as scripts here, so the run id reaches them through the worker's environment
+    os.environ["PIPELINE_RUN_ID"] = run_id
+    # Import heavy libraries once per worker instead of once per step
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _run_step(name, script, instrument_cfg=None):
+    """Run a step script in the current (worker) process, as `python <script>` would.
+
+    With `instrument_cfg`, the step runs inside an instrument.stage() and the collected
+    spans/counters come back in the result's "instrument" entry.
+    """
+    # Scripts configure logging with basicConfig, which is a no-op once handlers exist
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    status, error = "ok", None
+    record = None
+    tracing = contextlib.nullcontext()
+    if instrument_cfg is not None:
+        tracing = instrument.stage(name, instrument_cfg.get("profile"), instrument_cfg.get("profile_dir", "logs/profiles"))
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output), tracing as record:
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status, error = "failed", f"SystemExit({e.code})"
+    except BaseException:
+        status, error = "failed", traceback.format_exc()
+    return {
+        "step": name,
+        "status": status,
+        "seconds": round(time.perf_counter() - start, 3),
+        "output": output.getvalue(),
+        "error": error,
+        "instrument": record,
+    }
+
+
+def _run_inline(name, config, tables, instrument_cfg=None):
+    """Run a step's stage function in this process (see scripts/utils/stages.py).
+
+    Tables the stage returns are added to `tables`, so downstream steps skip re-reading them.
+    Same result shape as _run_step().
+    """
+    from scripts.utils.stages import run_stage
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    status, error = "ok", None
+    record = None
+    tracing = contextlib.nullcontext()
+    if instrument_cfg is not None:
+        tracing = instrument.stage(name, instrument_cfg.get("profile"), instrument_cfg.get("profile_dir", "logs/profiles"))
+    try:
+        with contextlib.redirect_stdout(output), tracing as record:
+            tables.update(run_stage(name, config, tables))
+    except Exception:
+        status, error = "failed", traceback.format_exc()
+    return {
+        "step": name,
+        "status": status,
+        "seconds": round(time.perf_counter() - start, 3),
+        "output": output.getvalue(),
+        "error": error,
+        "instrument": record,
+    }
+
+
+def write_timings(timings, timings_file, run_started):
+    os.makedirs(os.path.dirname(timings_file) or ".", exist_ok=True)
+    new_file = not os.path.exists(timings_file)
+    with open(timings_file, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["run_started", "step", "status", "seconds"])
+        for t in timings:
+            writer.writerow([run_started, t["step"], t["status"], t["seconds"]])
+
+
+def run_pipeline(config, workers=None, targets=None, use_cache=True, profile=None, in_process=False):
+    """Run the declared pipeline, executing independent steps concurrently.
+
+    With `in_process`, steps instead run one after another in this process through their
+    stage functions and hand DataFrames to each other in memory (no pool, no re-reads).
+
+    Steps whose cache key (see scripts/utils/cache.py) matches a stored entry are
+    restored from the cache instead of being run. When `instrumentation` is enabled, every
+    executed step is traced (scripts/utils/instrument.py) and, with `profile`
+    ("cprofile" or "pyinstrument"), profiled.
+
+    Returns a list of per-step timing records in completion order.
+    """
+    pipeline_cfg = config["pipeline"]
+    workers = workers or pipeline_cfg.get("workers", os.cpu_count() or 1)
+    os.makedirs("logs", exist_ok=True)
+
+    steps = load_steps(config)
+    deps = build_dag(steps)
+    if targets:
+        steps = select_steps(steps, deps, targets)
+        deps = {name: deps[name] for name in steps}
+
+    instrument_cfg = dict(config.get("instrumentation", {}))
+    if profile:
+        instrument_cfg["profile"] = profile
+    if not instrument_cfg.get("enabled", False) and not profile:
+        instrument_cfg = None
+    stage_records = []
+
+    cache_cfg = config.get("cache", {})
+    cache = None
+    if use_cache and cache_cfg.get("enabled", False):
+        cache = StageCache(cache_cfg.get("dir", ".cache/pipeline"), cache_cfg.get("max_size_mb", 1024))
+
+    run_started = datetime.now().isoformat(timespec="seconds")
+    # Every step of this run appends to the prediction store under the same run id, passed to
+    # in-process stages in their config (cache keys still use `config`) and to workers on start
+    run_id = new_run_id()
+    run_config = dict(config, prediction_store=dict(config.get("prediction_store", {}), run_id=run_id))
+    logging.info(f"Pipeline run with {len(steps)} steps " + ("in-process." if in_process else f"on {workers} workers."))
+
+    done, failed, timings = set(), set(), []
+    running, keys = {}, {}
+    pending = dict(deps)
+    wall_start = time.perf_counter()
+
+    def _ready_steps():
+        """Pop the steps whose dependencies are done; those restored from the cache count as done."""
+        ready = [name for name, d in pending.items() if d <= done]
+        to_run = []
+        for name in ready:
+            del pending[name]
+            if cache is not None:
+                start = time.perf_counter()
+                keys[name] = stage_key(steps[name], config)
+                if cache.restore(keys[name], steps[name]["outputs"]):
+                    done.add(name)
+                    seconds = round(time.perf_counter() - start, 3)
+                    timings.append({"step": name, "status": "cached", "seconds": seconds})
+                    logging.info(f"♻️ Restored {name} from cache (key {keys[name][:12]})")
+                    print(f"♻️ Cached: {name}")
+                    continue
+            logging.info(f"Running step: {name} ({steps[name]['script']})")
+            print(f"🚀 Running: {name}")
+            to_run.append(name)
+        return to_run
+
+    def _finish(name, result):
+        record = result.pop("instrument", None)
+        if record is not None:
+            stage_records.append(record)
+        timings.append(result)
+        if result["output"]:
+            logging.info(f"[{name}] output:\n{result['output'].rstrip()}")
+        if result["status"] == "ok":
+            done.add(name)
+            if cache is not None:
+                cache.store(keys[name], name, steps[name]["outputs"])
+            logging.info(f"✅ Completed: {name} in {result['seconds']:.2f}s")
+            print(f"✅ Completed: {name} ({result['seconds']:.2f}s)")
+        else:
+            failed.add(name)
+            logging.error(f"❌ Failed at step: {name}\n{result['error']}")
+            print(f"❌ Error in {name}:\n{result['error']}")
+
+    if in_process:
+        tables = {}
+        while pending and not failed:
+            queue = _ready_steps()
+            while queue and not failed:
+                name = queue.pop(0)
+                _finish(name, _run_inline(name, run_config, tables, instrument_cfg))
+            for name in queue:
+                pending[name] = deps[name]  # not started because an earlier step failed
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(pipeline_cfg.get("preload", []), run_id),
+        ) as pool:
+            while pending or running:
+                if not failed:
+                    for name in _ready_steps():
+                        running[pool.submit(_run_step, name, steps[name]["script"], instrument_cfg)] = name
+                elif not running:
+                    break
+                if not running:
+                    continue  # everything that became ready was restored from cache
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    _finish(name, future.result())
+
+    for name in pending:
+        timings.append({"step": name, "status": "skipped", "seconds": 0.0})
+        logging.warning(f"Skipped step: {name}")
+
+    timings.append({"step": "total", "status": "failed" if failed or pending else "ok",
+                    "seconds": round(time.perf_counter() - wall_start, 3)})
+    write_timings(timings, pipeline_cfg.get("timings_file", "logs/pipeline_timings.csv"), run_started)
+    if instrument_cfg is not None and stage_records:
+        instrument.write_events(instrument_cfg.get("events", "logs/pipeline_events.jsonl"), stage_records,
+                                run_id=run_id)
+        instrument.write_prometheus(instrument_cfg.get("prometheus", "logs/pipeline_metrics.prom"), stage_records)
+    return timings
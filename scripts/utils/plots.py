@@ -0,0 +1,47 @@
+"""
+Module: plots.py
+Description: Static plots written by the pipeline stages. matplotlib is imported on first use,
+             so stages that never plot do not pay for it.
+"""
+
+import os
+
+from scripts.utils.instrument import span
+
+
+def plot_predictions(results_df, title, path):
+    """Actual vs predicted over time, saved to `path`."""
+    import matplotlib.pyplot as plt
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with span("plot"):
+        fig = plt.figure(figsize=(12, 4))
+        plt.plot(results_df["timestamp"], results_df["actual"], label="Actual")
+        plt.plot(results_df["timestamp"], results_df["predicted"], label="Predicted")
+        plt.title(title)
+        plt.legend()
+        plt.tight_layout()
+        plt.savefig(path)
+        plt.close(fig)
+
+
+def plot_model_comparison(results_df, path):
+    """RMSE and MAE bars per model from the evaluation summary."""
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with span("plot"):
+        fig = plt.figure(figsize=(8, 4))
+        bar_width = 0.35
+        x = np.arange(len(results_df))
+
+        plt.bar(x - bar_width/2, results_df["RMSE"], bar_width, label="RMSE")
+        plt.bar(x + bar_width/2, results_df["MAE"], bar_width, label="MAE")
+        plt.xticks(x, results_df["Model"])
+        plt.ylabel("Error")
+        plt.title("Model Comparison: RMSE vs MAE")
+        plt.legend()
+        plt.tight_layout()
+        plt.savefig(path)
+        plt.close(fig)
@@ -0,0 +1,185 @@
+"""
+Module: prediction_store.py
+Description: Single long-format prediction store shared by all trainers, the evaluator and the
+             dashboard. Rows are (model, series, run_id, kind, timestamp, actual, predicted),
+             written as a Parquet dataset partitioned by model and run_id, sorted by series and
+             timestamp so filters on those columns skip row groups.
+
+Layout:
+    <path>/model=<model>/run_id=<run_id>/part-<uuid>.parquet
+    <path>/_latest/<model>.json          -> {"run_id": "<run_id>"}
+
+Kinds: "test" (held-out predictions), "insample" (fitted values on training data) and
+"forecast" (beyond the last observation, no actuals).
+"""
+
+import os
+import json
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from scripts.utils.instrument import traced, count
+
+COLUMNS = ["series", "timestamp", "kind", "actual", "predicted"]
+
+
+def store_path(config):
+    return config.get("prediction_store", {}).get("path", "results/predictions/store")
+
+
+def latest_pointer(config, model):
+    return os.path.join(store_path(config), "_latest", f"{model}.json")
+
+
+def new_run_id():
+    """Sortable, unique run id: start time plus a random suffix (runs can start in the same second)."""
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def current_run_id(config):
+    """Run id the pipeline passed to this stage (prediction_store.run_id in its config, or
+    PIPELINE_RUN_ID in a worker's environment), else a fresh one for this call."""
+    return (config.get("prediction_store", {}).get("run_id") or os.environ.get("PIPELINE_RUN_ID")
+            or new_run_id())
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("series", pa.string()),
+        ("timestamp", pa.timestamp("ns")),
+        ("kind", pa.string()),
+        ("actual", pa.float64()),
+        ("predicted", pa.float64()),
+    ])
+
+
+@traced("store.append")
+def append_predictions(config, df, model, kind, run_id=None, series_col=None, time_col="timestamp"):
+    """Append one model's predictions to the store and point `_latest/<model>` at this run.
+
+    Stages appending several parts resolve current_run_id() once and pass it as `run_id`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    run_id = run_id or current_run_id(config)
+    frame = pd.DataFrame({
+        "series": df[series_col].astype(str).to_numpy() if series_col and series_col in df.columns else "all",
+        "timestamp": pd.to_datetime(df[time_col]).to_numpy(),
+        "kind": kind,
+        "actual": df["actual"].to_numpy(dtype="float64") if "actual" in df.columns else float("nan"),
+        "predicted": df["predicted"].to_numpy(dtype="float64"),
+    }).sort_values(["series", "timestamp"], kind="stable")
+
+    part_dir = os.path.join(store_path(config), f"model={model}", f"run_id={run_id}")
+    os.makedirs(part_dir, exist_ok=True)
+    table = pa.Table.from_pandas(frame[COLUMNS], schema=_schema(), preserve_index=False)
+    count("predictions_appended", table.num_rows)
+    pq.write_table(table, os.path.join(part_dir, f"part-{uuid.uuid4().hex}.parquet"), row_group_size=100_000)
+
+    pointer = latest_pointer(config, model)
+    os.makedirs(os.path.dirname(pointer), exist_ok=True)
+    with open(pointer + ".tmp", "w") as f:
+        json.dump({"run_id": run_id}, f)
+    os.replace(pointer + ".tmp", pointer)
+    return run_id
+
+
+def latest_run(config, model):
+    """Run id of the model's most recent predictions, or None if it never wrote any."""
+    try:
+        with open(latest_pointer(config, model)) as f:
+            return json.load(f)["run_id"]
+    except FileNotFoundError:
+        return None
+
+
+def list_runs(config):
+    """(model, run_id) pairs in the store, from the partition directories alone."""
+    root = store_path(config)
+    rows = []
+    if os.path.isdir(root):
+        for model_dir in sorted(os.listdir(root)):
+            if not model_dir.startswith("model="):
+                continue
+            for run_dir in sorted(os.listdir(os.path.join(root, model_dir))):
+                if run_dir.startswith("run_id="):
+                    rows.append({"model": model_dir[len("model="):], "run_id": run_dir[len("run_id="):]})
+    return pd.DataFrame(rows, columns=["model", "run_id"])
+
+
+@traced("store.query")
+def query_predictions(config, models=None, run_ids=None, series=None, kinds=None,
+                      start=None, end=None, columns=None, latest=False):
+    """Read matching predictions with the filters pushed down to partitions and row groups.
+
+    With `latest`, each requested model is restricted to the run its `_latest` pointer names.
+    Returns a long frame including the model and run_id columns.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    root = store_path(config)
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=["model", "run_id"] + (columns or COLUMNS))
+
+    dataset = ds.dataset(
+        root, format="parquet", exclude_invalid_files=True,
+        partitioning=ds.partitioning(pa.schema([("model", pa.string()), ("run_id", pa.string())]), flavor="hive"),
+    )
+    conditions = []
+    if latest:
+        names = models if models is not None else list_runs(config)["model"].unique().tolist()
+        pairs = [(m, latest_run(config, m)) for m in names]
+        per_model = [(ds.field("model") == m) & (ds.field("run_id") == r) for m, r in pairs if r is not None]
+        if not per_model:
+            return pd.DataFrame(columns=["model", "run_id"] + (columns or COLUMNS))
+        condition = per_model[0]
+        for c in per_model[1:]:
+            condition = condition | c
+        conditions.append(condition)
+    elif models is not None:
+        conditions.append(ds.field("model").isin(list(models)))
+    if run_ids is not None:
+        conditions.append(ds.field("run_id").isin(list(run_ids)))
+    if series is not None:
+        conditions.append(ds.field("series").isin([str(s) for s in series]))
+    if kinds is not None:
+        conditions.append(ds.field("kind").isin(list(kinds)))
+    if start is not None:
+        conditions.append(ds.field("timestamp") >= pd.Timestamp(start).to_datetime64())
+    if end is not None:
+        conditions.append(ds.field("timestamp") <= pd.Timestamp(end).to_datetime64())
+
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    wanted = ["model", "run_id"] + [c for c in (columns or COLUMNS) if c not in ("model", "run_id")]
+    return dataset.to_table(columns=wanted, filter=condition).to_pandas()
+
+
+def run_parts(config, model, run_id):
+    """Part file names of one run, oldest first (appends never rewrite existing parts)."""
+    run_dir = os.path.join(store_path(config), f"model={model}", f"run_id={run_id}")
+    if not os.path.isdir(run_dir):
+        return []
+    parts = [p for p in os.listdir(run_dir) if p.startswith("part-") and p.endswith(".parquet")]
+    return sorted(parts, key=lambda p: os.path.getmtime(os.path.join(run_dir, p)))
+
+
+@traced("store.read_parts")
+def read_parts(config, model, run_id, parts, columns=None):
+    """Rows of the given part files of one run, with the model and run_id columns added."""
+    import pyarrow.parquet as pq
+
+    run_dir = os.path.join(store_path(config), f"model={model}", f"run_id={run_id}")
+    frames = [pq.read_table(os.path.join(run_dir, p), columns=columns or COLUMNS).to_pandas() for p in parts]
+    if not frames:
+        return pd.DataFrame(columns=["model", "run_id"] + (columns or COLUMNS))
+    frame = pd.concat(frames, ignore_index=True)
+    frame.insert(0, "run_id", run_id)
+    frame.insert(0, "model", model)
+    return frame
@@ -0,0 +1,127 @@
+"""
+Module: recursive.py
+Description: Recursive multi-step forecasting for feature-based models (XGBoost, Linear).
+             Each step predicts one hour for every series with a single predict call, then
+             pushes the predictions into a preallocated per-series ring buffer from which the
+             next step's lag and rolling features are read.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import traced
+from scripts.utils.features import ROLLING_STATS, feature_columns, rolling_specs, warmup_rows, series_positions
+
+HOUR = np.timedelta64(1, "h")
+
+
+def check_spec(spec):
+    """Recursive forecasting can only use features that are known before the target hour."""
+    bad = [name for name, _, _, shift in rolling_specs(spec) if shift < 1]
+    if bad or any(int(lag) < 1 for lag in spec.get("lags", [])):
+        raise ValueError(
+            f"Recursive forecasting needs lags >= 1 and rolling windows with shift >= 1; "
+            f"these features include the target hour: {bad}"
+        )
+
+
+def init_buffers(history, spec):
+    """Ring buffers (series x buffer_len) holding the last observed values of each series.
+
+    Returns (series_ids, last_timestamps, buffer); the newest value sits in the last column.
+    """
+    time_col = spec.get("time_col", "timestamp")
+    target = spec.get("target", "energy_kwh")
+    series_col = spec.get("series_col", "sector")
+    size = max(warmup_rows(spec), 1)
+
+    if series_col in history.columns:
+        history = history.sort_values([series_col, time_col], kind="stable")
+        series = history[series_col].to_numpy()
+    else:
+        history = history.sort_values(time_col, kind="stable")
+        series = np.zeros(len(history), dtype=np.int64)
+    ids, codes = np.unique(series, return_inverse=True)
+    values = history[target].to_numpy(dtype=np.float64)
+    ts = history[time_col].to_numpy(dtype="datetime64[ns]")
+
+    # Position counted back from each series' newest row; only the newest `size` rows are kept
+    counts = np.bincount(codes, minlength=len(ids))
+    back = counts[codes] - 1 - series_positions(codes)
+    keep = back < size
+    buffer = np.full((len(ids), size), np.nan)
+    buffer[codes[keep], size - 1 - back[keep]] = values[keep]
+
+    last_ts = np.empty(len(ids), dtype="datetime64[ns]")
+    last_ts[codes[back == 0]] = ts[back == 0]
+    if series_col not in history.columns:
+        ids = np.array([None], dtype=object)
+    return ids, last_ts, buffer
+
+
+@traced("recursive_forecast")
+def recursive_forecast(predict, history, spec, horizon, categorical=None):
+    """Roll a one-step model forward `horizon` hours for every series in `history`.
+
+    `predict` maps a (n_series, n_features) float32 matrix to n_series predictions and is
+    called exactly once per step. With `categorical` (a frame of categorical columns indexed
+    by series id, for a global model), `predict` instead receives a DataFrame of the numeric
+    features followed by those columns. Returns a long frame with series, timestamp, horizon
+    and predicted columns.
+    """
+    check_spec(spec)
+    time_col = spec.get("time_col", "timestamp")
+    series_col = spec.get("series_col", "sector")
+    ids, last_ts, buffer = init_buffers(history, spec)
+    n_series, size = buffer.shape
+
+    names = feature_columns(spec)
+    X = np.empty((n_series, len(names)), dtype=np.dtype(spec.get("dtype", "float32")))
+    out = np.empty((horizon, n_series))
+    head = 0  # next write slot; the value k hours back is at (head - k) % size
+    rolling = [(window, stat, shift) for _, window, stat, shift in rolling_specs(spec)]
+    if categorical is not None:
+        # Aligned to the buffer rows once; only the numeric block changes between steps
+        static = categorical.reindex(ids).reset_index(drop=True)
+
+    # Calendar and cyclical columns depend only on the timestamps: computed for all steps at once
+    steps = np.arange(1, horizon + 1)
+    ts = pd.DatetimeIndex((last_ts[None, :] + steps[:, None] * HOUR).ravel())
+    known = []
+    for field in spec.get("calendar", []):
+        known.append(np.asarray(getattr(ts, field)))
+    for field, period in spec.get("cyclical", {}).items():
+        angle = np.asarray(getattr(ts, field)) * (2 * np.pi / period)
+        known += [np.sin(angle), np.cos(angle)]
+    n_known = len(known)
+    known = np.stack(known, axis=1).reshape(horizon, n_series, n_known) if known else None
+
+    for step in range(horizon):
+        if known is not None:
+            X[:, :n_known] = known[step]
+        j = n_known
+        for lag in spec.get("lags", []):
+            X[:, j] = buffer[:, (head - int(lag)) % size]
+            j += 1
+        for window, stat, shift in rolling:
+            cols = (head - np.arange(shift + window - 1, shift - 1, -1)) % size  # oldest .. newest
+            X[:, j] = ROLLING_STATS[stat](buffer[:, cols])
+            j += 1
+
+        if categorical is None:
+            pred = np.asarray(predict(X), dtype=np.float64)
+        else:
+            frame = pd.concat([pd.DataFrame(X, columns=names, copy=False), static], axis=1)
+            pred = np.asarray(predict(frame), dtype=np.float64)
+        out[step] = pred
+        buffer[:, head] = pred
+        head = (head + 1) % size
+
+    result = pd.DataFrame({
+        time_col: (last_ts[None, :] + steps[:, None] * HOUR).ravel(order="F"),
+        "horizon": np.tile(steps, n_series),
+        "predicted": out.ravel(order="F"),
+    })
+    if ids[0] is not None:
+        result.insert(0, series_col, np.repeat(ids, horizon))
+    return result
@@ -0,0 +1,163 @@
+"""
+Module: registry.py
+Description: Model registry under `model_paths.output`. Fitted models are saved in their native
+             formats (XGBoost UBJSON, Prophet JSON, joblib for scikit-learn) together with a
+             metadata.json holding the feature list, training window, config hash and metrics,
+             so they can be loaded and scored without refitting.
+
+Layout:
+    models/<name>/<version>/model.<ext>
+    models/<name>/<version>/metadata.json
+    models/<name>/latest.json            -> {"version": "<version>"}
+    models/<name>/intervals.parquet      calibrated interval offsets (see intervals.py)
+    models/<name>/intervals.json         how and when they were calibrated
+"""
+
+import os
+import copy
+import json
+import hashlib
+from datetime import datetime
+
+from scripts.utils.instrument import traced
+
+MODEL_FILES = {"xgboost": "model.ubj", "prophet": "model.json", "sklearn": "model.joblib"}
+
+# Model files stay in memory so repeated loads in one process never re-read them; every
+# caller still gets its own model object, which it may change (online updates, serving settings)
+_loaded = {}
+
+
+def config_hash(config, sections):
+    payload = {name: config.get(name) for name in sorted(sections)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _model_dir(config, name, version=None):
+    root = os.path.join(config["model_paths"]["output"], name)
+    if version is None:
+        with open(os.path.join(root, "latest.json")) as f:
+            version = json.load(f)["version"]
+    return os.path.join(root, version)
+
+
+@traced("registry.save")
+def save_model(config, name, model, kind, features, train_index, metrics=None, config_sections=(), params=None):
+    """Save a fitted model and its metadata; returns the new version string.
+
+    `train_index` is the timestamp column (or index) the model was fitted on; `params` are
+    hyperparameters worth reusing (e.g. the winner of a tuning run).
+    """
+    if kind not in MODEL_FILES:
+        raise ValueError(f"Unknown model kind '{kind}'. Use one of {list(MODEL_FILES)}.")
+
+    chash = config_hash(config, config_sections)
+    version = f"{datetime.now():%Y%m%dT%H%M%S}-{chash[:8]}"
+    model_dir = _model_dir(config, name, version)
+    os.makedirs(model_dir, exist_ok=True)
+    model_file = os.path.join(model_dir, MODEL_FILES[kind])
+
+    if kind == "xgboost":
+        model.save_model(model_file)
+    elif kind == "prophet":
+        from prophet.serialize import model_to_json
+        with open(model_file, "w") as f:
+            f.write(model_to_json(model))
+    else:
+        import joblib
+        joblib.dump(model, model_file)
+
+    metadata = {
+        "name": name,
+        "kind": kind,
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "features": list(features),
+        "train_start": str(min(train_index)),
+        "train_end": str(max(train_index)),
+        "n_train": len(train_index),
+        "config_hash": chash,
+        "config_sections": list(config_sections),
+        "metrics": {k: float(v) for k, v in (metrics or {}).items()},
+        "params": params or {},
+    }
+    with open(os.path.join(model_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    # Point `latest` at the new version only once everything is on disk
+    latest = os.path.join(config["model_paths"]["output"], name, "latest.json")
+    with open(latest + ".tmp", "w") as f:
+        json.dump({"version": version}, f)
+    os.replace(latest + ".tmp", latest)
+    return version
+
+
+def load_metadata(config, name, version=None):
+    with open(os.path.join(_model_dir(config, name, version), "metadata.json")) as f:
+        return json.load(f)
+
+
+def _deserialize(kind, payload):
+    if kind == "xgboost":
+        from xgboost import XGBRegressor
+        model = XGBRegressor()
+        model.load_model(bytearray(payload))
+        return model
+    if kind == "prophet":
+        from prophet.serialize import model_from_json
+        return model_from_json(payload.decode())
+    import io
+    import joblib
+    return joblib.load(io.BytesIO(payload))
+
+
+def load_model(config, name, version=None):
+    """Return (model, metadata) for `name`, defaulting to the latest version.
+
+    Each call builds a new model object, so callers never see each other's changes to it.
+    """
+    model_dir = _model_dir(config, name, version)
+    if model_dir not in _loaded:
+        metadata = load_metadata(config, name, os.path.basename(model_dir))
+        with open(os.path.join(model_dir, MODEL_FILES[metadata["kind"]]), "rb") as f:
+            _loaded[model_dir] = (f.read(), metadata)
+    payload, metadata = _loaded[model_dir]
+    return _deserialize(metadata["kind"], payload), copy.deepcopy(metadata)
+
+
+def save_intervals(config, name, table, metadata):
+    """Store calibrated interval offsets for `name`; they apply to every version until recalibrated."""
+    from scripts.utils.storage import write_table
+
+    root = os.path.join(config["model_paths"]["output"], name)
+    write_table(table, os.path.join(root, "intervals.parquet"))
+    metadata = {"name": name, "created": datetime.now().isoformat(timespec="seconds"), **metadata}
+    with open(os.path.join(root, "intervals.json.tmp"), "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(os.path.join(root, "intervals.json.tmp"), os.path.join(root, "intervals.json"))
+
+
+def load_intervals(config, name):
+    """Calibrated interval table for `name`, or None when it was never calibrated."""
+    import pandas as pd
+
+    path = os.path.join(config["model_paths"]["output"], name, "intervals.parquet")
+    if not os.path.exists(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    if key not in _loaded:
+        _loaded[key] = pd.read_parquet(path)
+    return _loaded[key]
+
+
+def score(config, name, df, version=None):
+    """Predict with a registered model without refitting.
+
+    Feature models take a frame with the model's feature columns; Prophet takes a frame
+    with a `ds` (or `timestamp`) column. Returns a numpy array of predictions.
+    """
+    model, metadata = load_model(config, name, version)
+    if metadata["kind"] == "prophet":
+        ds = df["ds"] if "ds" in df.columns else df["timestamp"]
+        return model.predict(ds.to_frame("ds"))["yhat"].to_numpy()
+    return model.predict(df[metadata["features"]])
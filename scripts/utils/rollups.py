@@ -0,0 +1,155 @@
+"""
+Module: rollups.py
+Description: Pre-aggregated rollups of the prediction store for long-range dashboard views.
+             Rows of each model's latest run are summed per model, kind, sector and hour, and the
+             hourly totals are rolled up to day / week / month: counts, sums, min/max/mean of the
+             hourly actual and predicted totals, and error sums (absolute, squared, signed) over
+             the rows that have both.
+
+The hourly table holds only counts and sums, which add, so new prediction parts are aggregated
+on their own and merged into the touched hours. Min/max/mean describe hourly totals, which only
+exist once every part of an hour is in, so coarser periods touched by new rows are recomputed
+from the merged hourly table rather than merged.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.instrument import traced
+
+KEYS = ["model", "kind", "sector", "period"]  # kinds (test, insample, forecast) are never mixed
+GRANULARITIES = {"hour": 1, "day": 24, "week": 24 * 7, "month": 24 * 30}  # approximate hours per period
+TOTAL = "Total"  # sector holding the sum over all sectors
+
+# n, n_actual, n_predicted and n_scored count prediction rows; hours_* count hours with a total
+SUMS = ["n", "n_actual", "actual_sum", "n_predicted", "predicted_sum", "n_scored", "abs_err_sum", "sq_err_sum", "err_sum"]
+HOURS = ["hours_actual", "hours_predicted"]
+MINS = ["actual_min", "predicted_min"]
+MAXS = ["actual_max", "predicted_max"]
+COLUMNS = KEYS + ["run_id"] + SUMS + HOURS + MINS + MAXS + ["actual_mean", "predicted_mean"]
+
+
+def period_start(times, granularity):
+    """Start of the period holding each timestamp (weeks start on Monday)."""
+    times = pd.Series(pd.to_datetime(times))
+    if granularity == "hour":
+        return times.dt.floor("h")
+    if granularity == "day":
+        return times.dt.floor("D")
+    if granularity == "week":
+        day = times.dt.floor("D")
+        return day - pd.to_timedelta(day.dt.dayofweek, unit="D")
+    if granularity == "month":
+        return times.dt.to_period("M").dt.start_time
+    raise ValueError(f"Unknown granularity '{granularity}'. Use one of {list(GRANULARITIES)}.")
+
+
+def _with_means(table):
+    table["actual_mean"] = table["actual_sum"] / table["hours_actual"].where(table["hours_actual"] > 0)
+    table["predicted_mean"] = table["predicted_sum"] / table["hours_predicted"].where(table["hours_predicted"] > 0)
+    return table
+
+
+def combine(table):
+    """Merge hourly rows with the same (model, kind, sector, period) by adding their sums.
+
+    Each hour's total is then its own min, max and mean.
+    """
+    agg = {**{c: "sum" for c in SUMS}, "run_id": "last"}
+    out = table.groupby(KEYS, sort=True, observed=True).agg(agg).reset_index()
+    for value in ("actual", "predicted"):
+        has = out[f"n_{value}"] > 0
+        out[f"hours_{value}"] = has.astype(np.int64)
+        out[f"{value}_min"] = out[f"{value}_max"] = out[f"{value}_sum"].where(has)
+    return _with_means(out)[COLUMNS]
+
+
+@traced("rollups.aggregate")
+def aggregate(rows, sector_of=None, total=False):
+    """Hourly rollup of raw prediction rows (model, run_id, series, timestamp, kind, actual, predicted).
+
+    `sector_of` maps series ids to sectors (series are their own sector otherwise); with
+    `total`, a TOTAL sector summing all sectors is added.
+    """
+    sector = rows["series"].map(sector_of) if sector_of is not None else rows["series"]
+    err = rows["predicted"] - rows["actual"]
+    frame = pd.DataFrame({
+        "model": rows["model"].astype(str).to_numpy(),
+        "run_id": rows["run_id"].astype(str).to_numpy(),
+        "kind": rows["kind"].astype(str).to_numpy(),
+        "sector": sector.fillna(rows["series"]).astype(str).to_numpy(),
+        "period": period_start(rows["timestamp"], "hour").to_numpy(),
+        "actual": rows["actual"].to_numpy(dtype=np.float64),
+        "predicted": rows["predicted"].to_numpy(dtype=np.float64),
+        "err": err.to_numpy(dtype=np.float64),
+    })
+    frame["abs_err"] = np.abs(frame["err"])
+    frame["sq_err"] = frame["err"] ** 2
+    hourly = frame.groupby(KEYS, sort=True).agg(
+        run_id=("run_id", "last"),
+        n=("model", "size"),
+        n_actual=("actual", "count"), actual_sum=("actual", "sum"),
+        n_predicted=("predicted", "count"), predicted_sum=("predicted", "sum"),
+        n_scored=("err", "count"), abs_err_sum=("abs_err", "sum"),
+        sq_err_sum=("sq_err", "sum"), err_sum=("err", "sum"),
+    ).reset_index()
+    if total:
+        hourly = pd.concat([hourly, hourly.assign(sector=TOTAL)], ignore_index=True)
+    return combine(hourly)
+
+
+def regroup(hourly, granularity):
+    """Roll a complete hourly rollup up to a coarser granularity."""
+    if granularity == "hour":
+        return hourly
+    agg = {**{c: "sum" for c in SUMS + HOURS}, **{c: "min" for c in MINS}, **{c: "max" for c in MAXS},
+           "run_id": "last"}
+    out = (hourly.assign(period=period_start(hourly["period"], granularity).to_numpy())
+           .groupby(KEYS, sort=True, observed=True).agg(agg).reset_index())
+    return _with_means(out)[COLUMNS]
+
+
+def merge(existing, new):
+    """Existing hourly rollup with the hourly rollup `new` merged in; only hours present in `new` are recombined."""
+    if existing is None or existing.empty:
+        return new.sort_values(KEYS, ignore_index=True)
+    touched = existing.set_index(KEYS).index.isin(new.set_index(KEYS).index)
+    merged = combine(pd.concat([existing[touched], new], ignore_index=True))
+    return pd.concat([existing[~touched], merged], ignore_index=True).sort_values(KEYS, ignore_index=True)
+
+
+def _period_keys(table, granularity):
+    return pd.MultiIndex.from_frame(table[KEYS].assign(period=period_start(table["period"], granularity).to_numpy()))
+
+
+def refresh(existing, hourly, new, granularity):
+    """Coarse rollup with the periods holding the new hourly rows `new` recomputed from the merged hourly rollup."""
+    if granularity == "hour":
+        return hourly
+    touched = _period_keys(new, granularity).unique()
+    recomputed = regroup(hourly[_period_keys(hourly, granularity).isin(touched)], granularity)
+    if existing is None or existing.empty:
+        return recomputed.sort_values(KEYS, ignore_index=True)
+    stale = existing.set_index(KEYS).index.isin(touched)
+    return pd.concat([existing[~stale], recomputed], ignore_index=True).sort_values(KEYS, ignore_index=True)
+
+
+def pick_granularity(start, end, max_points):
+    """Finest granularity whose period count over [start, end] stays within `max_points`."""
+    hours = (pd.Timestamp(end) - pd.Timestamp(start)) / pd.Timedelta(hours=1) + 1
+    for name, length in GRANULARITIES.items():
+        if hours / length <= max_points:
+            return name
+    return "month"
+
+
+def range_errors(table):
+    """MAE, RMSE and bias per model and kind from the error sums of a rollup slice."""
+    sums = table.groupby(["model", "kind"], observed=True)[["n_scored", "abs_err_sum", "sq_err_sum", "err_sum"]].sum()
+    n = sums["n_scored"].where(sums["n_scored"] > 0)
+    return pd.DataFrame({
+        "n": sums["n_scored"],
+        "MAE": sums["abs_err_sum"] / n,
+        "RMSE": np.sqrt(sums["sq_err_sum"] / n),
+        "BIAS": sums["err_sum"] / n,
+    }).round(3)
@@ -0,0 +1,292 @@
+"""
+Module: serving.py
+Description: Forecast service behind scripts/serve.py. Registered models, the feature state (the
+             last warm-up rows of every series, see features.tail_state) and calibrated intervals
+             are loaded once at startup. Concurrent requests for the same model are coalesced by a
+             MicroBatcher into one recursive_forecast over the union of their series, so a forecast
+             step costs one predict call however many requests are waiting.
+
+Prophet needs no history: its forecast depends only on the fitted model and the timestamps, so
+each series' forecast is computed once (without uncertainty sampling) and then sliced.
+"""
+
+import time
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.utils.features import feature_columns
+from scripts.utils.recursive import recursive_forecast
+from scripts.utils.registry import load_model, load_intervals
+from scripts.utils.linear import BatchedLinearRegression
+from scripts.utils.intervals import apply_intervals, REGISTRY_NAMES, registry_name
+from scripts.utils.storage import table_path, read_table
+from scripts.utils.instrument import Histogram
+
+SINGLE = "all"  # series id of a single-series dataset (no series column), as in the prediction store
+HOUR = np.timedelta64(1, "h")
+
+
+class ServingError(ValueError):
+    """The request cannot be served; the message is returned to the client."""
+
+
+class MicroBatcher:
+    """Coalesce concurrent (series, horizon) requests into one run_batch(series, horizon) call.
+
+    The first request of a batch waits `max_wait` seconds for company; requests arriving while a
+    batch runs are picked up by the next one. run_batch runs on a dedicated thread, so the event
+    loop keeps accepting requests, and returns {series id: {column: array over horizons}}.
+    """
+
+    def __init__(self, run_batch, max_series=2048, max_wait=0.002):
+        self.run_batch = run_batch
+        self.max_series = max_series
+        self.max_wait = max_wait
+        self.batch_series = Histogram((1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def start(self):
+        return asyncio.get_running_loop().create_task(self._loop())
+
+    async def submit(self, series, horizon):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((series, horizon, future))
+        return await future
+
+    def _drain(self, batch, n):
+        while n < self.max_series and not self._queue.empty():
+            item = self._queue.get_nowait()
+            batch.append(item)
+            n += len(item[0])
+        return n
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n = self._drain(batch, len(batch[0][0]))
+            if n < self.max_series and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                self._drain(batch, n)
+            series = list(dict.fromkeys(s for item in batch for s in item[0]))
+            horizon = max(item[1] for item in batch)
+            self.batch_series.observe(len(series))
+            try:
+                result = await loop.run_in_executor(self._executor, self.run_batch, series, horizon)
+            except Exception as e:
+                logging.exception(f"Batch of {len(series)} series failed")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for wanted, h, future in batch:
+                if not future.done():  # the client may have gone away
+                    future.set_result({s: {k: v[:h] for k, v in result[s].items()} for s in wanted})
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _by_series(series, timestamps, predicted, offsets=None):
+    """{series id: column arrays}; rows of the (n_series, horizon) arrays follow `series`."""
+    out = {}
+    for i, sid in enumerate(series):
+        cols = {"timestamp": timestamps[i], "predicted": predicted[i]}
+        if offsets is not None:
+            lower, upper = offsets[sid]
+            cols["lower"] = predicted[i] + lower[:predicted.shape[1]]
+            cols["upper"] = predicted[i] + upper[:predicted.shape[1]]
+        out[sid] = cols
+    return out
+
+
+class ForecastService:
+    """Load models once, answer forecast requests through one MicroBatcher per model."""
+
+    def __init__(self, config, models=None, max_horizon=168, max_series=2048, max_wait=0.002):
+        self.config = config
+        self.spec = config["features"]
+        self.max_horizon = max_horizon
+        self.level = config.get("intervals", {}).get("level", 0.95)
+        self.latency = {}
+        self.versions = {}
+        self._batch_args = (max_series, max_wait)
+        self._runners = {}
+        self.batchers = {}
+
+        start = time.perf_counter()
+        self._load_state()
+        for name in models or list(REGISTRY_NAMES):
+            try:
+                loader = self._prophet if name == "Prophet" else self._feature_model
+                self._runners[name] = loader(name)
+            except FileNotFoundError:
+                logging.warning(f"No registered {name} model; it will not be served.")
+                continue
+            self._runners[name](self.series[:1], 1)  # warm-up: first predict calls are slow
+            self.latency[name] = Histogram()
+        if not self._runners:
+            raise ServingError("No registered models to serve; run the pipeline first.")
+        logging.info(f"Loaded {list(self._runners)} for {len(self.series)} series in {time.perf_counter() - start:.2f}s")
+
+    # --- startup ---
+    def _load_state(self):
+        series_col = self.spec["series_col"]
+        path = table_path(self.config, self.config["data_paths"]["processed"], "processed_data_features_state")
+        state = read_table(path)
+        if series_col in state.columns:
+            state = state.sort_values([series_col, self.spec["time_col"]], kind="stable").reset_index(drop=True)
+            ids = state[series_col].to_numpy()
+            self.series = [str(s) for s in pd.unique(ids)]
+            bounds = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1], True])
+            self._rows = {str(ids[lo]): np.arange(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])}
+        else:
+            self.series = [SINGLE]
+            self._rows = {SINGLE: np.arange(len(state))}
+        self.state = state
+        # Per-series categorical columns as codes over their sorted values, as at training time
+        self._codes = None
+        if series_col in state.columns:
+            first = state.drop_duplicates(series_col)
+            static = [c for c in [series_col] + list(self.spec.get("static", [])) if c in state.columns]
+            self._codes = pd.DataFrame({c: pd.Categorical(first[c], categories=sorted(state[c].unique())).codes
+                                        for c in static}, index=first[series_col].to_numpy())
+
+    def _interval_offsets(self, name):
+        """{series id: (lower, upper) offsets over horizons 1..max_horizon}, or None if uncalibrated."""
+        # Per-series models (Prophet) keep their intervals per series; pooled rows repeat in each
+        entries = sorted({registry_name(name, sid) for sid in self.series})
+        tables = [t for t in (load_intervals(self.config, e) for e in entries) if t is not None]
+        if not tables:
+            return None
+        table = pd.concat(tables, ignore_index=True).drop_duplicates(["series", "horizon", "level"])
+        grid = pd.DataFrame({"series": np.repeat(self.series, self.max_horizon),
+                             "horizon": np.tile(np.arange(1, self.max_horizon + 1), len(self.series)),
+                             "predicted": 0.0})
+        bounds = apply_intervals(grid, table, self.level)
+        lower = bounds["lower"].to_numpy().reshape(len(self.series), self.max_horizon)
+        upper = bounds["upper"].to_numpy().reshape(len(self.series), self.max_horizon)
+        return {sid: (lower[i], upper[i]) for i, sid in enumerate(self.series)}
+
+    def _predictor(self, model, meta, ids):
+        """Matrix-in, array-out predict for recursive_forecast, bound to the batch's series `ids`."""
+        numeric = feature_columns(self.spec)
+        extra = [c for c in meta["features"] if c not in numeric]  # series id / static columns
+        if meta["kind"] == "xgboost":
+            booster = model.get_booster()
+            if not extra:
+                return booster.inplace_predict
+            # Category codes as extra columns: same results as a categorical DataFrame, without
+            # the per-step pandas conversion
+            codes = self._codes.reindex(ids)[extra].to_numpy(dtype=np.float32)
+            return lambda X: booster.inplace_predict(np.hstack([X, codes]))
+        if isinstance(model, BatchedLinearRegression) and extra:
+            return model.for_series(ids)
+        return model.predict
+
+    def _feature_model(self, name):
+        """run_batch for XGBoost / Linear: recursive forecast over the requested series' state rows."""
+        model, meta = load_model(self.config, REGISTRY_NAMES[name])
+        self.versions[name] = meta["version"]
+        series_col, time_col, target = self.spec["series_col"], self.spec["time_col"], self.spec["target"]
+        history = self.state[[c for c in (series_col, time_col, target) if c in self.state.columns]]
+        offsets = self._interval_offsets(name)
+
+        def run_batch(series, horizon):
+            hist = history.iloc[np.concatenate([self._rows[s] for s in series])]
+            # recursive_forecast orders series by id; the predictor and the answer follow that order
+            ids = np.unique(hist[series_col].to_numpy()) if series_col in hist.columns else None
+            ordered = [SINGLE] if ids is None else [str(s) for s in ids]
+            frame = recursive_forecast(self._predictor(model, meta, ids), hist, self.spec, horizon)
+            shape = (len(ordered), horizon)
+            return _by_series(ordered, frame[time_col].to_numpy().reshape(shape),
+                              frame["predicted"].to_numpy().reshape(shape), offsets)
+        return run_batch
+
+    def _prophet(self, name):
+        """run_batch for Prophet: per-series forecasts computed once up to max_horizon, then sliced."""
+        models = {}
+        for sid in self.series:
+            model, meta = load_model(self.config, registry_name(name, sid))
+            model.uncertainty_samples = 0  # intervals come from the calibrated table
+            models[sid] = (model, np.datetime64(pd.Timestamp(meta["train_end"])))
+            self.versions[name] = meta["version"]
+        offsets = self._interval_offsets(name)
+        steps = np.arange(1, self.max_horizon + 1) * HOUR
+        cache = {}
+
+        def run_batch(series, horizon):
+            for sid in series:
+                if sid not in cache:
+                    model, last = models[sid]
+                    ds = last + steps
+                    yhat = model.predict(pd.DataFrame({"ds": ds}))["yhat"].to_numpy()
+                    cache[sid] = _by_series([sid], ds[None, :], yhat[None, :], offsets)[sid]
+            return {s: cache[s] for s in series}
+        return run_batch
+
+    # --- requests ---
+    def start(self):
+        """Start one batcher per model; call from inside the running event loop."""
+        max_series, max_wait = self._batch_args
+        for name, run_batch in self._runners.items():
+            self.batchers[name] = MicroBatcher(run_batch, max_series, max_wait)
+            self.batchers[name].start()
+
+    async def forecast(self, model, series, horizon):
+        """JSON-ready forecast of `horizon` hours for each id in `series`."""
+        started = time.perf_counter()
+        if model not in self.batchers:
+            raise ServingError(f"Unknown model '{model}'. Serving {list(self.batchers)}.")
+        if isinstance(series, str):
+            series = [series]
+        series = [str(s) for s in series] or list(self.series)
+        unknown = [s for s in series if s not in self._rows]
+        if unknown:
+            raise ServingError(f"Unknown series {unknown[:5]}{' ...' if len(unknown) > 5 else ''}.")
+        if not 1 <= int(horizon) <= self.max_horizon:
+            raise ServingError(f"horizon must be between 1 and {self.max_horizon} hours.")
+
+        result = await self.batchers[model].submit(series, int(horizon))
+        forecasts = {}
+        for sid, cols in result.items():
+            forecasts[sid] = {
+                "timestamp": np.datetime_as_string(cols["timestamp"].astype("datetime64[s]")).tolist(),
+                **{c: np.round(v.astype(np.float64), 4).tolist() for c, v in cols.items() if c != "timestamp"},
+            }
+        self.latency[model].observe(time.perf_counter() - started)
+        return {"model": model, "version": self.versions.get(model), "level": self.level, "forecasts": forecasts}
+
+    def metrics(self):
+        """Prometheus text: request latency and batch size histograms per model."""
+        lines = ["# HELP forecast_request_seconds Forecast request latency inside the server.",
+                 "# TYPE forecast_request_seconds histogram"]
+        for name, hist in self.latency.items():
+            lines += hist.prometheus("forecast_request_seconds", {"model": name})
+        lines += ["# HELP forecast_batch_series Series per micro-batched predict run.",
+                  "# TYPE forecast_batch_series histogram"]
+        for name, batcher in self.batchers.items():
+            lines += batcher.batch_series.prometheus("forecast_batch_series", {"model": name})
+        return "\n".join(lines) + "\n"
+
+    def health(self):
+        stats = {}
+        for name, hist in self.latency.items():
+            p50, p99 = hist.quantile(0.5), hist.quantile(0.99)
+            stats[name] = {
+                "version": self.versions.get(name),
+                "requests": hist.n,
+                "p50_ms": None if p50 is None else round(p50 * 1000, 2),
+                "p99_ms": None if p99 is None else round(p99 * 1000, 2),
+                "mean_batch_series": round(self.batchers[name].batch_series.total / max(self.batchers[name].batch_series.n, 1), 1)
+                if name in self.batchers else None,
+            }
+        return {"status": "ok", "series": len(self.series), "max_horizon": self.max_horizon, "models": stats}
+
+    def shutdown(self):
+        for batcher in self.batchers.values():
+            batcher.shutdown()
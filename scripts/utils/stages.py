@@ -0,0 +1,76 @@
+"""
+Module: stages.py
+Description: In-process API for the pipeline stages. Each stage is a `run(config, inputs)`
+             function in scripts/stages/ that writes its outputs and returns its main tables,
+             so stages run together can hand DataFrames to each other instead of re-reading
+             them. Stage modules (and their heavy dependencies) are imported on first use.
+
+    from scripts.utils.stages import run_stage, run_stages
+    run_stage("features", config)
+    run_stages(["prepare_input", "features", "train_xgboost"], config)
+"""
+
+import logging
+import importlib
+
+from scripts.utils.storage import table_path, table_columns, read_table
+
+STAGES = {
+    "prepare_input": "scripts.stages.prepare_input",
+    "features": "scripts.stages.features",
+    "train_prophet": "scripts.stages.train_prophet",
+    "train_xgboost": "scripts.stages.train_xgboost",
+    "tune_xgboost": "scripts.stages.tune_xgboost",
+    "train_linear": "scripts.stages.train_linear",
+    "evaluate": "scripts.stages.evaluate",
+    "backtest": "scripts.stages.backtest",
+    "rollup": "scripts.stages.rollup",
+}
+
+# Pipeline step names (config `pipeline.steps`) that differ from the stage names
+ALIASES = {
+    "feature_engineering": "features",
+    "evaluate_models": "evaluate",
+    "backtest_models": "backtest",
+    "rollup_predictions": "rollup",
+}
+
+
+def stage_name(name):
+    name = ALIASES.get(name, name)
+    if name not in STAGES:
+        raise ValueError(f"Unknown stage '{name}'. Available: {list(STAGES)}")
+    return name
+
+
+def run_stage(name, config, inputs=None):
+    """Run one stage in this process; returns the tables it produced as {table_name: df}."""
+    name = stage_name(name)
+    module = importlib.import_module(STAGES[name])
+    logging.info(f"Running stage {name} in-process.")
+    return module.run(config, inputs or {}) or {}
+
+
+def run_stages(names, config, inputs=None):
+    """Run stages in order, passing every table produced so far to the next stage."""
+    tables = dict(inputs or {})
+    for name in names:
+        tables.update(run_stage(name, config, tables))
+    return tables
+
+
+def load_input(config, inputs, name, columns, optional=()):
+    """Columns of table `name` from the in-memory `inputs` when present, else from disk.
+
+    `optional` columns (e.g. the series column) are included only if the table has them.
+    """
+    if name in inputs:
+        frame = inputs[name]
+        available = frame.columns
+    else:
+        path = table_path(config, config["data_paths"]["processed"], name)
+        available = table_columns(path)
+    wanted = [c for c in optional if c in available] + list(columns)
+    if name in inputs:
+        return frame[wanted]
+    return read_table(path, columns=wanted)
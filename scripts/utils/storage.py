@@ -0,0 +1,188 @@
+"""
+Module: storage.py
+Description: Shared table storage for processed data and predictions. Tables are written as
+             typed columnar files (Parquet or Arrow IPC) so timestamps and dtypes survive
+             round-trips, with column projection and memory-mapped reads. CSV stays available
+             as a storage format and as an optional export next to each table.
+
+Appending to a Parquet or Arrow table turns its path into a dataset directory of part files
+(`<name>.parquet/part-<uuid>.parquet`); readers treat a file and a directory the same way.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import pandas as pd
+
+from scripts.utils.instrument import traced, count
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def table_extension(config):
+    fmt = config.get("storage", {}).get("format", "parquet")
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unsupported storage format '{fmt}'. Use one of {list(EXTENSIONS)}.")
+    return EXTENSIONS[fmt]
+
+
+def table_path(config, directory, name):
+    """Path of table `name` in `directory` using the configured storage format."""
+    return os.path.join(directory, name + table_extension(config))
+
+
+def csv_export_enabled(config):
+    return config.get("storage", {}).get("csv_export", False)
+
+
+def _format_of(path):
+    for fmt, ext in EXTENSIONS.items():
+        if path.rstrip(os.sep).endswith(ext):
+            return fmt
+    raise ValueError(f"Cannot infer table format from '{path}'.")
+
+
+def _dataset(path):
+    """pyarrow dataset over the part files of an appended table directory."""
+    import pyarrow.dataset as ds
+    return ds.dataset(path, format="parquet" if _format_of(path) == "parquet" else "ipc")
+
+
+def _write_file(table, path, fmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        pq.write_table(table, path)
+    else:
+        # Uncompressed IPC so readers can memory-map the buffers without decoding
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+@traced("write_table")
+def write_table(df, path, csv_export=False):
+    """Write `df` atomically; the format follows the file extension."""
+    import pyarrow as pa
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fmt = _format_of(path)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if fmt == "csv":
+        df.to_csv(tmp, index=False)
+    else:
+        _write_file(pa.Table.from_pandas(df, preserve_index=False), tmp, fmt)
+    if os.path.isdir(path):
+        # Replacing an appended table: swap the directory out, then drop it
+        old = f"{path}.old-{os.getpid()}"
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp, path)
+
+    if csv_export and fmt != "csv":
+        df.to_csv(os.path.splitext(path)[0] + ".csv", index=False)
+    count("rows_written", len(df))
+    return path
+
+
+def _part_name(ext):
+    # Readers list parts in name order, so names sort by write time
+    return f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}{ext}"
+
+
+@traced("append_table")
+def append_table(df, path, csv_export=False):
+    """Append rows to an existing table (or create it).
+
+    CSV is appended in place. Parquet and Arrow files cannot be extended after they are
+    closed, so the rows go to a new part file in the table's dataset directory (the first
+    append moves the existing file into it); the cost is the new rows only.
+    """
+    import pyarrow as pa
+
+    if not os.path.exists(path):
+        return write_table(df, path, csv_export=csv_export)
+    fmt = _format_of(path)
+    if fmt == "csv":
+        header = pd.read_csv(path, nrows=0).columns
+        df[list(header)].to_csv(path, mode="a", header=False, index=False)
+        return path
+
+    ext = EXTENSIONS[fmt]
+    if not os.path.isdir(path):
+        tmp_dir = f"{path}.dir-{os.getpid()}"
+        os.makedirs(tmp_dir)
+        os.replace(path, os.path.join(tmp_dir, _part_name(ext)))
+        os.replace(tmp_dir, path)
+    # New parts take the table's schema so the dataset reads as one table
+    schema = _dataset(path).schema.remove_metadata()
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    name = _part_name(ext)
+    tmp = os.path.join(path, f".{name}.tmp")  # dot-prefixed files are ignored by dataset readers
+    _write_file(table, tmp, fmt)
+    os.replace(tmp, os.path.join(path, name))
+    count("rows_written", len(df))
+
+    if csv_export:
+        export = os.path.splitext(path.rstrip(os.sep))[0] + ".csv"
+        df.to_csv(export, mode="a", header=not os.path.exists(export), index=False)
+    return path
+
+
+def table_columns(path):
+    """Column names of a table without loading its data."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fmt = _format_of(path)
+    if os.path.isdir(path):
+        return _dataset(path).schema.names
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    if fmt == "arrow":
+        return pa.ipc.open_file(pa.memory_map(path, "r")).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+@traced("read_table")
+def read_table(path, columns=None, filters=None, memory_map=True, parse_dates=("timestamp", "ds")):
+    """Read a table, loading only `columns` when given.
+
+    `filters` uses pyarrow's DNF syntax, e.g. [("timestamp", ">", ts)], and is pushed down
+    to row groups for Parquet. `parse_dates` only applies to CSV files.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.dataset as ds
+
+    fmt = _format_of(path)
+    if os.path.isdir(path):
+        filter_expr = pq.filters_to_expression(filters) if filters is not None else None
+        table = _dataset(path).to_table(columns=columns, filter=filter_expr)
+        count("rows_read", table.num_rows)
+        return table.to_pandas()
+    if fmt == "parquet":
+        table = pq.read_table(path, columns=columns, filters=filters, memory_map=memory_map)
+        count("rows_read", table.num_rows)
+        return table.to_pandas()
+    if fmt == "arrow":
+        source = pa.memory_map(path, "r") if memory_map else pa.OSFile(path, "rb")
+        table = pa.ipc.open_file(source).read_all()
+        if filters is not None:
+            table = ds.dataset(table).to_table(filter=pq.filters_to_expression(filters))
+        if columns is not None:
+            table = table.select(columns)
+        count("rows_read", table.num_rows)
+        return table.to_pandas()
+
+    header = pd.read_csv(path, nrows=0).columns
+    dates = [c for c in parse_dates if c in header and (columns is None or c in columns)]
+    df = pd.read_csv(path, usecols=columns, parse_dates=dates)
+    if filters is not None:
+        table = ds.dataset(pa.Table.from_pandas(df, preserve_index=False))
+        df = table.to_table(filter=pq.filters_to_expression(filters)).to_pandas()
+    count("rows_read", len(df))
+    return df
@@ -0,0 +1,167 @@
+"""
+Module: tuning.py
+Description: Hyperparameter search for XGBoost: random search or successive halving over a search
+             space declared in config (`xgboost.tuning.space`), with early stopping on a
+             time-ordered validation split.
+
+The training and validation matrices are built once as native QuantileDMatrix objects and shared
+by every trial. Trials run on a thread pool: XGBoost releases the GIL while boosting, so threads
+give real parallelism without copying the data into worker processes. Successive halving grows the
+surviving boosters in place (xgb_model=...) instead of refitting them at each rung; the best
+validation round and the early-stopping patience carry over from rung to rung, so the result is
+the same as one uninterrupted fit.
+
+Search space entries:
+    max_depth: {type: int, low: 3, high: 10}
+    learning_rate: {type: loguniform, low: 0.01, high: 0.3}
+    subsample: {type: uniform, low: 0.6, high: 1.0}
+    tree_method: {type: choice, values: [hist]}
+"""
+
+import os
+import math
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.utils.instrument import traced
+
+SAMPLERS = {
+    "int": lambda rng, s: int(rng.integers(s["low"], s["high"] + 1)),
+    "uniform": lambda rng, s: float(rng.uniform(s["low"], s["high"])),
+    "loguniform": lambda rng, s: float(np.exp(rng.uniform(np.log(s["low"]), np.log(s["high"])))),
+    "choice": lambda rng, s: s["values"][int(rng.integers(len(s["values"])))],
+}
+
+
+def sample_params(space, rng):
+    """One parameter set drawn from the search space."""
+    params = {}
+    for name, spec in space.items():
+        if spec.get("type") not in SAMPLERS:
+            raise ValueError(f"Unknown search space type '{spec.get('type')}' for {name}. Use one of {list(SAMPLERS)}.")
+        params[name] = SAMPLERS[spec["type"]](rng, spec)
+    return params
+
+
+def build_matrices(X_train, y_train, X_valid, y_valid, max_bin=256):
+    """Quantised training and validation matrices, built once and shared by all trials."""
+    import xgboost as xgb
+
+    # Categorical id columns (see features.global_design) are split on natively
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train, max_bin=max_bin, enable_categorical=True)
+    dvalid = xgb.QuantileDMatrix(X_valid, label=y_valid, ref=dtrain, enable_categorical=True)
+    return dtrain, dvalid
+
+
+def _early_stopping(trial, patience):
+    """Callback tracking a trial's best validation round over all its rungs.
+
+    XGBoost's own early stopping restarts with every continued xgb.train call, so a better
+    round from an earlier rung would be forgotten and patience would reset at each rung.
+    """
+    import xgboost as xgb
+
+    class BestRound(xgb.callback.TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            iteration = model.num_boosted_rounds() - 1
+            score = float(evals_log["valid"]["rmse"][-1])
+            if score < trial["score"]:
+                trial["score"], trial["best_iteration"] = score, iteration
+            return iteration - trial["best_iteration"] >= patience
+
+    return BestRound()
+
+
+def _train(trial, dtrain, dvalid, rounds, early_stopping, base_params):
+    """Grow a trial's booster to `rounds` trees in total (or until early stopping)."""
+    import xgboost as xgb
+
+    extra = rounds - trial["rounds"]
+    if trial["stopped"] or extra <= 0:
+        return trial
+    start = time.perf_counter()
+    booster = xgb.train(
+        {**base_params, **trial["params"]},
+        dtrain,
+        num_boost_round=extra,
+        evals=[(dvalid, "valid")],
+        callbacks=[_early_stopping(trial, early_stopping)],
+        xgb_model=trial["booster"],
+        verbose_eval=False,
+    )
+    trained = booster.num_boosted_rounds()
+    trial.update(
+        booster=booster,
+        rounds=trained,
+        # Out of patience (possibly on the rung's last round): more rounds at the next rung would not help
+        stopped=trained - 1 - trial["best_iteration"] >= early_stopping,
+        seconds=trial["seconds"] + time.perf_counter() - start,
+    )
+    return trial
+
+
+def _run_rung(trials, dtrain, dvalid, rounds, tune_cfg, base_params, rung, history):
+    workers = max(1, tune_cfg.get("workers", 1))
+    es = tune_cfg.get("early_stopping_rounds", 20)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda t: _train(t, dtrain, dvalid, rounds, es, base_params), trials))
+    for t in trials:
+        history.append({"trial": t["id"], "rung": rung, "rounds": t["rounds"], "best_iteration": t["best_iteration"],
+                        "valid_rmse": t["score"], "seconds": round(t["seconds"], 3), **t["params"]})
+        logging.info(f"Trial {t['id']} rung {rung}: {t['rounds']} rounds, valid RMSE {t['score']:.4f}")
+
+
+@traced("tune")
+def tune(X_train, y_train, X_valid, y_valid, tune_cfg, base_params=None):
+    """Search the space in `tune_cfg`; returns (best trial, list of per-rung trial records).
+
+    The best trial holds `params`, `best_iteration`, `score` (validation RMSE) and `booster`.
+    """
+    method = tune_cfg.get("method", "halving")
+    if method not in ("halving", "random"):
+        raise ValueError(f"Unknown tuning method '{method}'. Use 'halving' or 'random'.")
+    rng = np.random.default_rng(tune_cfg.get("seed", 42))
+    workers = max(1, tune_cfg.get("workers", 1))
+    base_params = {
+        "objective": "reg:squarederror",
+        "eval_metric": "rmse",
+        "nthread": tune_cfg.get("nthread") or max(1, (os.cpu_count() or 1) // workers),
+        "seed": tune_cfg.get("seed", 42),
+        **(base_params or {}),
+    }
+
+    start = time.perf_counter()
+    dtrain, dvalid = build_matrices(X_train, y_train, X_valid, y_valid, tune_cfg.get("max_bin", 256))
+    logging.info(f"Built shared matrices in {time.perf_counter() - start:.2f}s "
+                 f"({dtrain.num_row()} train / {dvalid.num_row()} validation rows)")
+
+    trials = [{"id": i, "params": sample_params(tune_cfg["space"], rng), "booster": None, "rounds": 0,
+               "best_iteration": 0, "score": math.inf, "stopped": False, "seconds": 0.0}
+              for i in range(tune_cfg.get("n_trials", 20))]
+    max_rounds = tune_cfg.get("max_rounds", 1000)
+    history = []
+
+    if method == "random":
+        _run_rung(trials, dtrain, dvalid, max_rounds, tune_cfg, base_params, 0, history)
+        alive = trials
+    else:
+        # Successive halving: every trial gets min_rounds, the best 1/eta survive to eta x the rounds
+        eta = tune_cfg.get("eta", 3)
+        rounds = min(tune_cfg.get("min_rounds", 50), max_rounds)
+        alive, rung = trials, 0
+        while True:
+            _run_rung(alive, dtrain, dvalid, rounds, tune_cfg, base_params, rung, history)
+            if rounds >= max_rounds or len(alive) <= 1:
+                break
+            alive = sorted(alive, key=lambda t: t["score"])[:max(1, math.ceil(len(alive) / eta))]
+            survivors = {t["id"] for t in alive}
+            for t in trials:
+                if t["id"] not in survivors:
+                    t["booster"] = None  # free losers' trees
+            rounds, rung = min(max_rounds, rounds * eta), rung + 1
+
+    best = min(alive, key=lambda t: t["score"])
+    logging.info(f"Best trial {best['id']}: valid RMSE {best['score']:.4f} at {best['best_iteration'] + 1} rounds, {best['params']}")
+    return best, history
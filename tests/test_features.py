@@ -0,0 +1,104 @@
+"""
+Tests: test_features.py
+Description: Incremental feature updates (tail state + new rows) against build_features() over
+             the concatenated history, for uneven, multi-series and single-series histories.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.features import (build_features, update_features, tail_state, select_new_rows,
+                                    feature_columns)
+
+SPEC = {
+    "time_col": "timestamp",
+    "target": "energy_kwh",
+    "series_col": "sector",
+    "static": ["segment"],
+    "calendar": ["hour", "dayofweek", "month"],
+    "cyclical": {"hour": 24, "dayofweek": 7},
+    "lags": [1, 24],
+    "rolling": [{"window": 3, "stats": ["mean"], "shift": 1},
+                {"window": 24, "stats": ["mean", "std", "max"], "shift": 1},
+                {"window": 6, "stats": ["min"]}],
+    "dtype": "float32",
+    "drop_warmup": True,
+}
+
+
+def make_history(starts, end, seed):
+    """Hourly rows per series from its own start up to `end`, shuffled like raw appends."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for k, (sid, start) in enumerate(starts.items()):
+        times = pd.date_range(start, end, freq="h")
+        frames.append(pd.DataFrame({
+            "sector": sid,
+            "segment": f"seg{k % 2}",
+            "timestamp": times,
+            "energy_kwh": 3 + np.sin(np.arange(len(times)) * 2 * np.pi / 24) + rng.normal(scale=0.2, size=len(times)),
+        }))
+    return pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def key_columns(spec):
+    keys = [spec["series_col"], spec["time_col"]] if spec.get("series_col") else [spec["time_col"]]
+    return keys + [spec["target"]] + feature_columns(spec)
+
+
+def assert_same_rows(actual, expected, spec):
+    columns = key_columns(spec)
+    keys = columns[:2] if spec.get("series_col") else columns[:1]
+    actual = actual[columns].sort_values(keys, ignore_index=True)
+    expected = expected[columns].sort_values(keys, ignore_index=True)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-6)
+
+
+def test_update_matches_full_build_in_chained_increments():
+    history = make_history({"A": "2024-01-01", "B": "2024-01-03 05:00", "C": "2024-01-02"}, "2024-01-20 23:00", seed=0)
+    late = make_history({"D": "2024-01-15 07:00"}, "2024-01-20 23:00", seed=1)  # series first seen in an update
+    raw = pd.concat([history, late], ignore_index=True)
+    full = build_features(raw, SPEC)
+
+    cuts = [pd.Timestamp("2024-01-10 13:00"), pd.Timestamp("2024-01-16 02:00"), raw["timestamp"].max()]
+    seen = raw[raw["timestamp"] <= cuts[0]]
+    state = tail_state(seen, SPEC)
+    parts = [build_features(seen, SPEC)]
+    for cut in cuts[1:]:
+        new_rows = select_new_rows(raw[raw["timestamp"] <= cut], state, SPEC)
+        features, state = update_features(new_rows, state, SPEC)
+        parts.append(features)
+
+    assert_same_rows(pd.concat(parts, ignore_index=True), full, SPEC)
+    pd.testing.assert_frame_equal(state, tail_state(raw, SPEC))
+
+
+def test_update_rows_are_exactly_the_new_rows():
+    raw = make_history({"A": "2024-01-01", "B": "2024-01-01"}, "2024-01-08 23:00", seed=2)
+    cut = pd.Timestamp("2024-01-05 11:00")
+    state = tail_state(raw[raw["timestamp"] <= cut], SPEC)
+    new_rows = select_new_rows(raw, state, SPEC)
+    assert (new_rows["timestamp"] > cut).all() and len(new_rows) == (raw["timestamp"] > cut).sum()
+
+    features, _ = update_features(new_rows, state, SPEC)
+    full = build_features(raw, SPEC)
+    assert_same_rows(features, full[full["timestamp"] > cut], SPEC)
+
+
+@pytest.mark.parametrize("cut_hours", [1, 5, 30])
+def test_single_series_update_matches_full_build(cut_hours):
+    spec = dict(SPEC, series_col=None, static=[])
+    raw = make_history({"A": "2024-01-01"}, "2024-01-06 23:00", seed=3).drop(columns=["sector", "segment"])
+    cut = raw["timestamp"].max() - pd.Timedelta(hours=cut_hours)
+    state = tail_state(raw[raw["timestamp"] <= cut], spec)
+    features, _ = update_features(select_new_rows(raw, state, spec), state, spec)
+    full = build_features(raw, spec)
+    assert_same_rows(features, full[full["timestamp"] > cut], spec)
@@ -0,0 +1,126 @@
+"""
+Tests: test_intervals.py
+Description: Calibrated prediction intervals: split-conformal offsets and their coverage on fresh
+             residuals, quantile offsets, and the fallback from per-series/horizon offsets to the
+             pooled ones.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.intervals import calibrate, apply_intervals, split_by_entry, registry_name, POOLED
+
+SCALES = {"A": 1.0, "B": 5.0}  # residual spread per series
+
+
+def make_residuals(per_group, horizons, seed):
+    """Normal residuals per series and horizon, wider for B and for later horizons."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for sid, scale in SCALES.items():
+        for h in range(1, horizons + 1):
+            frames.append(pd.DataFrame({"series": sid, "horizon": h,
+                                        "residual": rng.normal(scale=scale * (1 + 0.1 * h), size=per_group)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def bounds_for(residuals, table, level):
+    """Bounds around a zero forecast for every residual's series and horizon."""
+    frame = residuals[["series", "horizon"]].assign(predicted=0.0)
+    return apply_intervals(frame, table, level)
+
+
+@pytest.mark.parametrize("level", [0.8, 0.95])
+def test_conformal_coverage_per_series_and_horizon(level):
+    # Large calibration sets, so the coverage of each group is within a few points of `level`
+    table = calibrate(make_residuals(5000, 3, seed=0), [level], "conformal", min_samples=20)
+    fresh = make_residuals(20000, 3, seed=1)
+    bounds = bounds_for(fresh, table, level)
+    inside = (fresh["residual"] >= bounds["lower"]) & (fresh["residual"] <= bounds["upper"])
+    coverage = inside.groupby([fresh["series"], fresh["horizon"]]).mean()
+    assert coverage.between(level - 0.02, level + 0.02).all(), coverage
+
+    # Pooled over series, B's wide residuals dominate: A is over-covered and B under-covered
+    pooled = calibrate(make_residuals(5000, 3, seed=0).assign(series="other"), [level], "conformal")
+    bounds = bounds_for(fresh, pooled, level)
+    inside = (fresh["residual"] >= bounds["lower"]) & (fresh["residual"] <= bounds["upper"])
+    by_series = inside.groupby(fresh["series"]).mean()
+    assert by_series["A"] > level + 0.02 and by_series["B"] < level - 0.02
+
+
+def test_conformal_offset_is_the_finite_sample_quantile():
+    residuals = pd.DataFrame({"series": "A", "horizon": 1, "residual": np.arange(-9.0, 10.0)})  # n = 19
+    table = calibrate(residuals, [0.8], "conformal", min_samples=1)
+    row = table[(table["series"] == "A") & (table["horizon"] == 1)].iloc[0]
+    k = int(np.ceil((19 + 1) * 0.8))  # 16th smallest |residual|
+    expected = np.sort(np.abs(residuals["residual"]))[k - 1]
+    assert (row["lower"], row["upper"], row["n"]) == (-expected, expected, 19)
+
+
+def test_quantile_offsets_are_asymmetric_residual_quantiles():
+    rng = np.random.default_rng(2)
+    residuals = pd.DataFrame({"series": "A", "horizon": 1, "residual": rng.exponential(size=500)})
+    table = calibrate(residuals, [0.9], "quantile", min_samples=1)
+    row = table[(table["series"] == "A") & (table["horizon"] == 1)].iloc[0]
+    assert row["lower"] == pytest.approx(np.quantile(residuals["residual"], 0.05))
+    assert row["upper"] == pytest.approx(np.quantile(residuals["residual"], 0.95))
+
+
+def test_pooling_fallbacks():
+    residuals = make_residuals(50, 3, seed=3)
+    # B has too few residuals at horizon 3 alone, but enough over all its horizons
+    residuals = residuals[~((residuals["series"] == "B") & (residuals["horizon"] == 3) & (residuals.index % 5 != 0))]
+    table = calibrate(residuals, [0.8], "conformal", min_samples=20)
+    lookup = table.set_index(["series", "horizon"])[["lower", "upper"]]
+
+    frame = pd.DataFrame({"series": ["A", "B", "B", "new", "new", "A"],
+                          "horizon": [2, 2, 3, 2, 0, 9],
+                          "predicted": 0.0})
+    out = apply_intervals(frame, table, 0.8)
+    expected = [
+        lookup.loc[("A", 2)],       # the series at that horizon
+        lookup.loc[("B", 2)],
+        lookup.loc[("B", 0)],       # too few at (B, 3): the series over all horizons
+        lookup.loc[(POOLED, 2)],    # unseen series: every series at that horizon
+        lookup.loc[(POOLED, 0)],    # nothing at horizon 0 for it: everything pooled
+        lookup.loc[("A", 3)],       # past the calibrated horizons: the last one
+    ]
+    np.testing.assert_allclose(out[["lower", "upper"]].to_numpy(), np.array(expected))
+    assert ("B", 3) not in lookup.index
+
+
+def test_levels_beyond_the_sample_size_fall_back_to_pooled_offsets():
+    # 10 residuals per series cannot give a 95% conformal quantile (ceil(11 * 0.95) > 10); the
+    # 20 of both series can
+    residuals = make_residuals(10, 1, seed=4)
+    table = calibrate(residuals, [0.95], "conformal", min_samples=1)
+    assert set(table["series"]) == {POOLED}
+    out = apply_intervals(pd.DataFrame({"series": ["A"], "horizon": [1], "predicted": [0.0]}), table, 0.95)
+    assert out["upper"].iloc[0] == table.set_index(["series", "horizon"]).loc[(POOLED, 1), "upper"]
+
+
+def test_missing_level_raises():
+    table = calibrate(make_residuals(50, 1, seed=5), [0.8])
+    with pytest.raises(ValueError):
+        apply_intervals(pd.DataFrame({"series": ["A"], "horizon": [1], "predicted": [0.0]}), table, 0.95)
+
+
+def test_per_series_entries_keep_the_pooled_rows():
+    table = calibrate(make_residuals(50, 2, seed=6), [0.8])
+    entries = split_by_entry("Prophet", table)
+    assert set(entries) == {registry_name("Prophet", "A"), registry_name("Prophet", "B")} == {"prophet_A", "prophet_B"}
+    for sid in SCALES:
+        rows = entries[f"prophet_{sid}"]
+        assert set(rows["series"]) == {sid, POOLED}
+        frame = pd.DataFrame({"series": [sid, sid], "horizon": [1, 2], "predicted": 0.0})
+        pd.testing.assert_frame_equal(apply_intervals(frame, rows, 0.8), apply_intervals(frame, table, 0.8))
+    assert list(split_by_entry("XGBoost", table)) == ["xgboost"]
+    assert registry_name("Prophet", "all") == "prophet"
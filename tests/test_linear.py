@@ -0,0 +1,124 @@
+"""
+Tests: test_linear.py
+Description: BatchedLinearRegression against per-series sklearn fits, and online updates
+             against batch refits (rank-deficient histories and new series included).
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.linear import BatchedLinearRegression
+
+P = 4
+
+
+def make_rows(series, hours, seed, start=0):
+    """Long frame of `hours` rows per series with a per-series linear target plus noise."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for k, sid in enumerate(series):
+        X = rng.normal(size=(hours, P))
+        coef = np.arange(1, P + 1) * (k + 1)
+        frame = pd.DataFrame(X, columns=[f"f{i}" for i in range(P)])
+        frame["sector"] = sid
+        frame["y"] = X @ coef + k + rng.normal(scale=0.1, size=hours)
+        frame["hour"] = np.arange(start, start + hours)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True).sort_values(["hour", "sector"], ignore_index=True)
+
+
+def split(frame):
+    return frame.drop(columns=["y", "hour"]), frame["y"]
+
+
+def assert_same_fit(a, b, atol=1e-8):
+    np.testing.assert_array_equal(a.series_, b.series_)
+    np.testing.assert_allclose(a.coef_, b.coef_, atol=atol)
+    np.testing.assert_allclose(a.intercept_, b.intercept_, atol=atol)
+
+
+@pytest.mark.parametrize("fit_intercept", [True, False])
+def test_batch_fit_matches_sklearn_per_series(fit_intercept):
+    frame = make_rows(["A", "B", "C"], 50, seed=0)
+    frame.loc[frame["sector"] == "C", "f2"] = 1.0  # rank-deficient series: minimum-norm solution
+    X, y = split(frame)
+    model = BatchedLinearRegression(fit_intercept=fit_intercept, series_col="sector").fit(X, y)
+
+    for k, sid in enumerate(model.series_):
+        rows = frame["sector"] == sid
+        ref = LinearRegression(fit_intercept=fit_intercept).fit(X[rows].drop(columns="sector"), y[rows])
+        np.testing.assert_allclose(model.coef_[k], ref.coef_, atol=1e-8)
+        np.testing.assert_allclose(model.intercept_[k], ref.intercept_, atol=1e-8)
+    np.testing.assert_allclose(
+        model.predict(X[frame["sector"] == "A"]),
+        LinearRegression(fit_intercept=fit_intercept).fit(X[frame["sector"] == "A"].drop(columns="sector"),
+                                                          y[frame["sector"] == "A"])
+        .predict(X[frame["sector"] == "A"].drop(columns="sector")),
+        atol=1e-8,
+    )
+
+
+@pytest.mark.parametrize("fit_intercept", [True, False])
+def test_update_equals_refit(fit_intercept):
+    frame = make_rows(["A", "B", "C"], 80, seed=1)
+    old, new = frame[frame["hour"] < 60], frame[frame["hour"] >= 60]
+    online = BatchedLinearRegression(fit_intercept=fit_intercept, series_col="sector", online=True).fit(*split(old))
+    online.update(*split(new))
+    refit = BatchedLinearRegression(fit_intercept=fit_intercept, series_col="sector").fit(*split(frame))
+    assert_same_fit(online, refit)
+
+
+def test_update_after_rank_deficient_fit_equals_refit():
+    frame = make_rows(["A", "B"], 80, seed=2)
+    frame.loc[frame["hour"] < 40, "f3"] = 0.5  # e.g. `month` constant before the first fit
+    old, new = frame[frame["hour"] < 40], frame[frame["hour"] >= 40]
+    online = BatchedLinearRegression(series_col="sector", online=True).fit(*split(old))
+    assert not online.full_rank_.any()
+
+    # A few rows at a time: the first chunk makes the design full rank, later ones go through RLS
+    for lo in range(40, 80, 10):
+        online.update(*split(new[(new["hour"] >= lo) & (new["hour"] < lo + 10)]))
+    refit = BatchedLinearRegression(series_col="sector").fit(*split(frame))
+    assert online.full_rank_.all()
+    assert_same_fit(online, refit)
+    X, _ = split(frame)
+    np.testing.assert_allclose(online.predict(X), refit.predict(X), atol=1e-8)
+
+
+def test_update_adds_new_series():
+    frame = make_rows(["A", "B", "C"], 60, seed=3)
+    old = frame[(frame["hour"] < 40) & (frame["sector"] != "B")]
+    new = frame[(frame["hour"] >= 40) | (frame["sector"] == "B")]
+    online = BatchedLinearRegression(series_col="sector", online=True).fit(*split(old))
+    assert list(online.series_) == ["A", "C"]
+
+    online.update(*split(new))
+    refit = BatchedLinearRegression(series_col="sector").fit(*split(frame))
+    assert_same_fit(online, refit)
+    X, _ = split(frame[frame["sector"] == "B"])
+    assert np.isfinite(online.predict(X)).all()
+    assert np.isfinite(online.for_series(X["sector"])(X.drop(columns="sector"))).all()
+
+
+def test_forgetting_factor_matches_weighted_least_squares():
+    lam = 0.97
+    frame = make_rows(["A"], 60, seed=4)
+    old, new = frame[frame["hour"] < 30], frame[frame["hour"] >= 30]
+    online = BatchedLinearRegression(series_col="sector", online=True, forgetting_factor=lam).fit(*split(old))
+    online.update(*split(new))
+
+    X, y = split(frame)
+    weights = lam ** (frame["hour"].max() - frame["hour"])
+    weights[frame["hour"] < 30] = lam ** (len(new))  # the first fit counts as one block
+    ref = LinearRegression().fit(X.drop(columns="sector"), y, sample_weight=weights)
+    np.testing.assert_allclose(online.coef_[0], ref.coef_, atol=1e-8)
+    np.testing.assert_allclose(online.intercept_[0], ref.intercept_, atol=1e-8)
@@ -0,0 +1,68 @@
+"""
+Tests: test_metrics.py
+Description: compute_metrics() MASE on multi-series tables: seasonal-naive scales taken per
+             series and pooled, never across series boundaries.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.metrics import compute_metrics, seasonal_naive_scale
+
+
+def make_predictions(levels, hours, seed):
+    """Long table of daily-seasonal series at very different levels, interleaved by timestamp."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2024-01-01", periods=hours, freq="h")
+    frames = []
+    for k, level in enumerate(levels):
+        actual = level * (1 + 0.5 * np.sin(2 * np.pi * np.arange(hours) / 24)) + rng.normal(scale=level * 0.05, size=hours)
+        frames.append(pd.DataFrame({
+            "series": f"s{k}",
+            "timestamp": times,
+            "actual": actual,
+            "predicted": actual + rng.normal(scale=level * 0.1, size=hours),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(["timestamp", "series"], ignore_index=True)
+
+
+def test_pooled_mase_uses_per_series_scales():
+    df = make_predictions([1.0, 10.0, 100.0], 24 * 14, seed=0)
+    df["model"] = "m"
+
+    per_series = compute_metrics(df, ["series"], time_col="timestamp").set_index("series")
+    pooled = compute_metrics(df, ["model"], time_col="timestamp", series_col="series").iloc[0]
+
+    scales = [seasonal_naive_scale(part.sort_values("timestamp")["actual"]) for _, part in df.groupby("series")]
+    np.testing.assert_allclose(per_series["mase"], per_series["mae"] / scales)
+    np.testing.assert_allclose(pooled["mase"], per_series["mae"].mean() / np.mean(scales))
+    # A ratio of pooled sums lies between the per-series ratios
+    assert per_series["mase"].min() <= pooled["mase"] <= per_series["mase"].max()
+
+
+def test_series_col_in_groups_matches_single_series_scoring():
+    df = make_predictions([5.0, 50.0], 24 * 7, seed=1)
+    grouped = compute_metrics(df, ["series"], time_col="timestamp", series_col="series").set_index("series")
+    for sid, part in df.groupby("series"):
+        alone = compute_metrics(part, time_col="timestamp").iloc[0]
+        np.testing.assert_allclose(grouped.loc[sid, ["mae", "rmse", "mase"]].to_numpy(dtype=float),
+                                   alone[["mae", "rmse", "mase"]].to_numpy(dtype=float))
+
+
+def test_interleaved_series_without_series_col_misses_the_seasonal_lag():
+    # The regression this guards: grouped only by model, the lag-24 difference of interleaved
+    # rows compares different series and hours, and MASE collapses
+    df = make_predictions([1.0, 10.0, 100.0], 24 * 14, seed=2)
+    df["model"] = "m"
+    per_series = compute_metrics(df, ["series"], time_col="timestamp")["mase"]
+    naive = compute_metrics(df, ["model"], time_col="timestamp")["mase"].iloc[0]
+    fixed = compute_metrics(df, ["model"], time_col="timestamp", series_col="series")["mase"].iloc[0]
+    assert not per_series.min() <= naive <= per_series.max()
+    assert per_series.min() <= fixed <= per_series.max()
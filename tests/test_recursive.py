@@ -0,0 +1,119 @@
+"""
+Tests: test_recursive.py
+Description: recursive_forecast() against a step-by-step reference that appends each prediction
+             to the history and rebuilds the features with build_features().
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.features import build_features, feature_columns
+from scripts.utils.recursive import recursive_forecast
+
+SPEC = {
+    "time_col": "timestamp",
+    "target": "energy_kwh",
+    "series_col": "sector",
+    "calendar": ["hour", "dayofweek"],
+    "cyclical": {"hour": 24},
+    "lags": [1, 2, 24],
+    "rolling": [{"window": 3, "stats": ["mean", "max"], "shift": 1},
+                {"window": 24, "stats": ["mean", "std"], "shift": 1}],
+    "dtype": "float32",
+}
+NAMES = feature_columns(SPEC)
+WEIGHTS = np.random.default_rng(0).normal(scale=0.1, size=len(NAMES))
+OFFSETS = {"A": 0.0, "B": 1.5, "C": -0.5}
+
+
+def make_history(ends, hours, seed):
+    """`hours` hourly rows per series, each ending at its own timestamp."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for sid, end in ends.items():
+        times = pd.date_range(end=end, periods=hours, freq="h")
+        frames.append(pd.DataFrame({"sector": sid, "timestamp": times,
+                                    "energy_kwh": 3 + np.sin(times.hour * 2 * np.pi / 24) + rng.normal(scale=0.2, size=hours)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def linear_predict(X):
+    return np.asarray(X, dtype=np.float64) @ WEIGHTS + 1.0
+
+
+def step_by_step(history, spec, horizon, offset=None):
+    """One build_features() pass per step over the history extended with earlier predictions."""
+    series_col, time_col, target = spec.get("series_col"), spec["time_col"], spec["target"]
+    frame = history.copy()
+    rows = []
+    for step in range(1, horizon + 1):
+        last = frame.groupby(series_col)[time_col].max() if series_col else pd.Series({None: frame[time_col].max()})
+        nxt = pd.DataFrame({time_col: last.to_numpy() + pd.Timedelta(hours=1), target: np.nan})
+        if series_col:
+            nxt.insert(0, series_col, last.index)
+        features = build_features(pd.concat([frame, nxt], ignore_index=True), dict(spec, drop_warmup=False))
+        new = features[features[target].isna()].copy()
+        new["predicted"] = linear_predict(new[NAMES])
+        if offset is not None:
+            new["predicted"] += new[series_col].map(offset)
+        new[target] = new["predicted"]
+        new["horizon"] = step
+        rows.append(new)
+        frame = pd.concat([frame, new[frame.columns]], ignore_index=True)
+    keys = [series_col, time_col] if series_col else [time_col]
+    return pd.concat(rows, ignore_index=True).sort_values(keys, ignore_index=True)
+
+
+def test_matches_step_by_step_for_ragged_series():
+    history = make_history({"A": "2024-02-01 23:00", "B": "2024-02-01 17:00", "C": "2024-02-02 03:00"}, 72, seed=1)
+    horizon = 60  # longer than the 24-slot ring buffer, so it wraps around
+    calls = []
+
+    def predict(X):
+        calls.append(X.shape)
+        return linear_predict(X)
+
+    result = recursive_forecast(predict, history, SPEC, horizon)
+    expected = step_by_step(history, SPEC, horizon)
+
+    assert calls == [(3, len(NAMES))] * horizon  # one predict call per step, all series at once
+    assert np.isfinite(result["predicted"]).all()
+    pd.testing.assert_frame_equal(result[["sector", "timestamp", "horizon"]],
+                                  expected[["sector", "timestamp", "horizon"]], check_dtype=False)
+    np.testing.assert_allclose(result["predicted"], expected["predicted"], rtol=1e-5)
+
+
+def test_categorical_columns_follow_their_series():
+    history = make_history({"C": "2024-02-01 23:00", "A": "2024-02-01 23:00", "B": "2024-02-01 23:00"}, 48, seed=2)
+    categories = pd.DataFrame({"sector": pd.Categorical(list(OFFSETS))}, index=list(OFFSETS))
+
+    def predict(frame):
+        assert list(frame.columns) == NAMES + ["sector"]
+        return linear_predict(frame[NAMES]) + frame["sector"].astype(str).map(OFFSETS).to_numpy()
+
+    result = recursive_forecast(predict, history, SPEC, 30, categorical=categories)
+    expected = step_by_step(history, SPEC, 30, offset=OFFSETS)
+    np.testing.assert_allclose(result["predicted"], expected["predicted"], rtol=1e-5)
+
+
+def test_single_series_history():
+    spec = dict(SPEC, series_col=None)
+    history = make_history({"A": "2024-02-01 23:00"}, 48, seed=3).drop(columns="sector")
+    result = recursive_forecast(linear_predict, history, spec, 36)
+    expected = step_by_step(history, spec, 36)
+    assert "sector" not in result.columns
+    np.testing.assert_allclose(result["predicted"], expected["predicted"], rtol=1e-5)
+
+
+def test_rejects_features_that_include_the_target_hour():
+    with pytest.raises(ValueError):
+        recursive_forecast(linear_predict, make_history({"A": "2024-02-01"}, 48, seed=4),
+                           dict(SPEC, rolling=[{"window": 3, "stats": ["mean"]}]), 5)
@@ -0,0 +1,89 @@
+"""
+Tests: test_rollups.py
+Description: Prediction rollups against statistics computed directly from the raw rows:
+             min/max/mean of sector and Total load per period are taken over hourly totals, and
+             merging incremental prediction parts gives the same tables as a full rebuild.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.rollups import aggregate, regroup, merge, refresh, period_start, KEYS, TOTAL
+
+SECTORS = {"m0": "A", "m1": "A", "m2": "B", "m3": "B", "m4": "B"}
+
+
+def make_rows(hours, seed, start="2024-01-01", kind="test"):
+    """Raw prediction rows of every meter in SECTORS, one per hour."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=hours, freq="h")
+    frames = []
+    for k, meter in enumerate(SECTORS):
+        actual = rng.gamma(2.0, k + 1.0, size=hours)
+        frames.append(pd.DataFrame({
+            "model": "XGBoost", "run_id": "r1", "series": meter, "timestamp": times, "kind": kind,
+            "actual": actual, "predicted": actual + rng.normal(size=hours),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def expected(rows, granularity):
+    """Per sector and period statistics of the hourly totals, straight from the raw rows."""
+    rows = rows.assign(sector=rows["series"].map(SECTORS))
+    rows = pd.concat([rows, rows.assign(sector=TOTAL)], ignore_index=True)
+    hours = rows.groupby(["sector", "timestamp"]).agg(n=("actual", "size"), actual=("actual", "sum"),
+                                                       predicted=("predicted", "sum")).reset_index()
+    hours["period"] = period_start(hours["timestamp"], granularity).to_numpy()
+    return hours.groupby(["sector", "period"]).agg(
+        n=("n", "sum"), actual_sum=("actual", "sum"), actual_min=("actual", "min"), actual_max=("actual", "max"),
+        actual_mean=("actual", "mean"), predicted_max=("predicted", "max"), predicted_mean=("predicted", "mean"),
+    )
+
+
+@pytest.mark.parametrize("granularity", ["hour", "day", "week"])
+def test_statistics_are_over_hourly_totals(granularity):
+    rows = make_rows(24 * 10, seed=0)
+    table = regroup(aggregate(rows, SECTORS, total=True), granularity).set_index(["sector", "period"])
+    ref = expected(rows, granularity)
+    for column in ref.columns:
+        np.testing.assert_allclose(table.loc[ref.index, column].to_numpy(dtype=float), ref[column].to_numpy(), err_msg=column)
+
+
+def test_kinds_are_kept_apart():
+    rows = pd.concat([make_rows(48, seed=1), make_rows(48, seed=2, kind="insample")], ignore_index=True)
+    table = regroup(aggregate(rows, SECTORS, total=True), "day")
+    assert set(table["kind"]) == {"test", "insample"}
+    assert (table.groupby("kind")["n"].sum() == 2 * 48 * len(SECTORS)).all()
+
+
+@pytest.mark.parametrize("order", [[0, 1, 2, 3], [3, 1, 0, 2]])
+def test_incremental_merge_matches_full_rebuild(order):
+    rows = pd.concat([make_rows(24 * 40, seed=3), make_rows(24 * 5, seed=4, start="2024-02-10", kind="forecast")],
+                     ignore_index=True)
+    early = rows["timestamp"] < "2024-01-20 05:00"
+    some_meters = rows["series"].isin(["m0", "m3"])
+    # Parts share hours (some meters now, the others later) and straddle day/week/month edges
+    parts = [rows[early & some_meters], rows[early & ~some_meters], rows[~early & (rows["kind"] == "test")],
+             rows[rows["kind"] == "forecast"]]
+
+    granularities = ["day", "week", "month"]
+    hourly, tables = None, {g: None for g in granularities}
+    for i in order:
+        new = aggregate(parts[i], SECTORS, total=True)
+        hourly = merge(hourly, new)
+        for g in granularities:
+            tables[g] = refresh(tables[g], hourly, new, g)
+
+    full = aggregate(rows, SECTORS, total=True)
+    pd.testing.assert_frame_equal(hourly, full.sort_values(KEYS, ignore_index=True), check_dtype=False)
+    for g in granularities:
+        pd.testing.assert_frame_equal(tables[g], regroup(full, g).sort_values(KEYS, ignore_index=True),
+                                      check_dtype=False, obj=g)
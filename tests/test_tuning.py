@@ -0,0 +1,54 @@
+"""
+Tests: test_tuning.py
+Description: Successive halving grows boosters over several rungs; the best round it reports
+             must match one uninterrupted early-stopped fit of the same parameters.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath("."))  # Project root
+from scripts.utils.tuning import tune, build_matrices
+
+xgb = pytest.importorskip("xgboost")
+
+PARAMS = {"max_depth": 6, "learning_rate": 0.3, "tree_method": "hist"}
+
+
+def make_data(rows, seed):
+    """Noisy target, so validation error bottoms out after a few rounds (inside the second rung)."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(rows, 5)), columns=[f"f{i}" for i in range(5)])
+    y = np.sin(X["f0"]) + 0.5 * X["f1"] + rng.normal(scale=0.5, size=rows)
+    return X, y
+
+
+@pytest.mark.parametrize("early_stopping", [5, 50])
+def test_halving_best_round_matches_uninterrupted_fit(early_stopping):
+    X, y = make_data(1500, seed=0)
+    X_train, y_train, X_valid, y_valid = X[:1000], y[:1000], X[1000:], y[1000:]
+    # Identical trials, so the survivor of every rung is the same model grown further; 27 trials
+    # give rungs of 4, 12, 36 and 108 rounds
+    tune_cfg = {
+        "method": "halving", "n_trials": 27, "eta": 3, "min_rounds": 4, "max_rounds": 108,
+        "early_stopping_rounds": early_stopping, "workers": 1, "nthread": 1, "seed": 0,
+        "space": {name: {"type": "choice", "values": [value]} for name, value in PARAMS.items()},
+    }
+    best, history = tune(X_train, y_train, X_valid, y_valid, tune_cfg)
+    assert max(r["rung"] for r in history) >= 2
+
+    dtrain, dvalid = build_matrices(X_train, y_train, X_valid, y_valid)
+    ref = xgb.train({"objective": "reg:squarederror", "eval_metric": "rmse", "nthread": 1, "seed": 0, **PARAMS},
+                    dtrain, num_boost_round=tune_cfg["max_rounds"], evals=[(dvalid, "valid")],
+                    early_stopping_rounds=early_stopping, verbose_eval=False)
+
+    assert best["best_iteration"] == ref.best_iteration  # n_estimators = best_iteration + 1
+    assert best["score"] == pytest.approx(ref.best_score)
+    assert best["rounds"] == ref.num_boosted_rounds()